@@ -26,13 +26,13 @@ def create_text_query(query: str) -> types.Content:
     return types.Content(role="user", parts=[types.Part(text=query)])
 
 
-def create_docs_query(query: str, images: List[bytes]) -> types.Content:
+def create_docs_query(query: str, images: List[bytes], mime_type: str = "image/png") -> types.Content:
     """ Takes a string and fastapi UploadFile object and returns a user query that can be sent to an agent """
     parts = [types.Part(text=query)]
     for image in images:
         parts.append(types.Part.from_bytes(
             data=image,
-            mime_type="image/png",
+            mime_type=mime_type,
         ))
     return types.Content(role="user", parts=parts)
 
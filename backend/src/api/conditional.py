@@ -0,0 +1,92 @@
+"""
+HTTP conditional request helpers (ETag / If-None-Match, Last-Modified, Range / If-Range).
+
+ETags are derived from entity versions (recipes.version, collections.version), which the CRUD
+layer bumps on every change of the entity or its children. Read endpoints answer a matching
+If-None-Match with 304 before loading or serializing the body, using a version-only query.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request, Response
+
+# Clients may store responses but have to revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the given version parts."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def latest(timestamps: Iterable[Union[datetime, str, None]]) -> Optional[datetime]:
+    """Return the most recent of the given timestamps (datetimes or ISO strings)."""
+    parsed = [datetime.fromisoformat(value) if isinstance(value, str) else value for value in timestamps if value]
+    return max(parsed, default=None)
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether the If-None-Match header of the request matches the ETag (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def validator_headers(etag: str, last_modified: Union[datetime, str, None] = None) -> Dict[str, str]:
+    """Headers identifying the representation: ETag, Last-Modified and Cache-Control."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    last_modified = latest([last_modified])
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified(etag: str, last_modified: Union[datetime, str, None] = None) -> Response:
+    """An empty 304 response carrying the validators."""
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+def with_validators(response: Response, etag: str, last_modified: Union[datetime, str, None] = None) -> Response:
+    """Attach the validators to a response and return it."""
+    response.headers.update(validator_headers(etag, last_modified))
+    return response
+
+
+def requested_range(request: Request, size: int, etag: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """The single byte range (first, last; inclusive) requested via the Range header.
+
+    None means the whole representation: no or an unsupported Range header (e.g. several
+    ranges), or an If-Range validator that does not match the ETag. Raises 416 if the range
+    lies outside the representation.
+    """
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and (etag is None or if_range.strip() != etag):
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            start, end = max(size - int(last), 0), size - 1  # suffix range: the last N bytes
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
@@ -0,0 +1,70 @@
+"""
+Response sending a byte range of an open local file (local storage backend).
+
+If the ASGI server supports the zero-copy send extension ("http.response.zerocopysend"), the
+range is handed to the server, which sends it with sendfile() without copying it through
+Python. Otherwise it is read with os.pread in a thread, one chunk at a time.
+"""
+import asyncio
+import os
+from typing import BinaryIO, Mapping, Optional
+
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+READ_CHUNK_BYTES = 256 * 1024
+
+
+class FileRangeResponse(Response):
+    """Sends the bytes start..end (inclusive) of an open file and closes it afterwards."""
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        start: int,
+        end: int,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        chunk_size: int = READ_CHUNK_BYTES,
+    ) -> None:
+        self.file = file
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background: Optional[BackgroundTask] = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            count = self.end - self.start + 1
+            if scope.get("method") == "HEAD" or count <= 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": self.file,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            else:
+                await self._send_chunks(send)
+        finally:
+            self.file.close()
+
+    async def _send_chunks(self, send: Send) -> None:
+        fd = self.file.fileno()
+        position = self.start
+        while position <= self.end:
+            chunk = await asyncio.to_thread(os.pread, fd, min(self.chunk_size, self.end + 1 - position), position)
+            position += len(chunk)
+            more_body = bool(chunk) and position <= self.end
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            if not more_body:
+                break
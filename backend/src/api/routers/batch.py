@@ -0,0 +1,159 @@
+"""
+Batch endpoint: execute several read requests in one round trip.
+
+The sub-requests are dispatched in-process through the application, so they behave exactly
+like their standalone counterparts (routing, validation, ownership checks, conditional
+requests). They run concurrently, reuse the caller's session cookie (its token is verified
+once, see security.decode_token) and share one database session instead of checking out a
+connection each. Database operations on the shared session are serialized; everything else
+overlaps.
+
+Only side-effect free GET endpoints are allowed.
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from ...db.database import SHARED_SESSION_STATE, get_shared_db_context
+from ...utils.auth import get_read_only_user_id
+from ..schemas.batch import BatchRequest, BatchResponse, BatchSubRequest
+
+logger = logging.getLogger(__name__)
+
+# Read endpoints that may be batched; all of them are free of side effects
+ALLOWED_PATHS = tuple(re.compile(pattern) for pattern in (
+    r"/recipe/\d+/get",
+    r"/recipe/get_all",
+    r"/recipe/search",
+    r"/instruction/\d+",
+    r"/collection/all",
+    r"/collection/\d+",
+    r"/collection/recipe/\d+/collections",
+    r"/files/recipe-image/\d+",
+    r"/cooking/\d+/get_session",
+    r"/cooking/\d+/get_prompt_history",
+    r"/cooking/\d+/bundle",
+    r"/preparing/\d+/get_options",
+    r"/sync/changes",
+))
+
+# Response headers passed through to the client
+FORWARDED_HEADERS = ("etag", "last-modified", "cache-control", "x-next-cursor")
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["batch"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def _split_path(path: str, root_path: str) -> Tuple[str, str]:
+    """Split a sub-request path into the route path (without root_path) and the query string."""
+    parts = urlsplit(path)
+    if parts.scheme or parts.netloc:
+        raise HTTPException(status_code=400, detail=f"Batch paths must be relative: {path}")
+    route_path = parts.path
+    if root_path and route_path.startswith(root_path + "/"):
+        route_path = route_path[len(root_path):]
+    if not any(pattern.fullmatch(route_path) for pattern in ALLOWED_PATHS):
+        raise HTTPException(status_code=400, detail=f"Path not allowed in a batch: {parts.path}")
+    return route_path, parts.query
+
+
+def _sub_scope(request: Request, sub_request: BatchSubRequest, db) -> dict:
+    root_path = request.scope.get("root_path", "")
+    route_path, query_string = _split_path(sub_request.path, root_path)
+
+    headers: Dict[str, str] = {name.lower(): value for name, value in sub_request.headers.items()}
+    headers.pop("host", None)
+    headers.pop("cookie", None)
+    raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+    for name in (b"host", b"cookie", b"authorization"):
+        raw_headers.extend((key, value) for key, value in request.scope["headers"] if key == name)
+
+    return {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": root_path,
+        "path": root_path + route_path,
+        "raw_path": (root_path + route_path).encode(),
+        "query_string": query_string.encode(),
+        "headers": raw_headers,
+        "state": {SHARED_SESSION_STATE: db},
+    }
+
+
+async def _dispatch(request: Request, scope: dict) -> Tuple[int, Dict[str, str], bytes]:
+    """Run a sub-request through the application and capture its response."""
+    status = 500
+    headers: Dict[str, str] = {}
+    body: List[bytes] = []
+    started = False
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, headers, started
+        if message["type"] == "http.response.start":
+            started = True
+            status = message["status"]
+            headers = {key.decode("latin-1").lower(): value.decode("latin-1")
+                       for key, value in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:  # noqa: BLE001
+        # Unhandled errors have already been answered with a 500 by the server error middleware
+        logger.exception("Batched request %s failed", scope["path"])
+        if not started:
+            return 500, {}, b""
+    return status, headers, b"".join(body)
+
+
+def _decode_body(headers: Dict[str, str], body: bytes):
+    if not body:
+        return None
+    if headers.get("content-type", "").startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+@router.post("", response_model=BatchResponse)
+async def execute_batch(
+    batch: BatchRequest,
+    request: Request,
+    _user_id: str = Depends(get_read_only_user_id),
+):
+    """
+    Execute several read requests concurrently and return all results in one response.
+
+    Every result carries the status, the validator headers and the JSON body of the request.
+    A path outside the allowed read endpoints rejects the whole batch with 400.
+    """
+    async with get_shared_db_context() as db:
+        scopes = [_sub_scope(request, sub_request, db) for sub_request in batch.requests]
+        results = await asyncio.gather(*(_dispatch(request, scope) for scope in scopes))
+
+    responses = []
+    for sub_request, (status, headers, body) in zip(batch.requests, results):
+        responses.append({
+            "id": sub_request.id,
+            "status": status,
+            "headers": {name: headers[name] for name in FORWARDED_HEADERS if name in headers},
+            "body": _decode_body(headers, body),
+        })
+    return ORJSONResponse({"responses": responses})
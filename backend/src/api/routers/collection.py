@@ -1,10 +1,13 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...db.database import get_db
 from ...utils.auth import get_read_write_user_id
 from ...db.crud import collection_crud
+from ...db import signed_url_cache
+from ...services.collage_service import collage_service
 from ..schemas.collection import (
     Collection,
     CollectionCreate,
@@ -13,9 +16,12 @@ from ..schemas.collection import (
     CollectionWithRecipes,
     UpdateCollectionRecipesRequest,
 )
-from ..schemas.recipe import RecipePreview
+from .. import conditional, serializers
 
 
+# Overview entry fields used for ETags and collages only, not part of CollectionPreview
+_INTERNAL_FIELDS = ("version", "updated_at", "collage_key")
+
 router = APIRouter(
     prefix="/collection",
     tags=["collection"],
@@ -25,77 +31,121 @@ router = APIRouter(
 
 @router.get("/all", response_model=List[CollectionPreview])
 async def get_all_collections(
+    request: Request,
+    signed_urls: bool = False,
     user_id: str = Depends(get_read_write_user_id),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieve all collections for the current user.
 
+    Supports conditional requests: a matching If-None-Match is answered with 304.
+
+    Args:
+        signed_urls (bool): Embed signed URLs of the preview images as preview_image_signed_urls
+            and of the collage as collage_image_signed_url.
+
+    collage_image_url is the key of a WebP collage of the preview images. It is None while the
+    collage is rendered after a change; the rendering bumps the collection version, so the next
+    conditional request picks it up.
+
     Returns:
         List[CollectionPreview]: A list of user's collections with recipe counts, preview images, and recipe IDs.
     """
-    collections = await collection_crud.get_collections_by_user_id(db, user_id)
-
-    result = []
-    for collection in collections:
-        recipes = await collection_crud.get_recipes_in_collection(db, collection.id)
-        recipe_ids = [recipe.id for recipe in recipes]
-        recipe_count = len(recipe_ids)
-        preview_image_urls = await collection_crud.get_collection_preview_images(db, collection.id, limit=4)
-        result.append(CollectionPreview(
-            id=collection.id,
-            name=collection.name,
-            description=collection.description,
-            owner_id=collection.owner_id,
-            created_at=collection.created_at,
-            recipe_count=recipe_count,
-            preview_image_urls=preview_image_urls,
-            recipe_ids=recipe_ids,
-        ))
-
-    return result
+    url_parts = signed_url_cache.etag_parts(signed_urls)
+    versions = None
+    if request.headers.get("if-none-match"):
+        rows = await collection_crud.get_collection_versions(db, user_id)
+        versions = [(row.id, row.version) for row in rows]
+        etag = conditional.make_etag("collections", versions, *url_parts)
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag, conditional.latest(row.updated_at for row in rows))
+
+    collections = await collection_crud.get_collection_overview(db, user_id, versions=versions)
+    collages = [collage_service.resolve(collection) for collection in collections]
+    urls = {}
+    if signed_urls:
+        urls = await signed_url_cache.sign_image_keys(
+            [key for collection in collections for key in collection["preview_image_urls"]] + collages
+        )
+    return conditional.with_validators(
+        ORJSONResponse([
+            {
+                **{key: value for key, value in collection.items() if key not in _INTERNAL_FIELDS},
+                "preview_image_signed_urls": [urls[key] for key in collection["preview_image_urls"] if key in urls],
+                "collage_image_url": collage,
+                "collage_image_signed_url": urls.get(collage) if collage else None,
+            }
+            for collection, collage in zip(collections, collages)
+        ]),
+        conditional.make_etag(
+            "collections", [(collection["id"], collection["version"]) for collection in collections], *url_parts
+        ),
+        conditional.latest(collection["updated_at"] for collection in collections),
+    )
 
 
 @router.get("/{collection_id}", response_model=CollectionWithRecipes)
 async def get_collection(
     collection_id: int,
+    request: Request,
+    signed_urls: bool = False,
     user_id: str = Depends(get_read_write_user_id),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieve a specific collection with all its recipes.
 
+    Supports conditional requests: a matching If-None-Match is answered with 304.
+
     Args:
         collection_id (int): The ID of the collection to retrieve.
+        signed_urls (bool): Embed signed URLs of the recipe images as image_signed_url.
 
     Returns:
         CollectionWithRecipes: The collection with full recipe details.
     """
+    url_parts = signed_url_cache.etag_parts(signed_urls)
+    if request.headers.get("if-none-match"):
+        current = await collection_crud.get_collection_version(db, collection_id, owner_id=user_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Collection not found")
+        etag = conditional.make_etag("collection", collection_id, current.version, *url_parts)
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag, current.updated_at)
+
     collection = await collection_crud.get_collection_by_id(db, collection_id, owner_id=user_id)
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
 
     recipes = await collection_crud.get_recipes_in_collection(db, collection_id)
-
-    return CollectionWithRecipes(
-        id=collection.id,
-        name=collection.name,
-        description=collection.description,
-        owner_id=collection.owner_id,
-        created_at=collection.created_at,
-        recipe_ids=[recipe.id for recipe in recipes],
-        recipes=[
-            RecipePreview(
-                id=recipe.id,
-                title=recipe.title,
-                description=recipe.description,
-                image_url=recipe.image_url or "",
-                total_time_minutes=recipe.total_time_minutes,
-                difficulty=recipe.difficulty,
-                food_category=recipe.food_category,
-            )
-            for recipe in recipes
-        ],
+    recipe_payloads = [
+        {
+            **serializers.recipe_preview_payload(recipe),
+            "image_url": recipe.image_url or "",
+            "suggested_collection": None,
+            "created_at": None,
+        }
+        for recipe in recipes
+    ]
+    if signed_urls:
+        serializers.embed_image_urls(
+            recipe_payloads, await signed_url_cache.sign_image_keys(recipe.image_url for recipe in recipes)
+        )
+
+    response = ORJSONResponse({
+        "id": collection.id,
+        "name": collection.name,
+        "description": collection.description,
+        "owner_id": collection.owner_id,
+        "created_at": collection.created_at,
+        "recipe_ids": [recipe.id for recipe in recipes],
+        "recipes": recipe_payloads,
+    })
+    return conditional.with_validators(
+        response,
+        conditional.make_etag("collection", collection.id, collection.version, *url_parts),
+        collection.updated_at,
     )
 
 
@@ -177,6 +227,7 @@ async def update_collection(
 @router.delete("/{collection_id}")
 async def delete_collection(
     collection_id: int,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_read_write_user_id),
     db: AsyncSession = Depends(get_db)
 ):
@@ -191,9 +242,12 @@ async def delete_collection(
     if not existing:
         raise HTTPException(status_code=404, detail="Collection not found")
 
+    collage = existing.collage_key
     success = await collection_crud.delete_collection(db, collection_id)
     if not success:
         raise HTTPException(status_code=404, detail="Collection not found")
+    if collage:
+        background_tasks.add_task(collage_service.discard, collage)
 
     return {"status": "success"}
 
@@ -4,12 +4,14 @@ from typing import List
 from ...db.database import get_db
 from ...services.agent_service import AgentService
 from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi.responses import ORJSONResponse
 from ..schemas.recipe import (
     GenerateRecipeRequest, ChangeRecipeAIRequest, ChangeRecipeManualRequest, ChangeStateRequest,
-    AskQuestionRequest, Recipe, RecipePreview, PromptHistory, CookingSession
+    AskQuestionRequest, Recipe, RecipePreview, PromptHistory, CookingSession, CookingBundle
 )
 from ...utils.auth import get_read_write_user_id, get_read_only_user_id, get_user_id_optional, get_read_write_user_token_data
-from ...db.crud import cooking_crud
+from ...db.crud import cooking_crud, recipe_crud
+from .. import serializers
 from sqlalchemy.ext.asyncio import AsyncSession
 
 agent_service = AgentService()
@@ -47,6 +49,43 @@ async def get_session(cooking_session_id: int,
     )
     return result
 
+@router.get("/{cooking_session_id}/bundle", response_model=CookingBundle)
+async def get_bundle(cooking_session_id: int,
+                     db: AsyncSession = Depends(get_db),
+                     current_user_id: str = Depends(get_read_only_user_id)):
+    """
+    Retrieve everything needed to open the cooking view in one request.
+
+    Loads the session with the prompt history of its current state in one query and the
+    recipe with ingredients and steps from the recipe aggregate (cached, otherwise three
+    queries). Nothing is written: a state without history yields an empty history.
+
+    Args:
+        cooking_session_id (int): The ID of the cooking session.
+
+    Returns:
+        CookingBundle: The session, the recipe with its steps and the current prompt history.
+    """
+    row = await cooking_crud.get_cooking_session_with_history(db, cooking_session_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Cooking session not found")
+    session, history = row
+    if session.user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this cooking session")
+
+    recipe = await recipe_crud.get_recipe_aggregate(db, session.recipe_id)
+    if recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found for this cooking session")
+
+    return ORJSONResponse({
+        "session": {"id": session.id, "recipe_id": session.recipe_id, "state": session.state},
+        "recipe": serializers.recipe_aggregate_payload(recipe),
+        "history": {
+            "prompts": json.loads(history.prompts) if history else [],
+            "responses": json.loads(history.responses) if history else [],
+        },
+    })
+
 @router.get("/{cooking_session_id}/get_prompt_history", response_model=PromptHistory)
 async def get_prompt_history(cooking_session_id: int,
                             db: AsyncSession = Depends(get_db),
@@ -1,25 +1,48 @@
 # app/routes/files_deprecated.py
-import os
-import tempfile
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from typing import Optional
+
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...db.bucket_session import get_bucket_session, BucketSession
 from ...db.crud.bucket_base_repo import (
-    upload_file, make_file_public, generate_signed_get_url,
-    generate_signed_put_url, delete_file, file_exists, list_files, verify_user_access,
+    upload_stream, make_file_public, generate_signed_get_url,
+    generate_signed_put_url, delete_file, file_exists, verify_user_access, existing_keys, is_content_addressed_key,
 )
+from ...db.signed_url_cache import bucket_expires_at, signed_url_cache, ttl_bucket
 from ...db.database import get_db
 from ...utils.auth import get_read_write_user_id, get_read_only_user_id
 from ...db.crud.bucket_base_repo import get_file_info
-from ...db.crud import recipe_crud
+from ...db.crud import file_crud, recipe_crud
 
-from fastapi.responses import Response
-from ...db.crud.bucket_base_repo import get_file, get_file_info
+from fastapi.responses import Response, StreamingResponse
+from ...db.crud.bucket_base_repo import (
+    UPLOAD_CHUNK_BYTES, get_file_info, get_object_info, open_local_file, read_cached_range, stream_file,
+    write_object,
+)
+from ...db.local_storage import LocalBackend
+from ...db.models.db_recipe import StoredFile
+from ...db.storage_backends import ObjectInfo
+from ..file_response import FileRangeResponse
+from ..conditional import is_not_modified, make_etag, requested_range, validator_headers
+from ..schemas.file import SignedUrlsRequest, SignedUrlsResponse
+from ...services.collage_service import is_collage_key
 
 
 router = APIRouter(prefix="/files", tags=["files"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Content-addressed keys and collage keys never change their content
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MAX_LIST_PAGE_SIZE = 1000
+
+
+async def _read_chunks(file: UploadFile):
+    """Read an upload in resumable-upload sized chunks instead of all at once."""
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        yield chunk
+
+
 @router.post("/upload")
 async def upload(
     user_id: str = Form(...),
@@ -42,30 +65,17 @@ async def upload(
     if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="Forbidden: Cannot upload files for other users.")
 
-    # tempfile.gettempdir() works cross-platform (Windows: C:\Users\...\AppData\Local\Temp, Linux: /tmp)
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename is required")
-    suffix = os.path.splitext(file.filename)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        body = await file.read()
-        tmp.write(body)
-        tmp.flush()
-        tmp_path = tmp.name
-    try:
-        file_info = await upload_file(
-            sess, 
-            user_id, 
-            category,
-            tmp_path, 
-            file.filename, 
-            file.content_type
-        )
-        return file_info['key']
-    finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+    file_info = await upload_stream(
+        sess,
+        user_id,
+        category,
+        _read_chunks(file),
+        file.filename,
+        file.content_type
+    )
+    return file_info['key']
 
 
 
@@ -91,49 +101,130 @@ async def upload_public(
     if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="Forbidden: Cannot upload files for other users.")
 
-    # tempfile.gettempdir() works cross-platform (Windows: C:\Users\...\AppData\Local\Temp, Linux: /tmp)
-    suffix = os.path.splitext(file.filename)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        body = await file.read()
-        tmp.write(body)
-        tmp.flush()
-        tmp_path = tmp.name
-    try:
-        file_info = await upload_file( sess, user_id, category, tmp_path, file.filename, file.content_type)
-        public_meta = await make_file_public(sess, file_info['key'])
-        return public_meta['public_url']
-    finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Filename is required")
+    file_info = await upload_stream(sess, user_id, category, _read_chunks(file), file.filename, file.content_type)
+    public_meta = await make_file_public(sess, file_info['key'])
+    return public_meta['public_url']
 
 
 @router.get("/serve/{key:path}")
 async def serve_file(key: str,
+        request: Request,
         sess: BucketSession = Depends(get_bucket_session),
         user_id: str = Depends(get_read_write_user_id)):
-    """Serve file content directly with proper content type."""
+    """
+    Stream file content with proper content type.
+
+    One metadata request provides content type, size and generation; the content is then
+    streamed in chunks, so memory per download stays bounded. Supports a single byte range
+    (206) and answers If-None-Match with 304 using an ETag derived from the generation.
+    """
 
     # Verify user access
     verify_user_access(key, user_id)
 
-    # Get file info to determine content type
-    file_info = await get_file_info(sess, key)
+    info = await get_object_info(sess, key, cached=True)
+    if is_content_addressed_key(key) or is_collage_key(key):
+        return await _file_response(request, sess, info, IMMUTABLE_CACHE_CONTROL)
+    return await _file_response(request, sess, info, 'public, max-age=3600')  # Cache for 1 hour
 
-    # Get file bytes
-    file_bytes = await get_file(sess, key)
 
-    # Return file with proper content type
-    return Response(
-        content=file_bytes,
-        media_type=file_info.get('content_type', 'application/octet-stream'),
-        headers={
-            'Cache-Control': 'public, max-age=3600',  # Cache for 1 hour
-        }
+async def _file_response(request: Request, sess: BucketSession, info: ObjectInfo, cache_control: str) -> Response:
+    """Content of a file with validators, 304 and single-range (206) support.
+
+    Files of the local backend are sent zero-copy. Remote images come from the node-local
+    object_cache, everything else is streamed in chunks.
+    """
+    headers = validator_headers(make_etag(info.name, info.generation), info.updated)
+    headers['Cache-Control'] = cache_control
+    headers['Accept-Ranges'] = 'bytes'
+
+    if is_not_modified(request, headers['ETag']):
+        return Response(status_code=304, headers=headers)
+
+    size = info.size
+    byte_range = requested_range(request, size, headers['ETag'])
+    start, end = byte_range or (0, size - 1)
+    headers['Content-Length'] = str(end - start + 1)
+    if byte_range is not None:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    status_code = 206 if byte_range is not None else 200
+    media_type = info.content_type or 'application/octet-stream'
+
+    local_file = await open_local_file(sess, info)
+    if local_file is not None:
+        return FileRangeResponse(local_file, start, end, status_code, headers, media_type)
+    if size:
+        cached = await read_cached_range(sess, info, start, end)
+        if cached is not None:
+            return Response(cached, status_code=status_code, media_type=media_type, headers=headers)
+    return StreamingResponse(
+        stream_file(sess, info, start, end) if size else iter(()),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
     )
 
 
+def _local_backend(sess: BucketSession) -> LocalBackend:
+    if not isinstance(sess.backend, LocalBackend):
+        raise HTTPException(status_code=404, detail="Not found")
+    return sess.backend
+
+
+@router.get("/local/{key:path}")
+async def serve_local(key: str,
+        request: Request,
+        expires: Optional[int] = None,
+        signature: Optional[str] = None,
+        sess: BucketSession = Depends(get_bucket_session)):
+    """
+    Serve a file of the local storage backend via a signed URL (or a public file without one).
+
+    The counterpart of GCS signed GET URLs and public URLs: the signature is the only
+    authorization, no session cookie is needed.
+    """
+    backend = _local_backend(sess)
+    if signature is not None:
+        if expires is None or not backend.verify("GET", key, expires, signature):
+            raise HTTPException(status_code=403, detail="Invalid or expired signature")
+        cache_control = 'private, max-age=3600'
+    elif await backend.is_public(key):
+        cache_control = 'public, max-age=3600'
+    else:
+        raise HTTPException(status_code=403, detail="Signature required")
+
+    info = await get_object_info(sess, key)
+    return await _file_response(request, sess, info, cache_control)
+
+
+@router.put("/local/{key:path}")
+async def upload_local(key: str,
+        request: Request,
+        expires: int,
+        signature: str,
+        sess: BucketSession = Depends(get_bucket_session)):
+    """
+    Upload a file to the local storage backend via a signed PUT URL (see /files/signed-put).
+
+    Like a GCS signed PUT, the Content-Type header has to match the signed one and
+    x-goog-meta-* headers become the file's metadata.
+    """
+    backend = _local_backend(sess)
+    content_type = request.headers.get("content-type")
+    if not backend.verify("PUT", key, expires, signature, content_type):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+    metadata = {
+        name[len("x-goog-meta-"):]: value
+        for name, value in request.headers.items()
+        if name.startswith("x-goog-meta-")
+    }
+    await write_object(sess, key, request.stream(), content_type, metadata)
+    return Response(status_code=200)
+
+
 @router.get("/info/{key:path}")
 async def get_info(key: str, sess: BucketSession = Depends(get_bucket_session),
         user_id: str = Depends(get_read_only_user_id)):
@@ -166,6 +257,32 @@ async def signed_get(key: str, minutes: int = 60,
     return await generate_signed_get_url(sess, key, minutes)
 
 
+@router.post("/signed-urls", response_model=SignedUrlsResponse)
+async def signed_get_many(request: SignedUrlsRequest,
+    sess: BucketSession = Depends(get_bucket_session),
+    user_id: str = Depends(get_read_only_user_id)):
+    """
+    Generate signed GET URLs for many files at once.
+
+    Signing is local and cached, so no GCS request is made unless verify is set; then keys
+    of files that do not exist are returned in missing instead of being signed.
+    """
+    keys = list(dict.fromkeys(request.keys))
+    for key in keys:
+        verify_user_access(key, user_id)
+
+    missing = []
+    if request.verify:
+        found = await existing_keys(sess, keys)
+        missing = [key for key in keys if key not in found]
+        keys = [key for key in keys if key in found]
+
+    # Taken before signing: if the TTL bucket rolls over meanwhile, the URLs only live longer
+    expires_at = bucket_expires_at(request.minutes, ttl_bucket(request.minutes))
+    urls = await signed_url_cache.sign_many(sess, keys, request.minutes)
+    return SignedUrlsResponse(urls=urls, missing=missing, expires_at=expires_at)
+
+
 @router.post("/signed-put")
 async def signed_put(
     user_id: str,
@@ -173,9 +290,17 @@ async def signed_put(
     filename: str,
     content_type: str,
     minutes: int = 15,
-    sess: BucketSession = Depends(get_bucket_session)
+    sess: BucketSession = Depends(get_bucket_session),
+    current_user_id: str = Depends(get_read_write_user_id)
 ):
-    """Generate signed PUT URL for direct upload from client."""
+    """
+    Generate signed PUT URL for direct upload from client.
+
+    The upload bypasses the API, so its size and content are only checked when the key is
+    used, e.g. by /preparing/image-analysis/by-key.
+    """
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Forbidden: Cannot upload files for other users.")
 
     return await generate_signed_put_url(sess, user_id, category, filename, content_type, minutes)
 
@@ -193,25 +318,65 @@ async def exists(key: str,
 
 @router.get("/list")
 async def list_(
-    user_id: str, 
+    response: Response,
+    user_id: str,
     category: str = None,
     date_prefix: str = None,
-    max_results: int = 1000,
-    sess: BucketSession = Depends(get_bucket_session)
+    max_results: int = Query(MAX_LIST_PAGE_SIZE, ge=1, le=MAX_LIST_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: str = Depends(get_read_only_user_id)
 ):
     """
-    List files for a user.
-    
+    List files for a user, newest first, from the file index (no bucket listing).
+
+    One page of at most max_results files is returned; the cursor for the next page is sent
+    in the X-Next-Cursor header (absent on the last page).
+
     Args:
         user_id: User ID
         category: Optional filter by category (e.g., "recipes")
-        date_prefix: Optional filter by date (e.g., "01-10-2025" or "01-10")
-        max_results: Max number of results
+        date_prefix: Optional filter by date (e.g., "01-10-2025" or "01-10"), requires category
+        max_results: Page size
+        cursor: X-Next-Cursor value of the previous page
     """
-    items = await list_files(sess, user_id, category, date_prefix, max_results)
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Forbidden: Cannot list files of other users.")
+    after = _decode_cursor(cursor) if cursor else None
+    files, next_id = await file_crud.list_files(db, user_id, category, date_prefix, max_results, after)
+    if next_id is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_id)
+    items = [_indexed_file_info(file) for file in files]
     return {"files": items, "count": len(items)}
 
 
+@router.get("/usage")
+async def usage(db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_read_only_user_id)):
+    """Number and total size of the user's files, overall and per category."""
+    return await file_crud.get_usage(db, user_id)
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def _indexed_file_info(file: StoredFile) -> dict:
+    return {
+        "key": file.key,
+        "original_filename": file.original_filename or "unknown",
+        "content_type": file.content_type,
+        "size": file.size,
+        "category": file.category,
+        "sha256": file.sha256,
+        "uploaded_at": file.created_at.isoformat() if file.created_at else None,
+        "status": "exists",
+    }
+
+
 @router.delete("/{key:path}")
 async def delete_(key: str, sess: BucketSession = Depends(get_bucket_session),
     user_id: str = Depends(get_read_write_user_id)):
@@ -238,16 +403,16 @@ async def get_image_by_recipe_id(
     Returns:
         dict: {"image_url": str | null}
     """
-    recipe = await recipe_crud.get_recipe_by_id(db, recipe_id)
+    recipe = await recipe_crud.get_recipe_aggregate(db, recipe_id)
 
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
     # Verify the recipe belongs to the user
-    if recipe.user_id != user_id:
+    if recipe["user_id"] != user_id:
         raise HTTPException(status_code=403, detail="Forbidden: Recipe does not belong to the authenticated user")
 
-    return {"image_url": recipe.image_url}
+    return {"image_url": recipe["image_url"]}
 
 
 
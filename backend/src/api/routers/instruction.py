@@ -1,14 +1,16 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
 from ...db.database import get_db
 from ...services.agent_service import AgentService
 from ...utils.auth import get_read_write_user_id, get_read_only_user_id
-from ...db.crud import instruction_crud
+from ...db.crud import instruction_crud, recipe_crud
 from ..schemas.recipe import Instruction as InstructionSchema
+from .. import conditional
 
 
 agent_service = AgentService()
@@ -23,12 +25,15 @@ router = APIRouter(
 @router.get("/{recipe_id}", response_model=List[InstructionSchema])
 async def get_instructions(
     recipe_id: int,
+    request: Request,
     user_id: str = Depends(get_read_only_user_id),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get all instruction steps for a recipe.
 
+    Supports conditional requests: a matching If-None-Match is answered with 304.
+
     Args:
         recipe_id: The ID of the recipe
         user_id: The authenticated user ID
@@ -37,23 +42,26 @@ async def get_instructions(
     Returns:
         List[InstructionSchema]: List of instruction steps
     """
-    instruction_steps = await instruction_crud.get_instructions_by_recipe_id(db, recipe_id, user_id=user_id)
-
-    if not instruction_steps:
+    min_version = None
+    if request.headers.get("if-none-match"):
+        current = await recipe_crud.get_recipe_version(db, recipe_id)
+        if not current or current.user_id != user_id:
+            raise HTTPException(status_code=404, detail="No instructions found for this recipe")
+        etag = conditional.make_etag("instructions", recipe_id, current.version)
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag, current.updated_at)
+        min_version = current.version
+
+    recipe = await recipe_crud.get_recipe_aggregate(db, recipe_id, min_version=min_version)
+
+    if not recipe or recipe["user_id"] != user_id or not recipe["instructions"]:
         raise HTTPException(status_code=404, detail="No instructions found for this recipe")
-    
-
-
-    return [
-        InstructionSchema(
-            id=step.id,
-            heading=step.heading,
-            description=step.description,
-            animation=step.animation,
-            timer=step.timer,
-        )
-        for step in instruction_steps
-    ]
+
+    return conditional.with_validators(
+        ORJSONResponse(recipe["instructions"]),
+        conditional.make_etag("instructions", recipe_id, recipe["version"]),
+        recipe["updated_at"],
+    )
 
 
 @router.delete("/{recipe_id}")
@@ -5,9 +5,10 @@ from typing import List
 from ...db.database import get_db
 from ...services.agent_service import AgentService
 from fastapi import APIRouter, File, HTTPException, Depends, UploadFile
-from ..schemas.recipe import GenerateRecipeRequest, RecipePreview
+from ..schemas.recipe import GenerateRecipeRequest, ImageAnalysisRequest, RecipePreview
 from ...utils.auth import get_read_write_user_id, get_read_only_user_id
-from ...db.crud import recipe_crud, preparing_crud
+from ...db.crud import recipe_crud, preparing_crud, cleanup_crud
+from ...core import sweeper
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from ...db.models.db_recipe import PreparingSession
@@ -40,7 +41,8 @@ async def generate_recipes(request: GenerateRecipeRequest,
         request.prompt,
         request.written_ingredients,
         preparing_session_id=request.preparing_session_id,
-        background_tasks=background_tasks
+        background_tasks=background_tasks,
+        image_key=request.image_key,
     )
 
 @router.get("/{preparing_session_id}/get_options", response_model=List[RecipePreview])
@@ -82,19 +84,24 @@ async def get_recipe_options(preparing_session_id: int,
     return result
 
 @router.delete("/{preparing_session_id}/finish")
-async def finish_session(preparing_session_id: int, db: AsyncSession = Depends(get_db),
-                      user_id: str = Depends(get_read_only_user_id)):
+async def finish_session(preparing_session_id: int,
+                         background_tasks: BackgroundTasks,
+                         db: AsyncSession = Depends(get_db),
+                         user_id: str = Depends(get_read_only_user_id)):
     """
     Finish a preparing session based on the provided session ID.
 
+    Answers right away; the session and the user's unsaved recipes (with their images) are
+    deleted in the background. Recipes generated after this call are kept.
+
     Args:
         preparing_session_id (int): The ID of the preparing session.
-
-    Returns:
-        dict: A confirmation message.
     """
-
-    await preparing_crud.delete_preparing_session(db, preparing_session_id, user_id)
+    preparing_session = await preparing_crud.get_preparing_session_by_id(db, preparing_session_id, user_id)
+    if preparing_session is None:
+        return
+    max_recipe_id = await cleanup_crud.get_max_recipe_id(db)
+    background_tasks.add_task(sweeper.clean_up_finished_preparing_session, preparing_session_id, user_id, max_recipe_id)
     return
 
 
@@ -110,6 +117,18 @@ async def get_image_analysis_by_session_id(file: UploadFile = File(...),
     return analysis
 
 
+@router.post("/image-analysis/by-key")
+async def analyze_uploaded_image(request: ImageAnalysisRequest,
+                                 user_id: str = Depends(get_read_write_user_id)):
+    """
+    Analyze an ingredient photo that was uploaded directly to the bucket.
+
+    The client requests a signed PUT URL (/files/signed-put, category "image"), uploads the
+    photo to it and passes the returned key here, so the image bytes skip the API on upload.
+    """
+    return await agent_service.analyze_ingredients_by_key(user_id, request.image_key)
+
+
 @router.delete("/{preparing_session_id}/current-recipes/{recipe_id}")
 async def remove_current_recipe(
     preparing_session_id: int,
@@ -1,10 +1,13 @@
+import base64
+import binascii
 import json
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple, Union
 
 from ...db.database import get_db
 from ...services.agent_service import AgentService
-from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi import APIRouter, HTTPException, Body, Depends, Query, Request
 from fastapi import status
+from fastapi.responses import ORJSONResponse
 from ..schemas.recipe import (
     GenerateRecipeRequest,
     ChangeRecipeAIRequest,
@@ -13,6 +16,8 @@ from ..schemas.recipe import (
     AskQuestionRequest,
     Recipe as RecipeSchema,
     RecipePreview,
+    MatchIngredientsRequest,
+    IngredientMatch,
     PromptHistory,
     CookingSession,
     Ingredient as IngredientSchema,
@@ -27,11 +32,17 @@ router = APIRouter(
 
 from ...utils.auth import get_read_write_user_id, get_read_only_user_id, get_user_id_optional, get_read_write_user_token_data
 from ...db.crud import recipe_crud
+from ...db import signed_url_cache
+from .. import conditional, serializers
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 agent_service = AgentService()
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 router = APIRouter(
     prefix="/recipe",
     tags=["recipe"],
@@ -70,42 +81,149 @@ async def create_recipe(request: GenerateRecipeRequest, db: AsyncSession = Depen
 
 @router.get("/{recipe_id}/get", response_model=RecipeSchema)
 async def get_recipe(recipe_id: int,
+                     request: Request,
+                     signed_urls: bool = False,
                      db : AsyncSession = Depends(get_db),
                      user_id: str = Depends(get_read_only_user_id)):
     """
     Retrieve a recipe based on the provided recipe ID.
 
+    Supports conditional requests: a matching If-None-Match is answered with 304.
+
     Args:
         recipe_id (int): The ID of the recipe to retrieve.
+        signed_urls (bool): Embed a signed URL of the image as image_signed_url.
 
     Returns:
         Recipe: The retrieved recipe.
     """
+    url_parts = signed_url_cache.etag_parts(signed_urls)
+    min_version = None
+    if request.headers.get("if-none-match"):
+        current = await recipe_crud.get_recipe_version(db, recipe_id)
+        _check_recipe_owner(current.user_id if current else None, user_id)
+        etag = conditional.make_etag("recipe", recipe_id, current.version, *url_parts)
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag, current.updated_at)
+        min_version = current.version
+
+    recipe = await recipe_crud.get_recipe_aggregate(db, recipe_id, min_version=min_version)
+    _check_recipe_owner(recipe["user_id"] if recipe else None, user_id)
+    payload = serializers.recipe_aggregate_payload(recipe)
+    if signed_urls:
+        serializers.embed_image_urls([payload], await signed_url_cache.sign_image_keys([payload["image_url"]]))
+    return conditional.with_validators(
+        ORJSONResponse(payload),
+        conditional.make_etag("recipe", recipe_id, recipe["version"], *url_parts),
+        recipe["updated_at"],
+    )
 
-    recipe = await recipe_crud.get_recipe_by_id(db, recipe_id)
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    if recipe.user_id != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to access this recipe")
-    return _serialize_recipe(recipe)
-
-@router.get("/get_all", response_model=List[RecipeSchema])
-async def get_all_recipes(user_id: str = Depends(get_read_only_user_id),
+@router.get("/get_all", response_model=Union[List[RecipeSchema], List[RecipePreview]])
+async def get_all_recipes(request: Request,
+                          view: Literal["full", "preview"] = "full",
+                          limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                          cursor: Optional[str] = None,
+                          signed_urls: bool = False,
+                          user_id: str = Depends(get_read_only_user_id),
                           db : AsyncSession = Depends(get_db)):
     """
-    Retrieve all recipes for a given user ID.
+    Retrieve the saved recipes of the user, newest first.
+
+    Without limit and cursor all recipes are returned. Otherwise one page is returned and the
+    cursor for the next page is sent in the X-Next-Cursor header (absent on the last page).
+    Supports conditional requests: a matching If-None-Match is answered with 304.
 
     Args:
-        user_id (str): The user ID to retrieve recipes for.
+        view (str): "full" for recipes with ingredients and instructions, "preview" for card fields only.
+        limit (int): Page size.
+        cursor (str): X-Next-Cursor value of the previous page.
+        signed_urls (bool): Embed signed URLs of the images as image_signed_url.
     Returns:
-        List[Recipe]: A list of retrieved recipes.
+        List[Recipe] | List[RecipePreview]: The recipes of the requested page.
     """
-    recipes = await recipe_crud.get_all_recipes_by_user_id(db, user_id)
-    return [_serialize_recipe(recipe) for recipe in recipes]
+    if cursor is not None and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+
+    after = _decode_cursor(cursor) if cursor else None
+
+    if request.headers.get("if-none-match"):
+        versions, next_key = await recipe_crud.get_recipe_page_versions(db, user_id, limit=limit, after=after)
+        etag = _recipe_page_etag(view, versions, next_key, signed_urls)
+        if conditional.is_not_modified(request, etag):
+            response = conditional.not_modified(etag, conditional.latest(row.updated_at for row in versions))
+            if next_key is not None:
+                response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(next_key)
+            return response
+
+    items, next_key = await recipe_crud.get_recipe_page_by_user_id(
+        db,
+        user_id,
+        limit=limit,
+        after=after,
+        preview=view == "preview",
+    )
+    if view == "preview":
+        payload = [serializers.recipe_preview_payload(row) for row in items]
+    else:
+        payload = serializers.recipes_payload(items)
+    if signed_urls:
+        serializers.embed_image_urls(payload, await signed_url_cache.sign_image_keys(item["image_url"] for item in payload))
+
+    response = conditional.with_validators(
+        ORJSONResponse(payload),
+        _recipe_page_etag(view, items, next_key, signed_urls),
+        conditional.latest(item.updated_at for item in items),
+    )
+    if next_key is not None:
+        response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(next_key)
+    return response
                       
 
 
 
+@router.get("/search", response_model=List[RecipePreview])
+async def search_recipes(q: str = Query(..., min_length=1, max_length=200),
+                         limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                         offset: int = Query(0, ge=0),
+                         user_id: str = Depends(get_read_only_user_id),
+                         db: AsyncSession = Depends(get_db)):
+    """
+    Full-text search over the saved recipes of the user.
+
+    Matches title, description, ingredient names and instruction text; every word of the
+    query must match (as a prefix). Results are ranked by relevance.
+
+    Args:
+        q (str): The search query.
+        limit (int): Page size.
+        offset (int): Number of ranked results to skip.
+    Returns:
+        List[RecipePreview]: The matching recipes, best match first.
+    """
+    recipes = await recipe_crud.search_recipes_by_user_id(db, user_id, q, limit=limit, offset=offset)
+    return [RecipePreview(**row._mapping) for row in recipes]
+
+
+@router.post("/match_ingredients", response_model=List[IngredientMatch])
+async def match_ingredients(request: MatchIngredientsRequest,
+                            user_id: str = Depends(get_read_only_user_id),
+                            db: AsyncSession = Depends(get_db)):
+    """
+    Find the saved recipes of the user that can be cooked with the given ingredients.
+
+    Ingredient names are canonicalized ("2 fresh Tomatoes" -> "tomato") and looked up in the
+    ingredient index; pantry staples like salt, pepper and oil are ignored.
+
+    Args:
+        request (MatchIngredientsRequest): Available ingredients as list or free text.
+    Returns:
+        List[IngredientMatch]: Recipes with the highest share of covered ingredients first.
+    """
+    ingredients = [request.ingredients] if isinstance(request.ingredients, str) else request.ingredients
+    matches = await recipe_crud.match_recipes_by_ingredients(db, user_id, ingredients, limit=request.limit)
+    return [IngredientMatch(recipe=RecipePreview(**row._mapping), **match) for row, match in matches]
+
+
 @router.put("/change_ai", response_model=RecipeSchema)
 async def change_recipe_ai(request: ChangeRecipeAIRequest, 
                            user_id: str = Depends(get_read_write_user_id),
@@ -233,6 +351,22 @@ def _serialize_recipe(recipe) -> RecipeSchema:
     )
 
 
+def _check_recipe_owner(owner_id: Optional[str], user_id: str) -> None:
+    """Raise 404 for a missing recipe and 403 for a recipe of another user."""
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    if owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this recipe")
+
+
+def _recipe_page_etag(view: str, items, next_key: Optional[Tuple[str, int]], signed_urls: bool = False) -> str:
+    """ETag of a recipe page from the IDs and versions of its recipes."""
+    return conditional.make_etag(
+        "recipes", view, [(item.id, item.version) for item in items], next_key,
+        *signed_url_cache.etag_parts(signed_urls),
+    )
+
+
 def _serialize_instructions_payload(instructions: Optional[List[InstructionSchema]]) -> Optional[str]:
     """Convert instruction schemas to JSON string for persistence."""
     if instructions is None:
@@ -246,4 +380,19 @@ def _serialize_instructions_payload(instructions: Optional[List[InstructionSchem
             serialized.append(instruction)
         else:
             serialized.append({"Instruction": str(instruction), "timer": None})
-    return json.dumps(serialized)
\ No newline at end of file
+    return json.dumps(serialized)
+
+
+def _encode_cursor(key: Tuple[str, int]) -> str:
+    """Encode a recipe page key as an opaque cursor."""
+    created_at, recipe_id = key
+    return base64.urlsafe_b64encode(f"{created_at}|{recipe_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor produced by _encode_cursor."""
+    try:
+        created_at, recipe_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(recipe_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
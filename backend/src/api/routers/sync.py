@@ -0,0 +1,119 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config import settings
+from ...db.database import get_db, use_primary
+from ...db.crud import sync_crud
+from ...utils.auth import get_read_only_user_id
+from ..schemas.sync import SyncChanges
+from .. import serializers
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 2000
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+# On a lagging replica, settled entries may still be missing and the cursor would skip them
+@router.get("/changes", response_model=SyncChanges, dependencies=[Depends(use_primary)])
+async def get_changes(cursor: int = Query(0, ge=0),
+                      limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT),
+                      view: Literal["full", "preview"] = "full",
+                      user_id: str = Depends(get_read_only_user_id),
+                      db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve the changes of the user's saved recipes, collections and memberships since a cursor.
+
+    Start with cursor 0 for a full sync, then pass the returned cursor on the next call; while
+    has_more is true, more changes are waiting. Every entity appears at most once per page,
+    with its current state. Deleting a recipe or a collection also removes its memberships
+    without separate entries. Changes are served a few seconds (SYNC_COMMIT_LAG_SECONDS) after
+    they were made.
+
+    A cursor older than the retained change log is answered with 410 and a detail of the form
+    {"reason": "resync_required", "cursor": <cursor>}: the client reloads all its recipes and
+    collections and continues from the given cursor, which is never older than the retained log.
+
+    Args:
+        cursor (int): Cursor returned by the previous call, 0 for everything.
+        limit (int): Maximum number of change log entries to process.
+        view (str): "full" for recipes with ingredients and instructions, "preview" for card fields only.
+
+    Returns:
+        SyncChanges: The coalesced changes and the next cursor.
+    """
+    settled_before = await sync_crud.get_settled_before(db, settings.SYNC_COMMIT_LAG_SECONDS)
+    oldest_cursor = await sync_crud.get_oldest_cursor(db)
+    if oldest_cursor is not None and cursor < oldest_cursor:
+        # Users without retained entries continue from the start of the retained log
+        latest_cursor = await sync_crud.get_latest_cursor(db, user_id, settled_before)
+        raise HTTPException(status_code=410, detail={
+            "reason": "resync_required",
+            "cursor": max(latest_cursor, oldest_cursor),
+        })
+    changes, next_cursor, has_more = await sync_crud.get_changes(db, user_id, cursor, limit, settled_before)
+
+    upserted_ids = {entity: [] for entity in (sync_crud.RECIPE, sync_crud.COLLECTION)}
+    deleted_ids = {entity: [] for entity in (sync_crud.RECIPE, sync_crud.COLLECTION)}
+    memberships = {sync_crud.UPSERT: [], sync_crud.DELETE: []}
+    for (entity, entity_id), op in changes.items():
+        if entity == sync_crud.MEMBERSHIP:
+            collection_id, recipe_id = (int(part) for part in entity_id.split(":"))
+            memberships[op].append((collection_id, recipe_id))
+        elif op == sync_crud.DELETE:
+            deleted_ids[entity].append(int(entity_id))
+        else:
+            upserted_ids[entity].append(int(entity_id))
+
+    recipes = await sync_crud.get_synced_recipes(db, user_id, upserted_ids[sync_crud.RECIPE], full=view == "full")
+    collections = await sync_crud.get_synced_collections(db, user_id, upserted_ids[sync_crud.COLLECTION])
+    # Entities deleted after an upsert on this page no longer exist
+    found_recipes = {recipe.id for recipe in recipes}
+    found_collections = {collection.id for collection in collections}
+    deleted_ids[sync_crud.RECIPE] += [i for i in upserted_ids[sync_crud.RECIPE] if i not in found_recipes]
+    deleted_ids[sync_crud.COLLECTION] += [i for i in upserted_ids[sync_crud.COLLECTION] if i not in found_collections]
+    existing = await sync_crud.get_existing_memberships(db, user_id, memberships[sync_crud.UPSERT])
+
+    if view == "preview":
+        recipe_payload = [serializers.recipe_preview_payload(recipe) for recipe in recipes]
+    else:
+        recipe_payload = serializers.recipes_payload(recipes)
+
+    return ORJSONResponse({
+        "cursor": next_cursor,
+        "has_more": has_more,
+        "recipes": {"upserted": recipe_payload, "deleted": sorted(deleted_ids[sync_crud.RECIPE])},
+        "collections": {
+            "upserted": [
+                {
+                    "id": collection.id,
+                    "name": collection.name,
+                    "description": collection.description,
+                    "owner_id": collection.owner_id,
+                    "created_at": collection.created_at,
+                }
+                for collection in collections
+            ],
+            "deleted": sorted(deleted_ids[sync_crud.COLLECTION]),
+        },
+        "memberships": {
+            "added": [
+                {"collection_id": collection_id, "recipe_id": recipe_id}
+                for collection_id, recipe_id in memberships[sync_crud.UPSERT]
+                if (collection_id, recipe_id) in existing
+            ],
+            "removed": [
+                {"collection_id": collection_id, "recipe_id": recipe_id}
+                for collection_id, recipe_id in memberships[sync_crud.DELETE] + [
+                    membership for membership in memberships[sync_crud.UPSERT] if membership not in existing
+                ]
+            ],
+        },
+    })
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+
+class BatchSubRequest(BaseModel):
+    """A read request executed as part of a batch."""
+    id: Optional[str] = None  # Echoed in the response to match results to requests
+    method: Literal["GET"] = "GET"
+    path: str  # Path with optional query string, e.g. "/recipe/12/get" or "/recipe/get_all?view=preview"
+    headers: Dict[str, str] = Field(default_factory=dict)  # e.g. If-None-Match
+
+
+class BatchRequest(BaseModel):
+    """Schema for executing several read requests in one round trip."""
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=20)
+
+
+class BatchSubResponse(BaseModel):
+    """Result of a single request of a batch."""
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = Field(default_factory=dict)
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    """Results of a batch, in the order of the requests."""
+    responses: List[BatchSubResponse]
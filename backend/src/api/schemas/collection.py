@@ -29,6 +29,9 @@ class CollectionPreview(BaseModel):
     created_at: datetime
     recipe_count: int = 0
     preview_image_urls: List[str] = []
+    preview_image_signed_urls: List[str] = []  # Only set when requested with signed_urls=true
+    collage_image_url: Optional[str] = None  # WebP collage of the preview images, None while (re)rendering
+    collage_image_signed_url: Optional[str] = None  # Only set when requested with signed_urls=true
     recipe_ids: List[int] = []  # List of recipe IDs in this collection
 
     class Config:
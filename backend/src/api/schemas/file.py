@@ -1,8 +1,12 @@
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 
 from fastapi import UploadFile
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from ...db.signed_url_cache import MAX_TTL_MINUTES
+
+MAX_SIGNED_URL_KEYS = 200
 
 
 class Document(BaseModel):
@@ -34,4 +38,18 @@ class ImageInfo(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class SignedUrlsRequest(BaseModel):
+    """Schema for signing GET URLs for several files at once."""
+    keys: List[str] = Field(..., min_length=1, max_length=MAX_SIGNED_URL_KEYS)
+    minutes: int = Field(60, ge=1, le=MAX_TTL_MINUTES)  # Minimum validity of the returned URLs
+    verify: bool = False  # Check that the files exist (one GCS request per key)
+
+
+class SignedUrlsResponse(BaseModel):
+    """Schema for signed GET URLs by key; missing lists keys that failed verification."""
+    urls: Dict[str, str]
+    missing: List[str] = []
+    expires_at: datetime
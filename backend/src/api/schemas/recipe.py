@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional, Literal
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional, Literal, Union
 
 class Ingredient(BaseModel):
     """Schema representing an ingredient."""
@@ -25,6 +26,7 @@ class Recipe(BaseModel):
     ingredients: List[Ingredient]
     instructions: List[Instruction]
     image_url: Optional[str] = None
+    image_signed_url: Optional[str] = None  # Only set when requested with signed_urls=true
     total_time_minutes: Optional[int] = None
     difficulty: Optional[Literal["easy", "medium", "hard"]] = None
     food_category: Optional[Literal["vegan", "vegetarian", "beef", "pork", "chicken", "lamb", "fish", "seafood", "mixed-meat", "alcoholic", "non-alcoholic"]] = None
@@ -40,14 +42,29 @@ class RecipePreview(BaseModel):
     title: str
     description: str
     image_url: Optional[str] = None
+    image_signed_url: Optional[str] = None  # Only set when requested with signed_urls=true
     total_time_minutes: Optional[int] = None
     difficulty: Optional[Literal["easy", "medium", "hard"]] = None
     food_category: Optional[Literal["vegan", "vegetarian", "beef", "pork", "chicken", "lamb", "fish", "seafood", "mixed-meat", "alcoholic", "non-alcoholic"]] = None
     suggested_collection: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class MatchIngredientsRequest(BaseModel):
+    """Schema for finding saved recipes that can be cooked with the available ingredients."""
+    ingredients: Union[List[str], str]  # list or free text, e.g. the image analysis output
+    limit: int = Field(10, ge=1, le=50)
+
+class IngredientMatch(BaseModel):
+    """Schema for a saved recipe ranked by ingredient coverage."""
+    recipe: RecipePreview
+    matched_count: int
+    total_count: int
+    coverage: float
+    missing_ingredients: List[str]
+
 class CookingSession(BaseModel):
     """Schema for a cooking session."""
     id: int
@@ -65,14 +82,25 @@ class PromptHistory(BaseModel):
     class Config:
         from_attributes = True
 
+class CookingBundle(BaseModel):
+    """Schema for everything the cooking view needs: session, recipe with steps and current history."""
+    session: CookingSession
+    recipe: Recipe
+    history: PromptHistory
+
 class GenerateRecipeRequest(BaseModel):
     """Schema for generating recipes using AI."""
     prompt: str
     written_ingredients: str
-    image_key: str
+    image_key: Optional[str] = None  # ingredient photo uploaded via /files/signed-put, "" for none
     preparing_session_id: Optional[int] = None
 
 
+class ImageAnalysisRequest(BaseModel):
+    """Schema for analyzing an ingredient photo that was uploaded directly to the bucket."""
+    image_key: str
+
+
 class ChangeRecipeAIRequest(BaseModel):
     """Schema for changing a recipe using AI."""
     change_prompt: str
@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from typing import List, Optional, Union
+from datetime import datetime
+
+from .recipe import Recipe, RecipePreview
+
+
+class SyncedCollection(BaseModel):
+    """Schema for a collection in the change feed (memberships are synced separately)."""
+    id: int
+    name: str
+    description: Optional[str] = None
+    owner_id: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class Membership(BaseModel):
+    """Schema for a recipe being part of a collection."""
+    collection_id: int
+    recipe_id: int
+
+
+class RecipeChanges(BaseModel):
+    """Saved recipes created or changed, and removed (deleted or unsaved) since the cursor."""
+    upserted: Union[List[Recipe], List[RecipePreview]] = []
+    deleted: List[int] = []
+
+
+class CollectionChanges(BaseModel):
+    """Collections created or changed, and deleted since the cursor."""
+    upserted: List[SyncedCollection] = []
+    deleted: List[int] = []
+
+
+class MembershipChanges(BaseModel):
+    """Memberships added and removed since the cursor."""
+    added: List[Membership] = []
+    removed: List[Membership] = []
+
+
+class SyncChanges(BaseModel):
+    """Schema for one page of the delta-sync change feed."""
+    cursor: int  # Pass as cursor of the next request
+    has_more: bool  # More changes follow, request again right away
+    recipes: RecipeChanges
+    collections: CollectionChanges
+    memberships: MembershipChanges
@@ -0,0 +1,103 @@
+"""
+Fast serialization path for large recipe and collection responses.
+
+The regular path builds nested pydantic models per row, lets FastAPI validate them again
+against response_model and encodes the result with the stdlib json module. For recipe
+libraries with thousands of entries most of the request time goes there.
+
+The functions below project ORM rows (or cached aggregates) directly to plain dicts with
+exactly the fields of the corresponding schema, and ORJSONResponse encodes them with
+orjson (datetimes as ISO 8601, like pydantic). Endpoints keep their response_model for the
+OpenAPI schema, but FastAPI skips validation when an endpoint returns a Response instance. The output is identical to the
+regular path; src/test/test_serialization.py checks that.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_IMPORTANT_NOTES = "No special notes provided."
+DEFAULT_COOKING_OVERVIEW = "Follow the instructions sequentially to complete the recipe."
+
+PREVIEW_FIELDS = (
+    "id", "title", "description", "image_url", "image_signed_url", "total_time_minutes", "difficulty",
+    "food_category", "suggested_collection", "created_at",
+)
+
+
+def _optional_float(value: Optional[float]) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def recipe_payload(recipe) -> dict:
+    """Project an ORM recipe with loaded ingredients and instruction steps to the Recipe schema."""
+    return {
+        "id": recipe.id,
+        "title": recipe.title,
+        "description": recipe.description,
+        "prompt": recipe.prompt,
+        "ingredients": [
+            {
+                "id": ingredient.id,
+                "name": ingredient.name,
+                "quantity": _optional_float(ingredient.quantity),
+                "unit": ingredient.unit,
+            }
+            for ingredient in recipe.ingredients
+        ],
+        "instructions": [
+            {
+                "id": step.id,
+                "heading": step.heading,
+                "description": step.description,
+                "animation": step.animation,
+                "timer": step.timer,
+            }
+            for step in recipe.instruction_steps or ()
+        ],
+        "image_url": recipe.image_url,
+        "image_signed_url": None,
+        "total_time_minutes": recipe.total_time_minutes,
+        "difficulty": recipe.difficulty,
+        "food_category": recipe.food_category,
+        "important_notes": recipe.important_notes or DEFAULT_IMPORTANT_NOTES,
+        "cooking_overview": recipe.cooking_overview or DEFAULT_COOKING_OVERVIEW,
+    }
+
+
+def recipe_aggregate_payload(recipe: dict) -> dict:
+    """Project a cached recipe aggregate (see recipe_crud.get_recipe_aggregate) to the Recipe schema."""
+    return {
+        "id": recipe["id"],
+        "title": recipe["title"],
+        "description": recipe["description"],
+        "prompt": recipe["prompt"],
+        "ingredients": [
+            {**ingredient, "quantity": _optional_float(ingredient["quantity"])}
+            for ingredient in recipe["ingredients"]
+        ],
+        "instructions": recipe["instructions"],
+        "image_url": recipe["image_url"],
+        "image_signed_url": None,
+        "total_time_minutes": recipe["total_time_minutes"],
+        "difficulty": recipe["difficulty"],
+        "food_category": recipe["food_category"],
+        "important_notes": recipe["important_notes"] or DEFAULT_IMPORTANT_NOTES,
+        "cooking_overview": recipe["cooking_overview"] or DEFAULT_COOKING_OVERVIEW,
+    }
+
+
+def recipe_preview_payload(row) -> dict:
+    """Project a recipe card row (recipe_crud.RECIPE_CARD_COLUMNS) or ORM recipe to the RecipePreview schema."""
+    mapping = getattr(row, "_mapping", None)
+    if mapping is not None:
+        return {field: mapping.get(field) for field in PREVIEW_FIELDS}
+    return {field: getattr(row, field, None) for field in PREVIEW_FIELDS}
+
+
+def recipes_payload(recipes: Iterable[Any]) -> List[dict]:
+    """Project a list of ORM recipes to Recipe schema dicts."""
+    return [recipe_payload(recipe) for recipe in recipes]
+
+
+def embed_image_urls(payloads: Iterable[dict], urls: Dict[str, str]) -> None:
+    """Set image_signed_url of recipe payloads from signed URLs by image key (see signed_url_cache)."""
+    for payload in payloads:
+        payload["image_signed_url"] = urls.get(payload["image_url"])
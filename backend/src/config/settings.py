@@ -53,6 +53,94 @@ DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
 DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_PREWARM = os.getenv("DB_POOL_PREWARM", "true").lower() == "true"  # open DB_POOL_SIZE connections at startup
+# Local SQLite: pool connections (WAL journal) instead of opening one per session
+DB_SQLITE_POOLED = os.getenv("DB_SQLITE_POOLED", "true").lower() == "true"
+DB_SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Optional read replica for read-only GET endpoints (same credentials and database name).
+# DATABASE_REPLICA_URL takes precedence over DB_REPLICA_HOST, e.g. for a local SQLite copy.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT")
+# Reads of a user go to the primary for this long after one of their writes (read-your-writes)
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+# An unreachable replica is retried after this long; reads go to the primary meanwhile
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+# Entity cache settings (recipe aggregates, collection overviews)
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() == "true"
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "2048"))
+ENTITY_CACHE_TTL_SECONDS = int(os.getenv("ENTITY_CACHE_TTL_SECONDS", "300"))
+ENTITY_CACHE_REDIS_URL = os.getenv("ENTITY_CACHE_REDIS_URL")  # optional shared tier across workers
+
+# Write-behind buffer for cooking step changes (per process; enable only with a single worker
+# or sticky sessions, other workers read the buffered state at the latest after one interval)
+COOKING_STATE_WRITE_BEHIND = os.getenv("COOKING_STATE_WRITE_BEHIND", "false").lower() == "true"
+COOKING_STATE_FLUSH_INTERVAL_SECONDS = float(os.getenv("COOKING_STATE_FLUSH_INTERVAL_SECONDS", "2"))
+
+# Sweeper for abandoned temporary data (unsaved recipes, preparing sessions) and their images
+TEMP_DATA_SWEEPER_ENABLED = os.getenv("TEMP_DATA_SWEEPER_ENABLED", "true").lower() == "true"
+TEMP_DATA_TTL_HOURS = float(os.getenv("TEMP_DATA_TTL_HOURS", "24"))
+TEMP_DATA_SWEEP_INTERVAL_MINUTES = float(os.getenv("TEMP_DATA_SWEEP_INTERVAL_MINUTES", "15"))
+TEMP_DATA_SWEEP_BATCH_SIZE = int(os.getenv("TEMP_DATA_SWEEP_BATCH_SIZE", "500"))
+
+# Delta-sync change log (/sync/changes). Entries are served once they are SYNC_COMMIT_LAG_SECONDS
+# old, so an entry whose transaction commits after one with a higher id is not skipped; entries
+# older than SYNC_RETENTION_DAYS are pruned (0 keeps them), clients behind that resync.
+SYNC_COMMIT_LAG_SECONDS = float(os.getenv("SYNC_COMMIT_LAG_SECONDS", "5"))
+SYNC_RETENTION_DAYS = float(os.getenv("SYNC_RETENTION_DAYS", "30"))
+SYNC_PRUNE_INTERVAL_MINUTES = float(os.getenv("SYNC_PRUNE_INTERVAL_MINUTES", "60"))
+SYNC_PRUNE_BATCH_SIZE = int(os.getenv("SYNC_PRUNE_BATCH_SIZE", "5000"))
+
+# Signed GET URLs are reused within a TTL bucket (see db/signed_url_cache.py)
+SIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv("SIGNED_URL_CACHE_MAX_ENTRIES", "10000"))
+SIGNED_URL_EMBED_MINUTES = int(os.getenv("SIGNED_URL_EMBED_MINUTES", "60"))  # TTL of URLs embedded in payloads
+
+# Google Cloud Storage: talk to the JSON API with the native async client instead of running the
+# synchronous client in threads. GCS_API_ENDPOINT overrides the API host (emulators, tests).
+GCS_NATIVE_ASYNC = os.getenv("GCS_NATIVE_ASYNC", "false").lower() == "true"
+GCS_MAX_CONCURRENCY = int(os.getenv("GCS_MAX_CONCURRENCY", "64"))
+GCS_API_ENDPOINT = os.getenv("GCS_API_ENDPOINT")
+
+# Node-local cache of hot image bytes served via /files/serve (see db/object_cache.py).
+# OBJECT_CACHE_DISK_MB=0 disables the disk tier; OBJECT_CACHE_DIR defaults to the temp dir.
+OBJECT_CACHE_ENABLED = os.getenv("OBJECT_CACHE_ENABLED", "true").lower() == "true"
+OBJECT_CACHE_MEMORY_MB = float(os.getenv("OBJECT_CACHE_MEMORY_MB", "64"))
+OBJECT_CACHE_DISK_MB = float(os.getenv("OBJECT_CACHE_DISK_MB", "512"))
+OBJECT_CACHE_DIR = os.getenv("OBJECT_CACHE_DIR")
+OBJECT_CACHE_MAX_OBJECT_MB = float(os.getenv("OBJECT_CACHE_MAX_OBJECT_MB", "5"))  # larger objects are never cached
+OBJECT_CACHE_INFO_TTL_SECONDS = float(os.getenv("OBJECT_CACHE_INFO_TTL_SECONDS", "60"))
+
+# Object storage backend: "gcs" or "local" (files under STORAGE_LOCAL_ROOT, served and signed by
+# the API itself under STORAGE_LOCAL_BASE_URL/files/local; development and single-node setups)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs").lower()
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "./storage")
+STORAGE_LOCAL_BASE_URL = os.getenv("STORAGE_LOCAL_BASE_URL", "http://localhost:8000/api")
+STORAGE_LOCAL_SIGNING_KEY = os.getenv("STORAGE_LOCAL_SIGNING_KEY") or SECRET_KEY
+
+# Record uploads and deletes in the files table, which serves /files/list and /files/usage
+FILE_INDEX_ENABLED = os.getenv("FILE_INDEX_ENABLED", "true").lower() == "true"
+
+# Content-addressed storage: uploads are keyed by the SHA-256 of their bytes within the user's
+# category (users/<id>/<category>/sha256/<hash>.<ext>), so identical bytes are stored once.
+# The blob sweep recounts references from recipe and user rows and deletes objects that stayed
+# unreferenced for BLOB_GC_GRACE_HOURS. Needs FILE_INDEX_ENABLED.
+CONTENT_ADDRESSED_STORAGE = os.getenv("CONTENT_ADDRESSED_STORAGE", "false").lower() == "true"
+BLOB_GC_GRACE_HOURS = float(os.getenv("BLOB_GC_GRACE_HOURS", "24"))
+BLOB_GC_INTERVAL_MINUTES = float(os.getenv("BLOB_GC_INTERVAL_MINUTES", "60"))
+BLOB_GC_BATCH_SIZE = int(os.getenv("BLOB_GC_BATCH_SIZE", "500"))
+
+# Ingredient photos uploaded directly to the bucket (signed PUT) and analyzed by key
+IMAGE_ANALYSIS_MAX_MB = float(os.getenv("IMAGE_ANALYSIS_MAX_MB", "10"))
+IMAGE_ANALYSIS_CACHE_ENTRIES = int(os.getenv("IMAGE_ANALYSIS_CACHE_ENTRIES", "1024"))
+
+# Server-rendered WebP collage of the preview images of each collection
+COLLAGE_ENABLED = os.getenv("COLLAGE_ENABLED", "true").lower() == "true"
+COLLAGE_WIDTH_PX = int(os.getenv("COLLAGE_WIDTH_PX", "640"))
+COLLAGE_HEIGHT_PX = int(os.getenv("COLLAGE_HEIGHT_PX", "480"))
+COLLAGE_WEBP_QUALITY = int(os.getenv("COLLAGE_WEBP_QUALITY", "80"))
 
 
 # Google OAuth settings
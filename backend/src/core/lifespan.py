@@ -4,9 +4,12 @@ from contextlib import asynccontextmanager
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from fastapi import FastAPI
 
-from ..db.database import get_engine, Base, get_async_db_context
-from ..db.bucket_session import get_bucket_engine
+from ..db.database import get_engine, get_replica_engine, Base, get_async_db_context, warm_pool
+from ..db.bucket_session import get_bucket_engine, shutdown_bucket_engine
 from ..db.seed_data import seed_mock_data
+from ..db.migrations import run_migrations
+from ..db.cooking_state_buffer import cooking_state_buffer
+from .sweeper import schedule_sweeper
 from ..config import settings
 
 
@@ -36,8 +39,14 @@ async def lifespan(_app: FastAPI):
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
             await conn.run_sync(db_recipe.Base.metadata.create_all)
+            await run_migrations(conn)
 
         logger.info("✅ Database tables created/verified")
+
+        if settings.DB_POOL_PREWARM:
+            opened = await warm_pool(engine)
+            opened_replica = await warm_pool(await get_replica_engine())
+            logger.info("✅ Database pool pre-warmed (%d primary, %d replica connections)", opened, opened_replica)
         
         # Seed mock data for local development
         #if settings.DATABASE_URL and settings.DATABASE_URL.startswith("sqlite"):
@@ -48,8 +57,12 @@ async def lifespan(_app: FastAPI):
         # Initialize bucket engine
         bucket_engine = await get_bucket_engine()
         logger.info("✅ Bucket engine initialized")
-        
-        logger.info("Scheduler started.")   
+
+        cooking_state_buffer.start()
+
+        schedule_sweeper(scheduler)
+        scheduler.start()
+        logger.info("Scheduler started.")
 
         yield
     except Exception as e:  # noqa: BLE001
@@ -57,6 +70,8 @@ async def lifespan(_app: FastAPI):
         raise
     finally:
         logger.info("Shutting down application...")
+        await cooking_state_buffer.stop()
+        await shutdown_bucket_engine()
         if scheduler.running:
             scheduler.shutdown()
             logger.info("Scheduler stopped.")
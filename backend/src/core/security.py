@@ -1,3 +1,5 @@
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
@@ -46,8 +48,30 @@ def create_refresh_token(data: dict) -> str:
     return create_token(data, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
 
 
+# Verified payloads by token, so that the several auth dependencies of one request (or the
+# sub-requests of a batch) verify the signature once. Entries are only used until "exp".
+_DECODED_TOKENS_MAX = 1024
+_decoded_tokens: "OrderedDict[str, Dict]" = OrderedDict()
+
+
 def decode_token(token: str) -> Dict:
     """Decode a JWT token and return the payload."""
+    payload = _decoded_tokens.get(token)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            _decoded_tokens.move_to_end(token)
+            return dict(payload)
+        del _decoded_tokens[token]
+
+    payload = _decode_token_uncached(token)
+    if "exp" in payload:
+        _decoded_tokens[token] = dict(payload)
+        while len(_decoded_tokens) > _DECODED_TOKENS_MAX:
+            _decoded_tokens.popitem(last=False)
+    return payload
+
+
+def _decode_token_uncached(token: str) -> Dict:
     try:
         if ALGORITHM == "HS256":
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
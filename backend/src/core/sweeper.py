@@ -0,0 +1,252 @@
+"""
+Background cleanup of temporary data.
+
+Recipe generation creates unsaved (temporary) recipes and preparing sessions. They are removed
+when the user finishes the preparing session, or by the periodic sweep once they are older
+than TEMP_DATA_TTL_HOURS (abandoned sessions). Deletion is set-based and chunked (see
+cleanup_crud); the images of deleted recipes are removed from the bucket afterwards.
+
+Content-addressed images (CONTENT_ADDRESSED_STORAGE) may be shared by several recipes, so they
+are never deleted with a recipe. The blob sweep recounts their references from the recipe and
+user rows and deletes those that stayed unreferenced for BLOB_GC_GRACE_HOURS.
+
+The delta-sync change log is pruned to SYNC_RETENTION_DAYS.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from ..config import settings
+from ..db.bucket_session import get_async_bucket_session
+from ..db.crud import cleanup_crud, file_crud, sync_crud
+from ..db.crud.bucket_base_repo import delete_object, is_content_addressed_key
+from ..db.database import get_async_db_context
+from ..utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+SWEEP_JOB_ID = "sweep_temporary_data"
+BLOB_SWEEP_JOB_ID = "sweep_unreferenced_blobs"
+SYNC_PRUNE_JOB_ID = "prune_sync_changes"
+IMAGE_DELETE_CONCURRENCY = 8
+
+_stats: Dict[str, Any] = {
+    "runs": 0,
+    "failed_runs": 0,
+    "finished_sessions_cleaned": 0,
+    "recipes_deleted": 0,
+    "preparing_sessions_deleted": 0,
+    "images_deleted": 0,
+    "image_errors": 0,
+    "last_run_at": None,
+    "last_run_ms": None,
+    "blob_sweeps": 0,
+    "blobs_deleted": 0,
+    "blob_errors": 0,
+    "last_blob_sweep_ms": None,
+    "sync_changes_pruned": 0,
+}
+
+
+async def delete_images(keys: Iterable[str]) -> int:
+    """Delete bucket objects by key, ignoring missing ones. Returns the number deleted."""
+    keys = [
+        key for key in dict.fromkeys(keys)
+        if key and not key.startswith(("http://", "https://")) and not is_content_addressed_key(key)
+    ]
+    if not keys:
+        return 0
+
+    semaphore = asyncio.Semaphore(IMAGE_DELETE_CONCURRENCY)
+    deleted = 0
+
+    async with get_async_bucket_session() as sess:
+        async def _delete(key: str) -> None:
+            nonlocal deleted
+            async with semaphore:
+                try:
+                    if await delete_object(sess, key):
+                        deleted += 1
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("Deleting image %s failed: %s", key, e)
+                    _stats["image_errors"] += 1
+
+        await asyncio.gather(*(_delete(key) for key in keys))
+
+    _stats["images_deleted"] += deleted
+    return deleted
+
+
+async def _delete_images_safely(keys) -> None:
+    try:
+        await delete_images(keys)
+    except Exception as e:  # noqa: BLE001
+        # e.g. bucket not configured in local development
+        logger.warning("Image cleanup skipped: %s", e)
+        _stats["image_errors"] += len(keys)
+
+
+async def sweep_temporary_data() -> Dict[str, int]:
+    """Delete temporary recipes and preparing sessions older than TEMP_DATA_TTL_HOURS."""
+    started = time.perf_counter()
+    # created_at is written by the database in UTC
+    cutoff = datetime.utcnow() - timedelta(hours=settings.TEMP_DATA_TTL_HOURS)
+    batch_size = settings.TEMP_DATA_SWEEP_BATCH_SIZE
+    try:
+        async with get_async_db_context() as db:
+            recipes, image_keys = await cleanup_crud.delete_temporary_recipes(
+                db, created_before=cutoff, batch_size=batch_size
+            )
+            sessions = await cleanup_crud.delete_preparing_sessions(db, created_before=cutoff, batch_size=batch_size)
+        await _delete_images_safely(image_keys)
+    except Exception:
+        _stats["failed_runs"] += 1
+        logger.exception("Sweeping temporary data failed")
+        raise
+    finally:
+        _stats["runs"] += 1
+        _stats["last_run_at"] = datetime.utcnow().isoformat()
+        _stats["last_run_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    _stats["recipes_deleted"] += recipes
+    _stats["preparing_sessions_deleted"] += sessions
+    if recipes or sessions:
+        logger.info("Swept %d temporary recipes and %d preparing sessions", recipes, sessions)
+    return {"recipes": recipes, "preparing_sessions": sessions, "images": len(image_keys)}
+
+
+async def clean_up_finished_preparing_session(preparing_session_id: int,
+                                              user_id: str,
+                                              max_recipe_id: Optional[int] = None) -> None:
+    """Delete a finished preparing session and the user's temporary recipes up to max_recipe_id.
+
+    Runs after the /finish response; max_recipe_id keeps recipes generated after finishing.
+    """
+    try:
+        async with get_async_db_context() as db:
+            recipes, image_keys = await cleanup_crud.delete_temporary_recipes(
+                db, user_id=user_id, max_recipe_id=max_recipe_id, batch_size=settings.TEMP_DATA_SWEEP_BATCH_SIZE
+            )
+            sessions = await cleanup_crud.delete_preparing_sessions(db, preparing_session_id=preparing_session_id)
+        await _delete_images_safely(image_keys)
+    except Exception:  # noqa: BLE001
+        # The periodic sweep picks the data up later
+        logger.exception("Cleaning up preparing session %s failed", preparing_session_id)
+        return
+    _stats["finished_sessions_cleaned"] += 1
+    _stats["recipes_deleted"] += recipes
+    _stats["preparing_sessions_deleted"] += sessions
+
+
+async def sweep_unreferenced_blobs() -> int:
+    """Delete content-addressed objects unreferenced for longer than BLOB_GC_GRACE_HOURS.
+
+    Each object is claimed (its files row deleted, see file_crud.claim_unreferenced) and removed
+    from the bucket within one transaction, so a concurrent upload of the same bytes waits and
+    stores the object again instead of pointing at a deleted one.
+
+    Returns:
+        The number of deleted objects.
+    """
+    started = time.perf_counter()
+    # unreferenced_since is written in UTC, like created_at
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=settings.BLOB_GC_GRACE_HOURS)
+    deleted = 0
+    try:
+        async with get_async_db_context() as db:
+            await file_crud.refresh_ref_counts(db, now)
+            keys = await file_crud.get_unreferenced_keys(db, cutoff, settings.BLOB_GC_BATCH_SIZE)
+
+        if keys:
+            async with get_async_bucket_session() as sess:
+                for key in keys:
+                    try:
+                        async with get_async_db_context() as db:
+                            if await file_crud.claim_unreferenced(db, key, cutoff):
+                                await delete_object(sess, key, unindex=False)
+                                deleted += 1
+                    except Exception as e:  # noqa: BLE001
+                        logger.warning("Deleting unreferenced blob %s failed: %s", key, e)
+                        _stats["blob_errors"] += 1
+    finally:
+        _stats["blob_sweeps"] += 1
+        _stats["last_blob_sweep_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    _stats["blobs_deleted"] += deleted
+    if deleted:
+        logger.info("Deleted %d unreferenced content-addressed objects", deleted)
+    return deleted
+
+
+async def prune_sync_changes() -> int:
+    """Delete change log entries older than SYNC_RETENTION_DAYS, in batches; returns the number deleted."""
+    # created_at is written in UTC
+    cutoff = datetime.utcnow() - timedelta(days=settings.SYNC_RETENTION_DAYS)
+    pruned = 0
+    while True:
+        async with get_async_db_context() as db:
+            batch = await sync_crud.prune_changes(db, cutoff, settings.SYNC_PRUNE_BATCH_SIZE)
+        pruned += batch
+        if batch < settings.SYNC_PRUNE_BATCH_SIZE:
+            break
+    _stats["sync_changes_pruned"] += pruned
+    if pruned:
+        logger.info("Pruned %d sync change log entries", pruned)
+    return pruned
+
+
+def schedule_sweeper(scheduler: AsyncIOScheduler) -> None:
+    """Register the periodic sweeps with the scheduler."""
+    if settings.SYNC_RETENTION_DAYS > 0:
+        scheduler.add_job(
+            prune_sync_changes,
+            "interval",
+            minutes=settings.SYNC_PRUNE_INTERVAL_MINUTES,
+            id=SYNC_PRUNE_JOB_ID,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now() + timedelta(minutes=10),
+        )
+    if settings.CONTENT_ADDRESSED_STORAGE and settings.FILE_INDEX_ENABLED:
+        scheduler.add_job(
+            sweep_unreferenced_blobs,
+            "interval",
+            minutes=settings.BLOB_GC_INTERVAL_MINUTES,
+            id=BLOB_SWEEP_JOB_ID,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now() + timedelta(minutes=5),
+        )
+    if not settings.TEMP_DATA_SWEEPER_ENABLED:
+        logger.info("Temporary data sweeper disabled")
+        return
+    scheduler.add_job(
+        sweep_temporary_data,
+        "interval",
+        minutes=settings.TEMP_DATA_SWEEP_INTERVAL_MINUTES,
+        id=SWEEP_JOB_ID,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now() + timedelta(minutes=1),
+    )
+
+
+def metrics() -> Dict[str, Any]:
+    """Counters of the sweeper."""
+    return {
+        "enabled": settings.TEMP_DATA_SWEEPER_ENABLED,
+        "ttl_hours": settings.TEMP_DATA_TTL_HOURS,
+        "interval_minutes": settings.TEMP_DATA_SWEEP_INTERVAL_MINUTES,
+        **_stats,
+    }
+
+
+register_metrics("temporary_data_sweeper", metrics)
@@ -1,29 +1,35 @@
 import os
-import time
 import logging
 import asyncio
 from dataclasses import dataclass
-from typing import Optional, Callable
+from typing import Optional
 from contextlib import asynccontextmanager
 
 from google.cloud import storage
 from google.auth.credentials import Credentials
-from google.api_core import exceptions as gapi_exc
+
+from ..config import settings
+from .file_index import FileIndex, file_index
+from .gcs_async import AsyncGcsClient
+from .storage_backends import GcsBackend, StorageBackend, retry_blocking, run_blocking
+from ..utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_MAX_RETRIES = 5
-DEFAULT_INITIAL_BACKOFF = 1.0  # seconds
 DEFAULT_TIMEOUT = 30.0  # per request
 
 @dataclass(slots=True)
 class BucketSession:
-    client: storage.Client
-    bucket: storage.Bucket
+    backend: StorageBackend
     timeout: float
+    index: Optional[FileIndex] = None  # files table, None = nicht indexieren
+
 
 class BucketEngine:
-    """Singleton-ähnliche Engine (wie SQLAlchemy AsyncEngine) für Google Cloud Storage."""
+    """Singleton-ähnliche Engine (wie SQLAlchemy AsyncEngine) für den Object Storage.
+
+    Ohne vorgegebenes backend wird Google Cloud Storage verwendet (settings.STORAGE_BACKEND).
+    """
 
     def __init__(
         self,
@@ -31,77 +37,99 @@ class BucketEngine:
         timeout: float = DEFAULT_TIMEOUT,
         project: Optional[str] = None,
         credentials: Optional[Credentials] = None,
+        native_async: bool = False,
+        api_endpoint: Optional[str] = None,
+        max_concurrency: int = 64,
+        backend: Optional[StorageBackend] = None,
+        index: Optional[FileIndex] = None,
     ) -> None:
         self._bucket_name = bucket_name
         self._timeout = timeout
         self._project = project
         self._credentials = credentials
-        self._client: Optional[storage.Client] = None
-        self._bucket: Optional[storage.Bucket] = None
+        self._native_async = native_async
+        self._api_endpoint = api_endpoint
+        self._max_concurrency = max_concurrency
+        self._backend = backend
+        self._index = index
+        self._started = False
         self._lock = asyncio.Lock()
 
     async def start(self) -> None:
-        """Initialisiert Client & Bucket (idempotent)."""
-        if self._client and self._bucket:
+        """Initialisiert das Backend (idempotent)."""
+        if self._started:
             return
         async with self._lock:
-            if self._client and self._bucket:
+            if self._started:
                 return
-
-            # Lokale Dev mit Keyfile, sonst Metadata/ADC in Cloud Run
-            keyfile = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-            if keyfile:
-                logger.info("GCS: using service account keyfile at %s", keyfile)
-                self._client = storage.Client.from_service_account_json(keyfile, project=self._project)
-            else:
-                logger.info("GCS: using Application Default Credentials (Cloud Run)")
-                self._client = storage.Client(project=self._project, credentials=self._credentials)
-
-            self._bucket = self._client.bucket(self._bucket_name)
-            # leichte Probe
+            if self._backend is None:
+                self._backend = self._create_gcs_backend()
             try:
-                await self._run_blocking(lambda: self._bucket.exists(timeout=self._timeout))
-                logger.info("✅ GCS bucket '%s' ready", self._bucket_name)
+                await self._backend.start()
+                logger.info("✅ Storage backend '%s' ready at %s", self._backend.kind, self._backend.uri(""))
             except Exception as e:
-                logger.exception("❌ Failed to access bucket '%s': %s", self._bucket_name, e)
+                logger.exception("❌ Failed to access storage %s: %s", self._backend.uri(""), e)
                 raise
+            self._started = True
+
+    def _create_gcs_backend(self) -> GcsBackend:
+        # Lokale Dev mit Keyfile, sonst Metadata/ADC in Cloud Run
+        client_options = {"api_endpoint": self._api_endpoint} if self._api_endpoint else None
+        keyfile = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        if keyfile:
+            logger.info("GCS: using service account keyfile at %s", keyfile)
+            client = storage.Client.from_service_account_json(
+                keyfile, project=self._project, client_options=client_options
+            )
+        else:
+            logger.info("GCS: using Application Default Credentials (Cloud Run)")
+            client = storage.Client(
+                project=self._project, credentials=self._credentials, client_options=client_options
+            )
+
+        http = None
+        if self._native_async:
+            # Gleiche Credentials wie der synchrone Client (der bleibt fürs lokale Signieren)
+            http = AsyncGcsClient(
+                self._bucket_name,
+                credentials=client._credentials,
+                endpoint=client._connection.API_BASE_URL,
+                max_concurrency=self._max_concurrency,
+                timeout=self._timeout,
+            )
+            register_metrics("gcs_async_client", http.metrics)
+            logger.info("GCS: using the native async client (max %d concurrent requests)", self._max_concurrency)
+        return GcsBackend(client, client.bucket(self._bucket_name), self._timeout, http)
 
     def session(self) -> BucketSession:
-        assert self._client and self._bucket, "BucketEngine not started. Call await engine.start() first."
-        return BucketSession(client=self._client, bucket=self._bucket, timeout=self._timeout)
+        assert self._started, "BucketEngine not started. Call await engine.start() first."
+        return BucketSession(backend=self._backend, timeout=self._timeout, index=self._index)
+
+    async def stop(self) -> None:
+        """Gibt die Ressourcen des Backends frei (z.B. den HTTP-Pool des nativen Clients)."""
+        if self._started:
+            await self._backend.close()
+            self._started = False
 
     # ---------- Retry Helper ----------
-    @staticmethod
-    async def _retry(
-        fn: Callable,
-        *args,
-        max_retries: int = DEFAULT_MAX_RETRIES,
-        initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
-        **kwargs,
-    ):
-        backoff = initial_backoff
-        last_exc = None
-        for attempt in range(1, max_retries + 1):
-            try:
-                return await BucketEngine._run_blocking(fn, *args, **kwargs)
-            except (gapi_exc.TooManyRequests, gapi_exc.ServiceUnavailable, gapi_exc.InternalServerError, gapi_exc.DeadlineExceeded) as e:
-                last_exc = e
-                logger.warning("GCS transient error on attempt %d/%d: %s (retrying in %.1fs)", attempt, max_retries, e, backoff)
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 2, 16.0)
-            except (gapi_exc.NotFound, gapi_exc.PermissionDenied, gapi_exc.BadRequest) as e:
-                # Expected errors - don't retry, don't log as error
-                raise e
-            except Exception as e:
-                last_exc = e
-                logger.error("GCS non-retryable error: %s", e)
-                break
-        raise last_exc
+    # google-cloud-storage ist sync; Aufrufe laufen im Thread, transiente Fehler mit Backoff
+    _retry = staticmethod(retry_blocking)
+    _run_blocking = staticmethod(run_blocking)
+
 
-    @staticmethod
-    async def _run_blocking(fn: Callable, *args, **kwargs):
-        # google-cloud-storage ist sync; in Thread ausführen
-        return await asyncio.to_thread(fn, *args, **kwargs)
+def _create_backend() -> Optional[StorageBackend]:
+    """Das in settings.STORAGE_BACKEND gewählte Backend, None für GCS (baut die Engine selbst)."""
+    if settings.STORAGE_BACKEND == "local":
+        from .local_storage import LocalBackend
+
+        return LocalBackend(
+            settings.STORAGE_LOCAL_ROOT,
+            settings.STORAGE_LOCAL_BASE_URL,
+            settings.STORAGE_LOCAL_SIGNING_KEY,
+        )
+    if settings.STORAGE_BACKEND != "gcs":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return None
 
 # Global factory (optional singleton)
 _engine: Optional[BucketEngine] = None
@@ -109,11 +137,24 @@ _engine: Optional[BucketEngine] = None
 async def get_bucket_engine(bucket_name: str = "piatto-bucket") -> BucketEngine:
     global _engine
     if _engine is None:
-        _engine = BucketEngine(bucket_name=bucket_name)
+        _engine = BucketEngine(
+            bucket_name=bucket_name,
+            native_async=settings.GCS_NATIVE_ASYNC,
+            api_endpoint=settings.GCS_API_ENDPOINT,
+            max_concurrency=settings.GCS_MAX_CONCURRENCY,
+            backend=_create_backend(),
+            index=file_index if settings.FILE_INDEX_ENABLED else None,
+        )
         await _engine.start()
     return _engine
 
 
+async def shutdown_bucket_engine() -> None:
+    """Schließt die Engine beim Herunterfahren (z.B. HTTP-Pool des nativen Clients)."""
+    if _engine is not None:
+        await _engine.stop()
+
+
 # FastAPI Dependency: liefert pro Request eine Session
 async def get_bucket_session() -> BucketSession:
     """
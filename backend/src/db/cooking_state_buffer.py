@@ -0,0 +1,133 @@
+"""
+Write-behind buffer for the step state of cooking sessions.
+
+Step navigation produces bursts of state changes of which only the last one matters. With
+COOKING_STATE_WRITE_BEHIND enabled, cooking_crud records changes here and acknowledges them
+from memory; the latest state per session is written with a single batched UPDATE every
+COOKING_STATE_FLUSH_INTERVAL_SECONDS and when the application shuts down. Reads of a cooking
+session overlay the buffered state, so this process always sees the latest step.
+
+The owner and recipe of sessions are remembered as well, so repeated changes of the same
+session do not need a SELECT for the authorization check.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+
+from ..config import settings
+from ..utils.metrics import register_metrics
+from .database import get_async_db_context
+from .models.db_recipe import CookingSession
+
+logger = logging.getLogger(__name__)
+
+_cooking_sessions = CookingSession.__table__
+_UPDATE_STATE = (
+    update(_cooking_sessions)
+    .where(_cooking_sessions.c.id == bindparam("session_id"))
+    .values(state=bindparam("new_state"))
+)
+
+
+class CookingStateBuffer:
+    """Coalesces cooking session state changes in memory and flushes them periodically."""
+
+    def __init__(self, enabled: bool = False, flush_interval: float = 2.0, max_known_sessions: int = 4096):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_known_sessions = max_known_sessions
+        self._pending: Dict[int, int] = {}
+        # session id -> (user_id, recipe_id)
+        self._known: "OrderedDict[int, Tuple[str, int]]" = OrderedDict()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"recorded": 0, "coalesced": 0, "flushes": 0, "rows_flushed": 0, "errors": 0}
+
+    def remember(self, session_id: int, user_id: str, recipe_id: int) -> None:
+        """Remember the owner and recipe of a session."""
+        self._known[session_id] = (user_id, recipe_id)
+        self._known.move_to_end(session_id)
+        while len(self._known) > self.max_known_sessions:
+            self._known.popitem(last=False)
+
+    def known(self, session_id: int) -> Optional[Tuple[str, int]]:
+        """(user_id, recipe_id) of a remembered session, if any."""
+        return self._known.get(session_id)
+
+    def record(self, session_id: int, state: int) -> None:
+        """Buffer the new state of a session, replacing an unflushed earlier one."""
+        if session_id in self._pending:
+            self._stats["coalesced"] += 1
+        self._pending[session_id] = state
+        self._stats["recorded"] += 1
+
+    def pending_state(self, session_id: int) -> Optional[int]:
+        """The buffered, not yet written state of a session."""
+        return self._pending.get(session_id)
+
+    def discard(self, session_id: int) -> None:
+        """Forget a session, e.g. because it was deleted."""
+        self._pending.pop(session_id, None)
+        self._known.pop(session_id, None)
+
+    async def flush(self) -> int:
+        """Write all buffered states with one batched UPDATE. Returns the number of sessions written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            try:
+                async with get_async_db_context() as db:
+                    await db.execute(_UPDATE_STATE, [
+                        {"session_id": session_id, "new_state": state} for session_id, state in batch.items()
+                    ])
+            except Exception as e:  # noqa: BLE001
+                logger.error("Flushing %d cooking session states failed: %s", len(batch), e)
+                self._stats["errors"] += 1
+                # Retry on the next flush unless a newer state has been recorded meanwhile
+                for session_id, state in batch.items():
+                    self._pending.setdefault(session_id, state)
+                return 0
+            self._stats["flushes"] += 1
+            self._stats["rows_flushed"] += len(batch)
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the periodic flush."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and drain the buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters and the current buffer size."""
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "known_sessions": len(self._known),
+            **self._stats,
+        }
+
+
+cooking_state_buffer = CookingStateBuffer(
+    enabled=settings.COOKING_STATE_WRITE_BEHIND,
+    flush_interval=settings.COOKING_STATE_FLUSH_INTERVAL_SECONDS,
+)
+register_metrics("cooking_state_buffer", cooking_state_buffer.metrics)
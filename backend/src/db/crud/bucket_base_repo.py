@@ -1,19 +1,32 @@
 import os
+import hashlib
 import logging
 import uuid
+import asyncio
 import mimetypes
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
-from google.cloud.storage import Blob
+from google.api_core import exceptions as gapi_exc
 
+from ...config import settings
 from ..bucket_session import BucketSession, BucketEngine
+from ..storage_backends import ObjectInfo
+from ..object_cache import object_cache
+from ..signed_url_cache import signed_url_cache
+from ...utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
 # ------ Policy / Limits ------
 MAX_FILE_BYTES = 50 * 1024 * 1024  # 50 MB
+STREAM_CHUNK_BYTES = 1024 * 1024  # 1 MB pro Range-Request beim Streaming
+UPLOAD_CHUNK_BYTES = 4 * 256 * 1024  # Resumable-Upload-Chunk, muss ein Vielfaches von 256 KB sein
+EXISTS_CHECK_CONCURRENCY = 8  # parallele exists()-Requests bei der Batch-Prüfung
+CONTENT_ADDRESSED_SEGMENT = "sha256"  # users/<user_id>/<category>/sha256/<hash>.<ext>
 
 ALLOWED_MIME: set[str] = {
     # Images
@@ -24,11 +37,55 @@ ALLOWED_MIME: set[str] = {
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
 }
 
+# Signaturen der erlaubten Formate (Magic Bytes am Dateianfang)
+_MAGIC_BYTES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"PK\x03\x04", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+)
+_SNIFF_BYTES = 12
+
+# ------ Upload-Metriken ------
+_upload_stats: Dict[str, Any] = {
+    "uploads": 0,
+    "bytes": 0,
+    "seconds": 0.0,
+    "rejected_too_large": 0,
+    "rejected_type": 0,
+    "failed": 0,
+    "deduplicated": 0,
+    "last_mb_per_second": None,
+}
+
+
+def upload_metrics() -> Dict[str, Any]:
+    """Durchsatz der Streaming-Uploads."""
+    seconds = _upload_stats["seconds"]
+    return {
+        **_upload_stats,
+        "seconds": round(seconds, 3),
+        "avg_mb_per_second": round(_upload_stats["bytes"] / seconds / 1e6, 3) if seconds else None,
+    }
+
+
+register_metrics("file_uploads", upload_metrics)
+
 # ------ Helpers ------
-def _generate_storage_key(user_id: str, category: str, original_filename: str) -> str:
+def _generate_storage_key(
+    user_id: str,
+    category: str,
+    original_filename: str,
+    sha256: Optional[str] = None,
+    content_type: Optional[str] = None,
+) -> str:
     """
     Generiert einen eindeutigen Storage-Key:
     users/<user_id>/<category>/<day-month-year>/<random_uuid>.<extension>
+
+    Mit sha256 (Content-Addressed Storage) einen Key, der nur vom Inhalt abhängt:
+    users/<user_id>/<category>/sha256/<hash>.<extension>, Extension aus dem MIME-Type.
     """
     if not user_id:
         raise HTTPException(status_code=400, detail="user_id is required")
@@ -37,13 +94,18 @@ def _generate_storage_key(user_id: str, category: str, original_filename: str) -
     if not original_filename:
         raise HTTPException(status_code=400, detail="filename is required")
     
-    # Datum: DD-MM-YYYY
-    date_str = datetime.utcnow().strftime("%d-%m-%Y")
-    
     # Extension extrahieren
     _, ext = os.path.splitext(original_filename)
     if not ext:
         ext = ".bin"  # Fallback für Dateien ohne Extension
+
+    if sha256:
+        # Gleicher Inhalt -> gleicher Key, unabhängig vom Dateinamen
+        ext = (mimetypes.guess_extension(content_type) if content_type else None) or ext.lower()
+        return f"users/{user_id}/{category}/{CONTENT_ADDRESSED_SEGMENT}/{sha256}{ext}"
+
+    # Datum: DD-MM-YYYY
+    date_str = datetime.utcnow().strftime("%d-%m-%Y")
     
     # Eindeutige ID generieren
     unique_id = uuid.uuid4().hex
@@ -58,6 +120,24 @@ def _validate_upload_inputs(content_type: Optional[str], file_size: int) -> None
         raise HTTPException(status_code=415, detail=f"Unsupported MIME type: {content_type}")
 
 
+def _sniff_content_type(head: bytes) -> Optional[str]:
+    """Erkennt den MIME-Type anhand der Magic Bytes, None wenn unbekannt."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, content_type in _MAGIC_BYTES:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def _check_magic_bytes(head: bytes, content_type: Optional[str]) -> str:
+    detected = _sniff_content_type(head)
+    if detected is None or (content_type and content_type != detected):
+        _upload_stats["rejected_type"] += 1
+        raise HTTPException(status_code=415, detail="File content does not match an allowed file type")
+    return detected
+
+
 def _resolve_content_type(original_filename: str, provided: Optional[str]) -> str:
     if provided:
         return provided
@@ -79,6 +159,84 @@ def verify_user_access(key: str, user_id: str) -> None:
     if not key.startswith(f"users/{user_id}/"):
         raise HTTPException(status_code=403, detail="Forbidden: You do not have access to this file.")
 
+def is_content_addressed_key(key: str) -> bool:
+    """Ob der Key von Content-Addressed Storage stammt (unveränderlich, evtl. mehrfach referenziert)."""
+    parts = key.split("/")
+    return len(parts) == 5 and parts[0] == "users" and parts[3] == CONTENT_ADDRESSED_SEGMENT
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _index_upload(
+    sess: BucketSession,
+    key: str,
+    size: int,
+    content_type: Optional[str],
+    sha256: str,
+    original_filename: Optional[str],
+    content_addressed: bool = False,
+) -> None:
+    """Trägt eine hochgeladene Datei in den files-Index ein (falls die Session einen hat)."""
+    if sess.index is not None:
+        await sess.index.record(key, size, content_type, sha256, original_filename, content_addressed)
+
+
+async def _store_deduplicated(
+    sess: BucketSession,
+    key: str,
+    size: int,
+    content_type: Optional[str],
+    sha256: str,
+    original_filename: Optional[str],
+    write: Callable[[], Awaitable[None]],
+) -> bool:
+    """
+    Speichert ein Objekt unter seinem Content-Key, außer es existiert bereits.
+
+    Der Index-Eintrag wird zuerst geschrieben: er startet die Grace Period neu und wartet
+    auf einen Blob-Sweep, der genau dieses Objekt gerade löscht (file_crud.claim_unreferenced),
+    sodass die anschließende Existenzprüfung kein gleich verschwindendes Objekt sieht.
+
+    Returns:
+        False wenn das Objekt schon existierte (dedupliziert)
+    """
+    await _index_upload(sess, key, size, content_type, sha256, original_filename, content_addressed=True)
+    if await sess.backend.exists(key):
+        _upload_stats["deduplicated"] += 1
+        return False
+    try:
+        await write()
+    except gapi_exc.PreconditionFailed:
+        # Gleichzeitig von einem anderen Upload mit denselben Bytes geschrieben
+        _upload_stats["deduplicated"] += 1
+        return False
+    return True
+
+
+async def _unindex(sess: BucketSession, key: str) -> None:
+    if sess.index is not None:
+        await sess.index.remove([key])
+
+
+def _file_info(sess: BucketSession, info: ObjectInfo) -> Dict[str, Any]:
+    metadata = info.metadata or {}
+    return {
+        "key": info.name,
+        "original_filename": metadata.get("original_filename", "unknown"),
+        "content_type": info.content_type,
+        "size": info.size,
+        "category": metadata.get("category", "uncategorized"),
+        "uploaded_at": metadata.get("uploaded_at"),
+        "public_url": sess.backend.public_url(info.name),
+        "status": "exists",
+    }
+
 # ============================================================
 # Public API (funktional, erwartet BucketSession als Parameter)
 # ============================================================
@@ -113,69 +271,427 @@ async def upload_file(
 
     _validate_upload_inputs(content_type, size)
 
+    # Content-Addressed: Hash vorab, er bestimmt den Key
+    sha256 = await asyncio.to_thread(_hash_file, tmp_path) if settings.CONTENT_ADDRESSED_STORAGE else None
+
     # Generiere eindeutigen Key
-    key = _generate_storage_key(user_id, category, original_filename)
-    blob: Blob = sess.bucket.blob(key)
+    key = _generate_storage_key(user_id, category, original_filename, sha256, content_type)
 
     # Metadata setzen
-    blob.metadata = {
+    metadata = {
         "original_filename": original_filename,
         "category": category,
         "uploaded_at": datetime.utcnow().isoformat()
     }
 
-    logger.info("GCS upload -> gs://%s/%s (%d bytes, %s)", sess.bucket.name, key, size, content_type)
+    logger.info("Upload -> %s (%d bytes, %s)", sess.backend.uri(key), size, content_type)
+
+    digest = hashlib.sha256()
 
+    async def _write() -> None:
+        writer = None
+        try:
+            writer = await sess.backend.open_writer(key, content_type or "application/octet-stream", metadata, UPLOAD_CHUNK_BYTES)
+            with open(tmp_path, "rb") as f:
+                while chunk := f.read(UPLOAD_CHUNK_BYTES):
+                    digest.update(chunk)
+                    await writer.write(chunk)
+            await writer.close()
+        except Exception:
+            if writer is not None:
+                await writer.abandon()
+            raise
+
+    stored = True
     try:
-        await BucketEngine._retry(
-            blob.upload_from_filename,
-            tmp_path,
-            content_type=content_type,
-            timeout=sess.timeout,
-        )
+        if sha256:
+            stored = await _store_deduplicated(sess, key, size, content_type, sha256, original_filename, _write)
+        else:
+            await _write()
+    except Exception as e:
+        logger.exception("Upload failed for %s: %s", sess.backend.uri(key), e)
+        raise HTTPException(status_code=500, detail="Upload failed") from e
+
+    if not sha256:
+        await _index_upload(sess, key, size, content_type, digest.hexdigest(), original_filename)
+    return {
+        "key": key,
+        "original_filename": original_filename,
+        "content_type": content_type,
+        "size": size,
+        "category": category,
+        "uploaded_at": metadata["uploaded_at"],
+        "status": "uploaded" if stored else "deduplicated",
+    }
+
+
+async def upload_stream(
+    sess: BucketSession,
+    user_id: str,
+    category: str,
+    chunks: AsyncIterable[bytes],
+    original_filename: str,
+    content_type: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Lädt eine Datei chunkweise in eine GCS Resumable-Upload-Session hoch.
+
+    Es liegt nie mehr als ein Upload-Chunk im Speicher. Größe und Magic Bytes werden
+    während des Uploads geprüft: überschreitet die Datei MAX_FILE_BYTES oder passt der
+    Dateianfang nicht zum (angegebenen) MIME-Type, wird abgebrochen, bevor das Objekt
+    finalisiert wird. Ohne content_type wird der Typ aus den Magic Bytes bestimmt.
+
+    Mit CONTENT_ADDRESSED_STORAGE hängt der Key vom Hash des Inhalts ab; die Datei wird dann
+    zuerst in eine temporäre Datei gespoolt (siehe _upload_stream_deduplicated).
+
+    Returns:
+        Dict analog zu upload_file
+    """
+    if content_type:
+        _validate_upload_inputs(content_type, 0)
+    if settings.CONTENT_ADDRESSED_STORAGE:
+        return await _upload_stream_deduplicated(sess, user_id, category, chunks, original_filename, content_type)
+
+    key = _generate_storage_key(user_id, category, original_filename)
+    metadata = {
+        "original_filename": original_filename,
+        "category": category,
+        "uploaded_at": datetime.utcnow().isoformat()
+    }
+
+    started = time.perf_counter()
+    writer = None
+    head = b""
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_FILE_BYTES:
+                _upload_stats["rejected_too_large"] += 1
+                raise HTTPException(status_code=413, detail=f"File too large. Max {MAX_FILE_BYTES // (1024*1024)} MB")
+            if writer is None:
+                head += chunk
+                if len(head) < _SNIFF_BYTES:
+                    continue
+                content_type = _check_magic_bytes(head, content_type)
+                chunk, head = head, b""
+                writer = await sess.backend.open_writer(key, content_type, metadata, UPLOAD_CHUNK_BYTES)
+            digest.update(chunk)
+            await writer.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        if writer is None:
+            content_type = _check_magic_bytes(head, content_type)
+            writer = await sess.backend.open_writer(key, content_type, metadata, UPLOAD_CHUNK_BYTES)
+            digest.update(head)
+            await writer.write(head)
+        await writer.close()
+    except HTTPException:
+        if writer is not None:
+            await writer.abandon()
+        raise
     except Exception as e:
-        logger.exception("Upload failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        if writer is not None:
+            await writer.abandon()
+        _upload_stats["failed"] += 1
+        logger.exception("Streaming upload failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Upload failed") from e
 
+    elapsed = _count_upload(size, started)
+    logger.info("Streaming upload -> %s (%d bytes, %s, %.2fs)",
+                sess.backend.uri(key), size, content_type, elapsed)
+    await _index_upload(sess, key, size, content_type, digest.hexdigest(), original_filename)
+
     return {
         "key": key,
         "original_filename": original_filename,
         "content_type": content_type,
         "size": size,
         "category": category,
-        "uploaded_at": blob.metadata["uploaded_at"],
+        "uploaded_at": metadata["uploaded_at"],
         "status": "uploaded",
     }
 
 
+def _count_upload(size: int, started: float) -> float:
+    elapsed = time.perf_counter() - started
+    _upload_stats["uploads"] += 1
+    _upload_stats["bytes"] += size
+    _upload_stats["seconds"] += elapsed
+    _upload_stats["last_mb_per_second"] = round(size / elapsed / 1e6, 3) if elapsed else None
+    return elapsed
+
+
+async def _upload_stream_deduplicated(
+    sess: BucketSession,
+    user_id: str,
+    category: str,
+    chunks: AsyncIterable[bytes],
+    original_filename: str,
+    content_type: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Streaming-Upload für Content-Addressed Storage.
+
+    Der Key steht erst nach dem letzten Byte fest, daher wird in eine SpooledTemporaryFile
+    geschrieben (bis UPLOAD_CHUNK_BYTES im Speicher, darüber auf Platte) und gleichzeitig
+    gehasht; Größe und Magic Bytes werden wie bei upload_stream unterwegs geprüft. Existiert
+    das Objekt bereits, entfällt der Upload in den Bucket.
+    """
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    checked = False
+    with tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_BYTES) as spool:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_FILE_BYTES:
+                _upload_stats["rejected_too_large"] += 1
+                raise HTTPException(status_code=413, detail=f"File too large. Max {MAX_FILE_BYTES // (1024*1024)} MB")
+            if not checked:
+                head += chunk
+                if len(head) >= _SNIFF_BYTES:
+                    content_type = _check_magic_bytes(head, content_type)
+                    checked = True
+            digest.update(chunk)
+            await asyncio.to_thread(spool.write, chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        if not checked:
+            content_type = _check_magic_bytes(head, content_type)
+
+        sha256 = digest.hexdigest()
+        key = _generate_storage_key(user_id, category, original_filename, sha256, content_type)
+        metadata = {
+            "original_filename": original_filename,
+            "category": category,
+            "uploaded_at": datetime.utcnow().isoformat()
+        }
+
+        async def _write() -> None:
+            spool.seek(0)
+            writer = await sess.backend.open_writer(key, content_type, metadata, UPLOAD_CHUNK_BYTES)
+            try:
+                while chunk := await asyncio.to_thread(spool.read, UPLOAD_CHUNK_BYTES):
+                    await writer.write(chunk)
+                await writer.close()
+            except Exception:
+                await writer.abandon()
+                raise
+
+        try:
+            stored = await _store_deduplicated(sess, key, size, content_type, sha256, original_filename, _write)
+        except Exception as e:
+            _upload_stats["failed"] += 1
+            logger.exception("Streaming upload failed for %s: %s", sess.backend.uri(key), e)
+            raise HTTPException(status_code=500, detail="Upload failed") from e
+
+    elapsed = _count_upload(size, started)
+    logger.info("Streaming upload -> %s (%d bytes, %s, %.2fs, %s)",
+                sess.backend.uri(key), size, content_type, elapsed, "stored" if stored else "deduplicated")
+
+    return {
+        "key": key,
+        "original_filename": original_filename,
+        "content_type": content_type,
+        "size": size,
+        "category": category,
+        "uploaded_at": metadata["uploaded_at"],
+        "status": "uploaded" if stored else "deduplicated",
+    }
+
+
+async def write_object(
+    sess: BucketSession,
+    key: str,
+    chunks: AsyncIterable[bytes],
+    content_type: str,
+    metadata: Dict[str, str],
+) -> int:
+    """
+    Schreibt einen Upload unter einem vorgegebenen Key, z.B. über eine signed PUT-URL des
+    lokalen Backends. Ein Key kann nur einmal beschrieben werden.
+
+    Returns:
+        Anzahl geschriebener Bytes
+
+    Raises:
+        HTTPException: 413 über MAX_FILE_BYTES, 412 wenn der Key bereits existiert
+    """
+    writer = await sess.backend.open_writer(key, content_type, metadata, UPLOAD_CHUNK_BYTES)
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_FILE_BYTES:
+                _upload_stats["rejected_too_large"] += 1
+                raise HTTPException(status_code=413, detail=f"File too large. Max {MAX_FILE_BYTES // (1024*1024)} MB")
+            digest.update(chunk)
+            await writer.write(chunk)
+        await writer.close()
+    except HTTPException:
+        await writer.abandon()
+        raise
+    except gapi_exc.PreconditionFailed:
+        raise HTTPException(status_code=412, detail="File already exists")
+    except Exception as e:
+        await writer.abandon()
+        _upload_stats["failed"] += 1
+        logger.exception("Upload failed for %s: %s", sess.backend.uri(key), e)
+        raise HTTPException(status_code=500, detail="Upload failed") from e
+    logger.info("Upload -> %s (%d bytes, %s)", sess.backend.uri(key), size, content_type)
+    await _index_upload(sess, key, size, content_type, digest.hexdigest(), metadata.get("original_filename"))
+    return size
+
+
 async def get_file_info(sess: BucketSession, key: str) -> Dict[str, Any]:
     """
     Holt File-Informationen inkl. Metadata.
     """
-    from google.api_core import exceptions as gapi_exc
-    
-    blob = sess.bucket.blob(key)
-    
+    return _file_info(sess, await get_object_info(sess, key))
+
+
+async def get_object_info(sess: BucketSession, key: str, cached: bool = False) -> ObjectInfo:
+    """
+    Lädt die Metadaten einer Datei mit einem einzigen Storage-Request.
+
+    Das Ergebnis enthält content_type, size, generation und updated und kann für
+    stream_file wiederverwendet werden. Mit cached=True kommen die Metadaten gecachter
+    Bilder eines entfernten Backends aus dem object_cache (bis zu OBJECT_CACHE_INFO_TTL_SECONDS alt).
+
+    Raises:
+        HTTPException: 404 wenn Datei nicht gefunden, 500 bei anderen Fehlern
+    """
+    cached = cached and sess.backend.is_remote
+    if cached:
+        info = object_cache.get_info(key)
+        if info is not None:
+            return info
     try:
-        # Blob neu laden um Metadata zu holen
-        await BucketEngine._retry(blob.reload, timeout=sess.timeout)
-    except gapi_exc.NotFound:
+        info = await sess.backend.stat(key)
+    except Exception as e:
+        logger.error("Failed to get file info for %s: %s", sess.backend.uri(key), e)
+        raise HTTPException(status_code=500, detail="Failed to get file info") from e
+    if info is None:
         # Expected: File doesn't exist - no error log
         raise HTTPException(status_code=404, detail="File not found")
+    if cached:
+        object_cache.put_info(info)
+    return info
+
+
+async def stream_file(
+    sess: BucketSession,
+    info: ObjectInfo,
+    start: int = 0,
+    end: Optional[int] = None,
+    chunk_size: int = STREAM_CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """
+    Streamt die Bytes start..end (inklusive) einer Datei in Chunks von chunk_size.
+
+    Das Backend liest genau die Generation aus info (GCS: ein Range-Request pro Chunk), es
+    liegt also nie mehr als ein Chunk im Speicher. Wird die Datei während des Streamings
+    ersetzt, bricht der Stream ab statt Bytes zweier Versionen zu mischen.
+    """
+    if end is None:
+        end = info.size - 1
+    position = start
+    try:
+        async for chunk in sess.backend.stream(info, start, end, chunk_size):
+            yield chunk
+            position += len(chunk)
+    except (gapi_exc.NotFound, gapi_exc.PreconditionFailed):
+        logger.warning("%s changed or vanished while streaming", sess.backend.uri(info.name))
+        raise
+    except Exception as e:
+        logger.error("Streaming failed for %s at byte %d: %s", sess.backend.uri(info.name), position, e)
+        raise
+
+
+async def read_cached_range(sess: BucketSession, info: ObjectInfo, start: int, end: int) -> Optional[bytes]:
+    """
+    Liefert die Bytes start..end (inklusive) einer Datei über den object_cache.
+
+    Bei einem Miss wird die komplette Datei (genau die Generation aus info) geladen und
+    gecacht. Dateien, die der Cache nicht aufnimmt (keine Bilder, zu groß, lokales Backend),
+    ergeben None; sie werden mit stream_file gestreamt.
+    """
+    if not sess.backend.is_remote or not object_cache.admits(info):
+        return None
+    data = await object_cache.get(info, start, end)
+    if data is not None:
+        return data
+    try:
+        data = await sess.backend.download(info.name, if_generation_match=info.generation)
+    except (gapi_exc.NotFound, gapi_exc.PreconditionFailed):
+        # Gelöscht oder ersetzt seit dem Laden der Metadaten
+        object_cache.invalidate(info.name)
+        raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
-        logger.error("Failed to get file info for gs://%s/%s: %s", sess.bucket.name, key, e)
-        raise HTTPException(status_code=500, detail="Failed to get file info") from e
-    
-    return {
-        "key": key,
-        "original_filename": blob.metadata.get("original_filename", "unknown") if blob.metadata else "unknown",
-        "content_type": blob.content_type,
-        "size": blob.size,
-        "category": blob.metadata.get("category", "uncategorized") if blob.metadata else "uncategorized",
-        "uploaded_at": blob.metadata.get("uploaded_at") if blob.metadata else None,
-        "public_url": blob.public_url if blob.public_url else None,
-        "status": "exists",
-    }
+        logger.error("Download failed for %s: %s", sess.backend.uri(info.name), e)
+        raise HTTPException(status_code=500, detail="Download failed") from e
+    await object_cache.put(info, data)
+    return data[start:end + 1]
+
+
+async def fetch_direct_upload(sess: BucketSession, key: str, max_bytes: int) -> Tuple[bytes, str]:
+    """
+    Lädt ein Bild, das der Client per signed PUT direkt in den Bucket hochgeladen hat.
+
+    Der Upload lief nicht über die API, daher werden Größe und Magic Bytes erst hier geprüft
+    (nur Bilder). Die Datei wird dabei in den files-Index eingetragen.
+
+    Returns:
+        (Inhalt, erkannter MIME-Type)
+
+    Raises:
+        HTTPException: 404 wenn nicht (mehr) vorhanden, 413 über max_bytes, 415 wenn kein Bild
+    """
+    info = await get_object_info(sess, key)
+    if info.size > max_bytes:
+        _upload_stats["rejected_too_large"] += 1
+        raise HTTPException(status_code=413, detail=f"Image too large. Max {max_bytes // (1024*1024)} MB")
+    try:
+        data = await sess.backend.download(key, if_generation_match=info.generation)
+    except (gapi_exc.NotFound, gapi_exc.PreconditionFailed):
+        raise HTTPException(status_code=404, detail="File not found")
+    except Exception as e:
+        logger.error("Download failed for %s: %s", sess.backend.uri(key), e)
+        raise HTTPException(status_code=500, detail="Download failed") from e
+
+    content_type = _sniff_content_type(data[:_SNIFF_BYTES])
+    if content_type is None or not content_type.startswith("image/"):
+        _upload_stats["rejected_type"] += 1
+        raise HTTPException(status_code=415, detail="File is not a supported image")
+
+    metadata = info.metadata or {}
+    await _index_upload(sess, key, len(data), content_type, hashlib.sha256(data).hexdigest(),
+                        metadata.get("original_filename"))
+    return data, content_type
+
+
+async def open_local_file(sess: BucketSession, info: ObjectInfo) -> Optional[BinaryIO]:
+    """
+    Öffnet die Datei zu info, wenn das Backend Objekte als lokale Dateien hält (Zero-Copy-Serving).
+
+    Returns:
+        Geöffnete Datei (genau die Generation aus info) oder None bei entfernten Backends
+
+    Raises:
+        HTTPException: 404 wenn die Datei inzwischen gelöscht, 409 wenn sie ersetzt wurde
+    """
+    try:
+        return await sess.backend.open_local(info)
+    except gapi_exc.NotFound:
+        raise HTTPException(status_code=404, detail="File not found")
+    except gapi_exc.PreconditionFailed:
+        raise HTTPException(status_code=409, detail="File changed, please retry")
 
 
 async def get_file(sess: BucketSession, key: str) -> bytes:
@@ -192,19 +708,10 @@ async def get_file(sess: BucketSession, key: str) -> bytes:
     Raises:
         HTTPException: 404 wenn Datei nicht gefunden, 500 bei anderen Fehlern
     """
-    from google.api_core import exceptions as gapi_exc
-    
-    blob = sess.bucket.blob(key)
-    
     try:
-        # Prüfe ob Datei existiert
-        exists = await BucketEngine._retry(blob.exists, timeout=sess.timeout)
-        if not exists:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Lade Dateiinhalt herunter
-        content = await BucketEngine._retry(blob.download_as_bytes, timeout=sess.timeout)
-        logger.info("Downloaded file gs://%s/%s (%d bytes)", sess.bucket.name, key, len(content))
+        # Ein einziger Request; eine fehlende Datei meldet GCS als NotFound
+        content = await sess.backend.download(key)
+        logger.info("Downloaded file %s (%d bytes)", sess.backend.uri(key), len(content))
         return content
         
     except gapi_exc.NotFound:
@@ -213,7 +720,7 @@ async def get_file(sess: BucketSession, key: str) -> bytes:
         # Re-raise unsere eigenen HTTPExceptions
         raise
     except Exception as e:
-        logger.error("Download failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("Download failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Download failed") from e
 
 
@@ -222,14 +729,10 @@ async def make_file_public(sess: BucketSession, key: str) -> Dict[str, Any]:
     Setzt die einzelne Datei öffentlich (Fine-grained ACL).
     Der Bucket selbst bleibt privat, nur diese Datei wird für allUsers lesbar.
     """
-    from google.api_core import exceptions as gapi_exc
-    
-    blob = sess.bucket.blob(key)
-
     try:
-        exists = await BucketEngine._retry(blob.exists, timeout=sess.timeout)
+        exists = await sess.backend.exists(key)
     except Exception as e:
-        logger.error("Failed to check file existence for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("Failed to check file existence for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Failed to check file existence") from e
         
     if not exists:
@@ -237,21 +740,21 @@ async def make_file_public(sess: BucketSession, key: str) -> Dict[str, Any]:
 
     try:
         # Setze ACL für diese Datei auf public-read
-        await BucketEngine._retry(blob.make_public, timeout=sess.timeout)
-        logger.info("File made public: gs://%s/%s", sess.bucket.name, key)
+        await sess.backend.make_public(key)
+        logger.info("File made public: %s", sess.backend.uri(key))
     except gapi_exc.BadRequest as e:
         # z.B. Uniform Bucket-Level Access enabled
         logger.warning("Cannot make file public (probably uniform bucket-level access): %s", e)
         raise HTTPException(status_code=400, detail="Cannot make file public. Check bucket access settings.") from e
     except Exception as e:
-        logger.error("make_public failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("make_public failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Failed to make file public") from e
 
     # Metadata laden
     file_info = await get_file_info(sess, key)
     
     # Public URL generieren
-    file_info["public_url"] = f"https://storage.googleapis.com/{sess.bucket.name}/{key}"
+    file_info["public_url"] = sess.backend.public_url(key)
     file_info["status"] = "public"
     
     return file_info
@@ -263,40 +766,45 @@ async def generate_signed_get_url(
     minutes: int = 60,
 ) -> Dict[str, Any]:
     """
-    Erzeugt eine v4 signed GET-URL (Standard: 60 Minuten gültig).
-    """
-    from google.api_core import exceptions as gapi_exc
-    
-    blob = sess.bucket.blob(key)
+    Erzeugt eine v4 signed GET-URL (Standard: mindestens 60 Minuten gültig).
 
-    try:
-        exists = await BucketEngine._retry(blob.exists, timeout=sess.timeout)
-    except Exception as e:
-        logger.error("Failed to check file existence for gs://%s/%s: %s", sess.bucket.name, key, e)
-        raise HTTPException(status_code=500, detail="Failed to check file existence") from e
-        
-    if not exists:
-        raise HTTPException(status_code=404, detail="File not found")
+    get_file_info prüft die Existenz (404) und liefert die Metadaten mit einem Request,
+    die URL selbst kommt aus dem signed_url_cache.
+    """
+    file_info = await get_file_info(sess, key)
 
     try:
-        url = await BucketEngine._retry(
-            blob.generate_signed_url,
-            version="v4",
-            expiration=timedelta(minutes=minutes),
-            method="GET",
-        )
-        
-        file_info = await get_file_info(sess, key)
+        url = await signed_url_cache.sign(sess, key, minutes)
         file_info["signed_url"] = url
         file_info["expires_in_minutes"] = minutes
         file_info["status"] = "signed_url_generated"
-        
+
         return file_info
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error("signed GET url failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("signed GET url failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Failed to generate signed URL") from e
 
 
+async def existing_keys(sess: BucketSession, keys: List[str]) -> set[str]:
+    """
+    Prüft die Existenz mehrerer Dateien parallel (höchstens EXISTS_CHECK_CONCURRENCY gleichzeitig).
+    """
+    semaphore = asyncio.Semaphore(EXISTS_CHECK_CONCURRENCY)
+
+    async def _exists_limited(key: str) -> bool:
+        async with semaphore:
+            return await sess.backend.exists(key)
+
+    try:
+        results = await asyncio.gather(*(_exists_limited(key) for key in keys))
+    except Exception as e:
+        logger.error("Exists check failed under %s: %s", sess.backend.uri(""), e)
+        raise HTTPException(status_code=500, detail="Exists check failed") from e
+    return {key for key, exists in zip(keys, results) if exists}
+
+
 async def generate_signed_put_url(
     sess: BucketSession,
     user_id: str,
@@ -306,7 +814,7 @@ async def generate_signed_put_url(
     minutes: int = 15,
 ) -> Dict[str, Any]:
     """
-    Erzeugt eine v4 signed PUT-URL, damit das Frontend direkt zu GCS hochladen kann.
+    Erzeugt eine signed PUT-URL (GCS: v4), damit das Frontend direkt in den Storage hochladen kann.
     
     WICHTIG: Client muss beim PUT die Headers setzen:
     - Content-Type: <gleicher content_type wie hier>
@@ -322,16 +830,15 @@ async def generate_signed_put_url(
 
     # Generiere Key vorab
     key = _generate_storage_key(user_id, category, original_filename)
-    blob = sess.bucket.blob(key)
     
     # Metadata für den Client (muss als x-goog-meta-* Header gesetzt werden)
     uploaded_at = datetime.utcnow().isoformat()
 
     try:
         url = await BucketEngine._retry(
-            blob.generate_signed_url,
-            version="v4",
-            expiration=timedelta(minutes=minutes),
+            sess.backend.sign_url,
+            key,
+            datetime.now(timezone.utc) + timedelta(minutes=minutes),
             method="PUT",
             content_type=content_type,
         )
@@ -355,22 +862,31 @@ async def generate_signed_put_url(
             "status": "upload_url_generated",
         }
     except Exception as e:
-        logger.error("signed PUT url failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("signed PUT url failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Failed to generate upload URL") from e
 
 
 async def delete_file(sess: BucketSession, key: str) -> Dict[str, Any]:
     """
     Löscht eine Datei anhand des Keys.
+
+    Content-adressierte Objekte können von weiteren Rezepten desselben Users referenziert sein:
+    sie werden nicht gelöscht, sondern nur an den Blob-Sweep übergeben, der sie nach der
+    Grace Period entfernt, falls dann keine Referenz mehr besteht (status "released").
     """
-    from google.api_core import exceptions as gapi_exc
-    
-    blob = sess.bucket.blob(key)
     try:
         # Hole Info vor dem Löschen (wirft 404 wenn nicht existent)
         file_info = await get_file_info(sess, key)
-        
-        await BucketEngine._retry(blob.delete, timeout=sess.timeout)
+
+        if is_content_addressed_key(key):
+            if sess.index is not None:
+                await sess.index.release(key)
+            file_info["status"] = "released"
+            return file_info
+
+        object_cache.invalidate(key)
+        await sess.backend.delete(key)
+        await _unindex(sess, key)
         
         file_info["status"] = "deleted"
         return file_info
@@ -379,22 +895,45 @@ async def delete_file(sess: BucketSession, key: str) -> Dict[str, Any]:
         raise
     except gapi_exc.NotFound:
         # File already deleted
+        await _unindex(sess, key)
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
-        logger.error("Delete failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("Delete failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Delete failed") from e
 
 
+async def delete_object(sess: BucketSession, key: str, unindex: bool = True) -> bool:
+    """
+    Löscht eine Datei ohne vorherige Info-Abfrage (z.B. für Aufräumjobs).
+
+    unindex=False lässt den files-Index unberührt, wenn der Aufrufer den Eintrag selbst in
+    seiner Transaktion entfernt (Blob-Sweep).
+
+    Returns:
+        False wenn die Datei nicht (mehr) existiert
+    """
+    object_cache.invalidate(key)
+    try:
+        await sess.backend.delete(key)
+    except gapi_exc.NotFound:
+        if unindex:
+            await _unindex(sess, key)  # veralteter Index-Eintrag
+        return False
+    if unindex:
+        await _unindex(sess, key)
+    return True
+
+
 async def file_exists(sess: BucketSession, key: str) -> Dict[str, Any]:
     """
     Prüft ob Datei existiert und gibt Info zurück.
     """
-    blob = sess.bucket.blob(key)
     try:
-        exists = await BucketEngine._retry(blob.exists, timeout=sess.timeout)
+        # Ein Request: die Metadaten-Abfrage beantwortet auch die Existenz
+        info = await sess.backend.stat(key)
         
-        if exists:
-            return await get_file_info(sess, key)
+        if info is not None:
+            return _file_info(sess, info)
         else:
             return {
                 "key": key,
@@ -402,7 +941,7 @@ async def file_exists(sess: BucketSession, key: str) -> Dict[str, Any]:
                 "status": "not_found",
             }
     except Exception as e:
-        logger.error("Exists check failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.error("Exists check failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Exists check failed") from e
 
 
@@ -414,7 +953,10 @@ async def list_files(
     max_results: int = 1000
 ) -> List[Dict[str, Any]]:
     """
-    Listet Dateien eines Users auf, optional gefiltert nach Kategorie und/oder Datum.
+    Listet Dateien eines Users direkt im Bucket auf, optional gefiltert nach Kategorie und/oder Datum.
+
+    /files/list liest stattdessen den files-Index (crud/file_crud.py); das Bucket-Listing
+    bleibt für Abgleich und Reindexierung.
     
     Args:
         user_id: User ID
@@ -434,26 +976,14 @@ async def list_files(
         pre = f"users/{user_id}/"
     
     try:
-        # list_blobs ist sync-Iterator → in Thread ausführen
-        def _list_blobs():
-            blobs = sess.client.list_blobs(sess.bucket, prefix=pre, max_results=max_results)
-            result = []
-            for b in blobs:
-                result.append({
-                    "key": b.name,
-                    "original_filename": b.metadata.get("original_filename", "unknown") if b.metadata else "unknown",
-                    "content_type": b.content_type,
-                    "size": b.size,
-                    "category": b.metadata.get("category", "uncategorized") if b.metadata else "uncategorized",
-                    "uploaded_at": b.metadata.get("uploaded_at") if b.metadata else None,
-                    "status": "exists",
-                })
-            return result
-        
-        files = await BucketEngine._run_blocking(_list_blobs)
+        files = []
+        for info in await sess.backend.list(pre, max_results):
+            file_info = _file_info(sess, info)
+            del file_info["public_url"]
+            files.append(file_info)
         return files
     except Exception as e:
-        logger.error("List files failed under gs://%s/%s: %s", sess.bucket.name, pre, e)
+        logger.error("List files failed under %s: %s", sess.backend.uri(pre), e)
         raise HTTPException(status_code=500, detail="List files failed") from e
 
 
@@ -489,34 +1019,42 @@ async def save_image_bytes(
     size = len(image_bytes)
     _validate_upload_inputs(resolved_content_type, size)
 
-    key = _generate_storage_key(user_id, category, original_filename)
-    blob: Blob = sess.bucket.blob(key)
+    sha256 = hashlib.sha256(image_bytes).hexdigest()
+    content_addressed = settings.CONTENT_ADDRESSED_STORAGE
+    key = _generate_storage_key(
+        user_id, category, original_filename, sha256 if content_addressed else None, resolved_content_type
+    )
 
-    blob.metadata = {
+    metadata = {
         "original_filename": original_filename,
         "category": category,
         "uploaded_at": datetime.utcnow().isoformat(),
     }
 
-    logger.info("GCS upload (bytes) -> gs://%s/%s (%d bytes, %s)", sess.bucket.name, key, size, resolved_content_type)
+    logger.info("Upload (bytes) -> %s (%d bytes, %s)", sess.backend.uri(key), size, resolved_content_type)
+
+    async def _write() -> None:
+        await sess.backend.upload(key, bytes(image_bytes), resolved_content_type, metadata)
 
+    stored = True
     try:
-        await BucketEngine._retry(
-            blob.upload_from_string,
-            bytes(image_bytes),
-            content_type=resolved_content_type,
-            timeout=sess.timeout,
-        )
+        if content_addressed:
+            stored = await _store_deduplicated(sess, key, size, resolved_content_type, sha256, original_filename, _write)
+        else:
+            await _write()
     except Exception as e:
-        logger.exception("Upload (bytes) failed for gs://%s/%s: %s", sess.bucket.name, key, e)
+        logger.exception("Upload (bytes) failed for %s: %s", sess.backend.uri(key), e)
         raise HTTPException(status_code=500, detail="Upload failed") from e
 
+    if not content_addressed:
+        await _index_upload(sess, key, size, resolved_content_type, sha256, original_filename)
+
     return {
         "key": key,
         "original_filename": original_filename,
         "content_type": resolved_content_type,
         "size": size,
         "category": category,
-        "uploaded_at": blob.metadata["uploaded_at"],
-        "status": "uploaded",
+        "uploaded_at": metadata["uploaded_at"],
+        "status": "uploaded" if stored else "deduplicated",
     }
@@ -0,0 +1,131 @@
+"""
+Set-based deletion of temporary data: unsaved recipes and preparing sessions.
+
+Work is done in chunks of batch_size rows, one transaction per chunk, so a large backlog never
+holds locks for long. Child rows are deleted explicitly instead of relying on ON DELETE
+CASCADE, which SQLite only honours with foreign keys enabled.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..entity_cache import invalidate_recipe
+from ..models.db_recipe import (
+    CollectionRecipe, CookingSession, InstructionStep, PreparingSession, PreparingSessionRecipe, Recipe,
+    RecipeIngredient, RecipeIngredientTerm,
+)
+from . import collection_crud
+
+DEFAULT_BATCH_SIZE = 500
+
+# Tables holding rows of a recipe, deleted before the recipe itself
+_RECIPE_CHILDREN = (
+    (RecipeIngredient, RecipeIngredient.recipe_id),
+    (InstructionStep, InstructionStep.recipe_id),
+    (RecipeIngredientTerm, RecipeIngredientTerm.recipe_id),
+    (PreparingSessionRecipe, PreparingSessionRecipe.recipe_id),
+    (CollectionRecipe, CollectionRecipe.recipe_id),
+)
+
+
+def _temporary_recipes(created_before: Optional[datetime] = None,
+                       user_id: Optional[str] = None,
+                       max_recipe_id: Optional[int] = None):
+    """Select (id, user_id, image_url) of deletable temporary recipes, oldest first.
+
+    Recipes that a cooking session still points to are kept.
+    """
+    query = (
+        select(Recipe.id, Recipe.user_id, Recipe.image_url)
+        .where(Recipe.is_permanent == False)
+        .where(~exists().where(CookingSession.recipe_id == Recipe.id))
+        .order_by(Recipe.id)
+    )
+    if created_before is not None:
+        query = query.where(Recipe.created_at < created_before)
+    if user_id is not None:
+        query = query.where(Recipe.user_id == user_id)
+    if max_recipe_id is not None:
+        query = query.where(Recipe.id <= max_recipe_id)
+    return query
+
+
+async def get_max_recipe_id(db: AsyncSession) -> int:
+    """The highest recipe ID, used to bound deferred deletions to recipes that already exist."""
+    result = await db.execute(select(Recipe.id).order_by(Recipe.id.desc()).limit(1))
+    return result.scalar_one_or_none() or 0
+
+
+async def delete_temporary_recipes(db: AsyncSession,
+                                   created_before: Optional[datetime] = None,
+                                   user_id: Optional[str] = None,
+                                   max_recipe_id: Optional[int] = None,
+                                   batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[int, List[str]]:
+    """Delete temporary recipes with their ingredients, steps and links, chunk by chunk.
+
+    Returns:
+        (number of deleted recipes, image keys of the deleted recipes)
+    """
+    deleted = 0
+    image_keys: List[str] = []
+    while True:
+        result = await db.execute(
+            _temporary_recipes(created_before, user_id, max_recipe_id).limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        recipe_ids = [row.id for row in rows]
+
+        await collection_crud.touch_collections(
+            db, select(CollectionRecipe.collection_id).where(CollectionRecipe.recipe_id.in_(recipe_ids))
+        )
+        for table, recipe_column in _RECIPE_CHILDREN:
+            await db.execute(delete(table).where(recipe_column.in_(recipe_ids)))
+        await db.execute(delete(Recipe).where(Recipe.id.in_(recipe_ids)))
+        await db.commit()
+
+        for row in rows:
+            await invalidate_recipe(row.id, row.user_id)
+        image_keys.extend(row.image_url for row in rows if row.image_url)
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            break
+    return deleted, image_keys
+
+
+async def delete_preparing_sessions(db: AsyncSession,
+                                    created_before: Optional[datetime] = None,
+                                    preparing_session_id: Optional[int] = None,
+                                    batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Delete preparing sessions and their suggestion links, chunk by chunk. Returns the number deleted."""
+    deleted = 0
+    while True:
+        query = select(PreparingSession.id).order_by(PreparingSession.id).limit(batch_size)
+        if created_before is not None:
+            query = query.where(PreparingSession.created_at < created_before)
+        if preparing_session_id is not None:
+            query = query.where(PreparingSession.id == preparing_session_id)
+        result = await db.execute(query)
+        session_ids = list(result.scalars().all())
+        if not session_ids:
+            break
+
+        await db.execute(
+            delete(PreparingSessionRecipe).where(PreparingSessionRecipe.preparing_session_id.in_(session_ids))
+        )
+        await db.execute(
+            update(Recipe)
+            .where(Recipe.preparing_session_id.in_(session_ids))
+            .values(preparing_session_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(delete(PreparingSession).where(PreparingSession.id.in_(session_ids)))
+        await db.commit()
+
+        deleted += len(session_ids)
+        if len(session_ids) < batch_size:
+            break
+    return deleted
@@ -1,9 +1,11 @@
-from typing import List, Optional
-from sqlalchemy import select, func
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import select, func, delete, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from ..entity_cache import COLLECTION_OVERVIEW, entity_cache, invalidate_collection_overview
 from ..models.db_recipe import Collection, CollectionRecipe, Recipe
+from . import sync_crud
 
 
 async def get_collection_by_id(db: AsyncSession, collection_id: int, owner_id: Optional[str] = None) -> Optional[Collection]:
@@ -25,6 +27,92 @@ async def get_collections_by_user_id(db: AsyncSession, user_id: str) -> List[Col
     return result.scalars().all()
 
 
+async def get_collection_version(db: AsyncSession, collection_id: int, owner_id: str) -> Optional[Any]:
+    """Retrieve only (version, updated_at) of a collection of the owner, for conditional requests."""
+    result = await db.execute(
+        select(Collection.version, Collection.updated_at)
+        .filter(Collection.id == collection_id, Collection.owner_id == owner_id)
+    )
+    return result.first()
+
+
+async def get_collection_versions(db: AsyncSession, user_id: str) -> List[Any]:
+    """Retrieve (id, version, updated_at) of all collections of a user, in overview order."""
+    result = await db.execute(
+        select(Collection.id, Collection.version, Collection.updated_at)
+        .filter(Collection.owner_id == user_id)
+        .order_by(Collection.created_at.desc())
+    )
+    return result.all()
+
+
+async def touch_collections(db: AsyncSession, collection_ids) -> None:
+    """Bump the version of collections, given as IDs or a subquery (within the current transaction)."""
+    await db.execute(
+        update(Collection)
+        .where(Collection.id.in_(collection_ids))
+        .values(version=Collection.version + 1, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_collection_overview(db: AsyncSession,
+                                  user_id: str,
+                                  preview_limit: int = 4,
+                                  versions: Optional[List[Tuple[int, int]]] = None) -> List[dict]:
+    """Retrieve all collections of a user with recipe IDs and preview images, served from the entity cache.
+
+    Each entry also carries the collection version and updated_at. A cached overview that does
+    not match versions (e.g. from get_collection_versions) is reloaded. Without versions and
+    without the shared cache tier, they are read first, so a worker never serves an overview
+    another worker has changed since.
+    """
+    if versions is None and entity_cache.enabled and entity_cache.shared is None:
+        versions = [(row.id, row.version) for row in await get_collection_versions(db, user_id)]
+
+    async def _load() -> List[dict]:
+        collections = await get_collections_by_user_id(db, user_id)
+        if not collections:
+            return []
+        collection_ids = [collection.id for collection in collections]
+
+        result = await db.execute(
+            select(CollectionRecipe.collection_id, Recipe.id, Recipe.image_url)
+            .join(Recipe, CollectionRecipe.recipe_id == Recipe.id)
+            .filter(CollectionRecipe.collection_id.in_(collection_ids))
+            .order_by(CollectionRecipe.collection_id, CollectionRecipe.added_at.desc())
+        )
+        recipe_ids = {collection_id: [] for collection_id in collection_ids}
+        preview_images = {collection_id: [] for collection_id in collection_ids}
+        for collection_id, recipe_id, image_url in result:
+            recipe_ids[collection_id].append(recipe_id)
+            if image_url and len(preview_images[collection_id]) < preview_limit:
+                preview_images[collection_id].append(image_url)
+
+        return [
+            {
+                "id": collection.id,
+                "name": collection.name,
+                "description": collection.description,
+                "owner_id": collection.owner_id,
+                "created_at": collection.created_at.isoformat() if collection.created_at else None,
+                "updated_at": collection.updated_at.isoformat() if collection.updated_at else None,
+                "version": collection.version,
+                "recipe_count": len(recipe_ids[collection.id]),
+                "preview_image_urls": preview_images[collection.id],
+                "collage_key": collection.collage_key,
+                "recipe_ids": recipe_ids[collection.id],
+            }
+            for collection in collections
+        ]
+
+    def _is_current(overview: List[dict]) -> bool:
+        return [(item["id"], item["version"]) for item in overview] == list(versions)
+
+    return await entity_cache.get_or_load(COLLECTION_OVERVIEW, user_id, _load,
+                                          is_current=None if versions is None else _is_current)
+
+
 async def get_collection_recipe_count(db: AsyncSession, collection_id: int) -> int:
     """Get the number of recipes in a collection."""
     result = await db.execute(
@@ -49,6 +137,25 @@ async def get_collection_preview_images(db: AsyncSession, collection_id: int, li
     return list(image_urls)
 
 
+async def set_collage_key(db: AsyncSession, collection_id: int, collage_key: str) -> Tuple[bool, Optional[str]]:
+    """Store the key of a newly rendered collage and bump the collection version.
+
+    Returns:
+        Whether the collection still exists and the key of the collage it replaces.
+    """
+    result = await db.execute(
+        select(Collection.owner_id, Collection.collage_key).filter(Collection.id == collection_id)
+    )
+    row = result.first()
+    if row is None:
+        return False, None
+    await db.execute(update(Collection).where(Collection.id == collection_id).values(collage_key=collage_key))
+    await touch_collections(db, [collection_id])
+    await db.commit()
+    await invalidate_collection_overview(row.owner_id)
+    return True, row.collage_key
+
+
 async def create_collection(db: AsyncSession, owner_id: str, name: str, description: Optional[str] = None) -> Collection:
     """Create a new collection."""
     collection = Collection(
@@ -57,7 +164,10 @@ async def create_collection(db: AsyncSession, owner_id: str, name: str, descript
         description=description,
     )
     db.add(collection)
+    await db.flush()
+    await sync_crud.log_changes(db, owner_id, sync_crud.COLLECTION, [collection.id], sync_crud.UPSERT)
     await db.commit()
+    await invalidate_collection_overview(owner_id)
     await db.refresh(collection)
     return collection
 
@@ -77,7 +187,11 @@ async def update_collection(db: AsyncSession, collection_id: int, name: Optional
         collection.description = description
 
     db.add(collection)
+    await db.flush()
+    await touch_collections(db, [collection_id])
+    await sync_crud.log_changes(db, collection.owner_id, sync_crud.COLLECTION, [collection_id], sync_crud.UPSERT)
     await db.commit()
+    await invalidate_collection_overview(collection.owner_id)
     await db.refresh(collection)
     return collection
 
@@ -88,8 +202,11 @@ async def delete_collection(db: AsyncSession, collection_id: int) -> bool:
     collection = result.scalar_one_or_none()
     if not collection:
         return False
+    owner_id = collection.owner_id
+    await sync_crud.log_changes(db, owner_id, sync_crud.COLLECTION, [collection_id], sync_crud.DELETE)
     await db.delete(collection)
     await db.commit()
+    await invalidate_collection_overview(owner_id)
     return True
 
 
@@ -117,7 +234,10 @@ async def add_recipe_to_collection(db: AsyncSession, collection_id: int, recipe_
 
     collection_recipe = CollectionRecipe(collection_id=collection_id, recipe_id=recipe_id)
     db.add(collection_recipe)
+    await touch_collections(db, [collection_id])
+    await sync_crud.log_membership_changes(db, collection_id, [recipe_id], sync_crud.UPSERT)
     await db.commit()
+    await _invalidate_owner_overview(db, collection_id)
     return True
 
 
@@ -131,7 +251,10 @@ async def remove_recipe_from_collection(db: AsyncSession, collection_id: int, re
     if not collection_recipe:
         return False
     await db.delete(collection_recipe)
+    await touch_collections(db, [collection_id])
+    await sync_crud.log_membership_changes(db, collection_id, [recipe_id], sync_crud.DELETE)
     await db.commit()
+    await _invalidate_owner_overview(db, collection_id)
     return True
 
 
@@ -147,14 +270,26 @@ async def update_collection_recipes(db: AsyncSession, collection_id: int, recipe
 
     # Remove recipes that are no longer in the list
     to_remove = current_recipe_ids - new_recipe_ids
-    for recipe_id in to_remove:
-        await remove_recipe_from_collection(db, collection_id, recipe_id)
+    if to_remove:
+        await db.execute(
+            delete(CollectionRecipe)
+            .where(CollectionRecipe.collection_id == collection_id, CollectionRecipe.recipe_id.in_(to_remove))
+        )
 
     # Add recipes that are new to the list
     to_add = new_recipe_ids - current_recipe_ids
-    for recipe_id in to_add:
-        await add_recipe_to_collection(db, collection_id, recipe_id)
+    if to_add:
+        await db.execute(
+            insert(CollectionRecipe),
+            [{"collection_id": collection_id, "recipe_id": recipe_id} for recipe_id in to_add],
+        )
 
+    if to_remove or to_add:
+        await touch_collections(db, [collection_id])
+        await sync_crud.log_membership_changes(db, collection_id, sorted(to_remove), sync_crud.DELETE)
+        await sync_crud.log_membership_changes(db, collection_id, sorted(to_add), sync_crud.UPSERT)
+        await db.commit()
+        await _invalidate_owner_overview(db, collection_id)
     return True
 
 
@@ -190,8 +325,20 @@ async def create_default_collections(db: AsyncSession, user_id: str) -> List[Col
         db.add(collection)
         created_collections.append(collection)
 
+    await db.flush()
+    await sync_crud.log_changes(db, user_id, sync_crud.COLLECTION,
+                                [collection.id for collection in created_collections], sync_crud.UPSERT)
     await db.commit()
+    await invalidate_collection_overview(user_id)
     for collection in created_collections:
         await db.refresh(collection)
 
     return created_collections
+
+
+async def _invalidate_owner_overview(db: AsyncSession, collection_id: int) -> None:
+    """Invalidate the collection overview of the owner of a collection."""
+    result = await db.execute(select(Collection.owner_id).filter(Collection.id == collection_id))
+    owner_id = result.scalar_one_or_none()
+    if owner_id is not None:
+        await invalidate_collection_overview(owner_id)
@@ -1,50 +1,98 @@
 import json
-from typing import List, Optional
-from sqlalchemy import select
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
+from ..cooking_state_buffer import cooking_state_buffer
 from ..models.db_recipe import CookingSession, PromptHistory
 
 
+def _with_buffered_state(cooking_session: Optional[CookingSession]) -> Optional[CookingSession]:
+    """Overlay a state change that is still in the write-behind buffer (without marking the row dirty)."""
+    if cooking_session is not None:
+        state = cooking_state_buffer.pending_state(cooking_session.id)
+        if state is not None:
+            set_committed_value(cooking_session, "state", state)
+    return cooking_session
+
+
 async def get_cooking_session_by_id(db: AsyncSession, cooking_session_id: int) -> Optional[CookingSession]:
     """Retrieve a cooking session by its ID."""
     result = await db.execute(select(CookingSession).filter(CookingSession.id == cooking_session_id))
-    return result.scalar_one_or_none()
+    return _with_buffered_state(result.scalar_one_or_none())
 
-async def get_prompt_history_by_cooking_session_id(db: AsyncSession, cooking_session_id: int, user_id: str) -> Optional[PromptHistory]:
-    """Retrieve the prompt history by cooking session ID."""
+async def get_cooking_session_with_history(db: AsyncSession,
+                                          cooking_session_id: int) -> Optional[Tuple[CookingSession, Optional[PromptHistory]]]:
+    """Retrieve a cooking session and the prompt history of its current state in one query."""
+    result = await db.execute(
+        select(CookingSession, PromptHistory)
+        .outerjoin(PromptHistory, and_(
+            PromptHistory.cooking_session_id == CookingSession.id,
+            PromptHistory.state == CookingSession.state,
+        ))
+        .where(CookingSession.id == cooking_session_id)
+        .order_by(PromptHistory.id)
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    cooking_session, prompt_history = row
+    stored_state = cooking_session.state
+    if _with_buffered_state(cooking_session).state != stored_state:
+        # The joined history belongs to the stored state, not to the buffered one
+        result = await db.execute(
+            select(PromptHistory)
+            .where(PromptHistory.cooking_session_id == cooking_session.id,
+                   PromptHistory.state == cooking_session.state)
+            .order_by(PromptHistory.id)
+        )
+        prompt_history = result.scalars().first()
+    return cooking_session, prompt_history
 
-    # Step 1: Get the cooking session to know its current state
-    result = await db.execute(select(CookingSession).where(CookingSession.id == cooking_session_id))
-    cooking_session = result.scalars().first()
+async def get_prompt_history_by_cooking_session_id(db: AsyncSession, cooking_session_id: int, user_id: str) -> Optional[PromptHistory]:
+    """Retrieve the prompt history of the current state of a cooking session without writing.
 
-    if not cooking_session:
+    A state without history yields an empty, unsaved PromptHistory.
+    """
+    row = await get_cooking_session_with_history(db, cooking_session_id)
+    if row is None:
         return None
+    cooking_session, prompt_history = row
     if cooking_session.user_id != user_id:
         return None
+    if prompt_history is None:
+        prompt_history = _empty_prompt_history(cooking_session)
+    return prompt_history
 
-    # Step 2: Get the matching prompt history (same session and same state)
+async def get_or_create_prompt_history(db: AsyncSession, cooking_session: CookingSession) -> PromptHistory:
+    """Retrieve the prompt history of the current state of a cooking session, creating it if missing."""
     result = await db.execute(select(PromptHistory)
         .where(
             PromptHistory.cooking_session_id == cooking_session.id,
             PromptHistory.state == cooking_session.state,
         )
+        .order_by(PromptHistory.id)
     )
     prompt_history = result.scalars().first()
 
     if not prompt_history:
-        prompt_history = PromptHistory(
-            cooking_session_id=cooking_session.id,
-            state=cooking_session.state,
-            prompts=json.dumps([]),     # start empty
-            responses=json.dumps([]),   # start empty
-        )
+        prompt_history = _empty_prompt_history(cooking_session)
         db.add(prompt_history)
         await db.commit()
         await db.refresh(prompt_history)  # refresh to get the assigned ID
 
     return prompt_history
 
+def _empty_prompt_history(cooking_session: CookingSession) -> PromptHistory:
+    return PromptHistory(
+        cooking_session_id=cooking_session.id,
+        state=cooking_session.state,
+        prompts=json.dumps([]),     # start empty
+        responses=json.dumps([]),   # start empty
+    )
+
 async def update_prompt_history(db: AsyncSession,
                                 prompt_history_id: int,
                                 new_prompt: str,
@@ -73,13 +121,21 @@ async def create_cooking_session(db: AsyncSession,
     db.add(cooking_session)
     await db.commit()
     await db.refresh(cooking_session)
+    cooking_state_buffer.remember(cooking_session.id, user_id, recipe_id)
     return cooking_session
 
 async def update_cooking_session_state(db: AsyncSession,
                                cooking_session_id: int,
                                new_state: int,
                                current_user_id: str) -> Optional[CookingSession]:
-    """Update the state of an existing cooking session in the database."""
+    """Update the state of an existing cooking session in the database.
+
+    With the write-behind buffer enabled the change is acknowledged from memory and written
+    later; the returned session is then not attached to db.
+    """
+    if cooking_state_buffer.enabled:
+        return await _buffer_cooking_session_state(db, cooking_session_id, new_state, current_user_id)
+
     result = await db.execute(select(CookingSession).filter(CookingSession.id == cooking_session_id))
     cooking_session = result.scalar_one_or_none()
     if not cooking_session:
@@ -92,6 +148,25 @@ async def update_cooking_session_state(db: AsyncSession,
     await db.refresh(cooking_session)
     return cooking_session
 
+async def _buffer_cooking_session_state(db: AsyncSession,
+                                       cooking_session_id: int,
+                                       new_state: int,
+                                       current_user_id: str) -> Optional[CookingSession]:
+    known = cooking_state_buffer.known(cooking_session_id)
+    if known is None:
+        result = await db.execute(
+            select(CookingSession.user_id, CookingSession.recipe_id).filter(CookingSession.id == cooking_session_id)
+        )
+        known = result.first()
+        if known is None:
+            return None
+        cooking_state_buffer.remember(cooking_session_id, known[0], known[1])
+    user_id, recipe_id = known
+    if user_id != current_user_id:
+        return None
+    cooking_state_buffer.record(cooking_session_id, new_state)
+    return CookingSession(id=cooking_session_id, user_id=user_id, recipe_id=recipe_id, state=new_state)
+
 async def delete_cooking_session(db: AsyncSession,
                                cooking_session_id: int,
                                current_user_id: str) -> bool:
@@ -104,4 +179,6 @@ async def delete_cooking_session(db: AsyncSession,
         return False
     await db.delete(cooking_session)
     await db.commit()
+    # A buffered step change of a finished session does not need to be written anymore
+    cooking_state_buffer.discard(cooking_session_id)
     return True
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Index of the objects in the storage bucket (files table).
+
+bucket_base_repo records every upload and removes the entry on delete (through
+db/file_index.py), so listing a user's files and computing their storage usage are database
+queries instead of bucket listings.
+
+Content-addressed objects are shared; their reference counts are recomputed from the recipe
+and user rows pointing at them, and the blob sweep (core/sweeper.py) claims and deletes those
+unreferenced for longer than the grace period.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.db_recipe import Recipe, StoredFile
+from ..models.db_user import User
+
+
+async def record_file(
+    db: AsyncSession,
+    key: str,
+    user_id: str,
+    category: str,
+    size: int,
+    content_type: Optional[str],
+    sha256: Optional[str],
+    original_filename: Optional[str],
+    content_addressed: bool = False,
+) -> None:
+    """Insert the entry of an uploaded object, or update it if the key was written again.
+
+    Uploading a content-addressed object again restarts its grace period, and the row lock
+    taken here waits for a blob sweep that is deleting the object (see claim_unreferenced).
+    """
+    values = {
+        "user_id": user_id,
+        "category": category,
+        "size": size,
+        "content_type": content_type,
+        "sha256": sha256,
+        "original_filename": original_filename,
+        "content_addressed": content_addressed,
+        "unreferenced_since": None,
+    }
+    result = await db.execute(update(StoredFile).where(StoredFile.key == key).values(**values))
+    if result.rowcount == 0:
+        db.add(StoredFile(key=key, **values))
+        await db.flush()
+
+
+async def delete_file_records(db: AsyncSession, keys: Iterable[str]) -> int:
+    """Remove the entries of deleted objects; returns the number of removed entries."""
+    keys = list(keys)
+    if not keys:
+        return 0
+    result = await db.execute(delete(StoredFile).where(StoredFile.key.in_(keys)))
+    return result.rowcount
+
+
+async def list_files(
+    db: AsyncSession,
+    user_id: str,
+    category: Optional[str] = None,
+    date_prefix: Optional[str] = None,
+    limit: int = 100,
+    after: Optional[int] = None,
+) -> Tuple[List[StoredFile], Optional[int]]:
+    """
+    One page of a user's files, newest first.
+
+    date_prefix (e.g. "01-10-2025") filters on the date segment of the key and requires a
+    category, like the bucket prefix it replaces.
+
+    Returns:
+        The files of the page and the id to pass as after for the next page (None on the last page).
+    """
+    query = select(StoredFile).where(StoredFile.user_id == user_id)
+    if category:
+        query = query.where(StoredFile.category == category)
+        if date_prefix:
+            query = query.where(StoredFile.key.startswith(f"users/{user_id}/{category}/{date_prefix}", autoescape=True))
+    if after is not None:
+        query = query.where(StoredFile.id < after)
+    result = await db.execute(query.order_by(StoredFile.id.desc()).limit(limit + 1))
+    files = list(result.scalars().all())
+    if len(files) > limit:
+        return files[:limit], files[limit - 1].id
+    return files, None
+
+
+async def get_usage(db: AsyncSession, user_id: str) -> Dict[str, Any]:
+    """Number and total size of a user's files, overall and per category (one index-only aggregate)."""
+    result = await db.execute(
+        select(StoredFile.category, func.count(), func.coalesce(func.sum(StoredFile.size), 0))
+        .where(StoredFile.user_id == user_id)
+        .group_by(StoredFile.category)
+    )
+    by_category = {category: {"files": count, "bytes": int(size)} for category, count, size in result.all()}
+    return {
+        "files": sum(entry["files"] for entry in by_category.values()),
+        "bytes": sum(entry["bytes"] for entry in by_category.values()),
+        "by_category": by_category,
+    }
+
+
+def _reference_count():
+    """Number of recipe and user rows referencing the key of the files row (correlated subqueries).
+
+    Profile images are stored as URLs, so the owner's row references a key it ends with.
+    """
+    recipes = select(func.count()).where(Recipe.image_url == StoredFile.key).scalar_subquery()
+    users = (
+        select(func.count())
+        .where(User.id == StoredFile.user_id, User.profile_image_url.endswith(StoredFile.key))
+        .scalar_subquery()
+    )
+    return recipes + users
+
+
+async def refresh_ref_counts(db: AsyncSession, now: datetime) -> None:
+    """Recount the references of all content-addressed objects and (re)start or stop their grace periods."""
+    content_addressed = StoredFile.content_addressed == True
+    await db.execute(update(StoredFile).where(content_addressed).values(ref_count=_reference_count()))
+    await db.execute(
+        update(StoredFile)
+        .where(content_addressed, StoredFile.ref_count == 0, StoredFile.unreferenced_since.is_(None))
+        .values(unreferenced_since=now)
+    )
+    await db.execute(
+        update(StoredFile)
+        .where(content_addressed, StoredFile.ref_count > 0, StoredFile.unreferenced_since.isnot(None))
+        .values(unreferenced_since=None)
+    )
+
+
+async def release_file(db: AsyncSession, key: str, now: datetime) -> bool:
+    """Start the grace period of a content-addressed object whose owner deleted it.
+
+    The object may still be referenced by other rows; the next refresh_ref_counts ends the
+    grace period again in that case. Returns whether the key is an indexed content-addressed object.
+    """
+    result = await db.execute(
+        update(StoredFile)
+        .where(StoredFile.key == key, StoredFile.content_addressed == True)
+        .values(unreferenced_since=func.coalesce(StoredFile.unreferenced_since, now))
+    )
+    return result.rowcount == 1
+
+
+async def get_unreferenced_keys(db: AsyncSession, unreferenced_before: datetime, limit: int) -> List[str]:
+    """Keys of content-addressed objects that have been unreferenced since before the given time."""
+    result = await db.execute(
+        select(StoredFile.key)
+        .where(
+            StoredFile.content_addressed == True,
+            StoredFile.unreferenced_since < unreferenced_before,
+            StoredFile.ref_count == 0,
+        )
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def claim_unreferenced(db: AsyncSession, key: str, unreferenced_before: datetime) -> bool:
+    """Remove the entry of an object about to be deleted, if it is still unreferenced and past its grace period.
+
+    The object has to be deleted before this transaction commits: an upload of the same bytes
+    meanwhile blocks in record_file and then stores the object again.
+    """
+    result = await db.execute(
+        delete(StoredFile).where(
+            StoredFile.key == key,
+            StoredFile.content_addressed == True,
+            StoredFile.unreferenced_since < unreferenced_before,
+            StoredFile.ref_count == 0,
+            _reference_count() == 0,
+        )
+    )
+    return result.rowcount == 1
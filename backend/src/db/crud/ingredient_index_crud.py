@@ -0,0 +1,201 @@
+"""
+Inverted index from canonical ingredient names to the saved recipes of a user.
+
+Used to answer "what can I cook with what I have" without an LLM call: the available
+ingredients are canonicalized the same way as RecipeIngredient.name and every saved recipe
+is scored by the share of its ingredients that are covered.
+"""
+import re
+import unicodedata
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import delete, distinct, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.db_recipe import Recipe, RecipeIngredient, RecipeIngredientTerm
+
+# Words that describe amount, packaging or preparation rather than the ingredient itself
+_DESCRIPTORS = {
+    "a", "an", "the", "of", "and", "or", "some", "few", "half", "whole", "about", "to", "taste",
+    "fresh", "frozen", "dried", "canned", "cooked", "raw", "ripe", "organic",
+    "chopped", "diced", "sliced", "minced", "grated", "shredded", "crushed", "peeled", "ground",
+    "large", "small", "medium", "big", "extra", "virgin", "finely", "roughly", "thinly",
+    "bottle", "bottles", "can", "cans", "jar", "jars", "pack", "package", "packet", "bag", "box",
+    "piece", "pieces", "slice", "slices", "bunch", "clove", "cloves", "pinch", "handful", "dash",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon", "teaspoons",
+    "g", "kg", "mg", "ml", "l", "oz", "lb", "lbs",
+}
+
+# Assumed to be in every kitchen, so they neither count against nor for a recipe
+PANTRY_STAPLES = {"salt", "pepper", "black pepper", "water", "oil", "olive oil", "vegetable oil"}
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+_LIST_SEPARATOR = re.compile(r"[,;\n]|\band\b", re.IGNORECASE)
+_TERM_MAX_LENGTH = 100
+
+
+def _singularize(word: str) -> str:
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def canonicalize_ingredient(name: str) -> Optional[str]:
+    """Reduce an ingredient name to a canonical term, e.g. "2 Fresh Tomatoes (diced)" -> "tomato"."""
+    if not name:
+        return None
+    text = unicodedata.normalize("NFKD", name.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"\(.*?\)", " ", text)
+    words = [_singularize(word) for word in _WORD_PATTERN.findall(text) if word not in _DESCRIPTORS]
+    term = " ".join(words)[:_TERM_MAX_LENGTH].strip()
+    return term or None
+
+
+def canonicalize_ingredient_list(ingredients: Iterable[str]) -> Set[str]:
+    """Canonicalize free-text ingredient lists (e.g. image analysis output) without pantry staples."""
+    terms = set()
+    for entry in ingredients:
+        for part in _LIST_SEPARATOR.split(entry or ""):
+            term = canonicalize_ingredient(part)
+            if term and term not in PANTRY_STAPLES:
+                terms.add(term)
+    return terms
+
+
+def _head(term: str) -> str:
+    return term.rsplit(" ", 1)[-1]
+
+
+def _term_matches(term: str, available: Set[str]) -> bool:
+    """A recipe term is covered by an exact match, or when either side is just the head noun.
+
+    "onion" covers "red onion" and "red onion" covers "onion", but "goat cheese" does not
+    cover "parmesan cheese".
+    """
+    if term in available:
+        return True
+    available_heads = {_head(item) for item in available}
+    single_words = {item for item in available if " " not in item}
+    return term in available_heads or _head(term) in single_words
+
+
+async def index_recipe_ingredients(db: AsyncSession, recipe_id: int) -> None:
+    """Rebuild the index entries of a recipe (within the current transaction).
+
+    Only permanent recipes are indexed; entries of temporary recipes are removed.
+    """
+    await db.execute(delete(RecipeIngredientTerm).where(RecipeIngredientTerm.recipe_id == recipe_id))
+
+    result = await db.execute(
+        select(Recipe.user_id).where(Recipe.id == recipe_id, Recipe.is_permanent == True)
+    )
+    user_id = result.scalar_one_or_none()
+    if user_id is None:
+        return
+
+    result = await db.execute(select(RecipeIngredient.name).where(RecipeIngredient.recipe_id == recipe_id))
+    terms = {canonicalize_ingredient(name) for name in result.scalars().all()}
+    terms = sorted(term for term in terms if term and term not in PANTRY_STAPLES)
+    if terms:
+        await db.execute(
+            insert(RecipeIngredientTerm),
+            [{"recipe_id": recipe_id, "user_id": user_id, "term": term, "head": _head(term)} for term in terms],
+        )
+
+
+async def match_recipes_by_ingredients(db: AsyncSession,
+                                       user_id: str,
+                                       ingredients: Iterable[str],
+                                       limit: int = 10) -> List[dict]:
+    """Rank the saved recipes of a user by how much of each recipe the given ingredients cover.
+
+    Returns:
+        Dicts with recipe_id, matched_count, total_count, coverage and missing_ingredients,
+        best coverage first.
+    """
+    available = canonicalize_ingredient_list(ingredients)
+    if not available:
+        return []
+
+    lookup_terms = available | {_head(term) for term in available}
+    single_words = {term for term in available if " " not in term}
+
+    matched = (
+        select(RecipeIngredientTerm.recipe_id, func.count(distinct(RecipeIngredientTerm.term)).label("matched"))
+        .where(
+            RecipeIngredientTerm.user_id == user_id,
+            or_(RecipeIngredientTerm.term.in_(lookup_terms), RecipeIngredientTerm.head.in_(single_words)),
+        )
+        .group_by(RecipeIngredientTerm.recipe_id)
+        .subquery()
+    )
+    totals = (
+        select(RecipeIngredientTerm.recipe_id, func.count().label("total"))
+        .where(RecipeIngredientTerm.recipe_id.in_(select(matched.c.recipe_id)))
+        .group_by(RecipeIngredientTerm.recipe_id)
+        .subquery()
+    )
+    coverage = (matched.c.matched * 1.0 / totals.c.total).label("coverage")
+    result = await db.execute(
+        select(matched.c.recipe_id, matched.c.matched, totals.c.total, coverage)
+        .join(totals, totals.c.recipe_id == matched.c.recipe_id)
+        .order_by(coverage.desc(), matched.c.matched.desc(), matched.c.recipe_id.desc())
+        .limit(limit)
+    )
+    ranked = result.all()
+    if not ranked:
+        return []
+
+    result = await db.execute(
+        select(RecipeIngredientTerm.recipe_id, RecipeIngredientTerm.term)
+        .where(RecipeIngredientTerm.recipe_id.in_([row.recipe_id for row in ranked]))
+        .order_by(RecipeIngredientTerm.term)
+    )
+    missing = {row.recipe_id: [] for row in ranked}
+    for recipe_id, term in result:
+        if not _term_matches(term, available):
+            missing[recipe_id].append(term)
+
+    return [
+        {
+            "recipe_id": row.recipe_id,
+            "matched_count": row.matched,
+            "total_count": row.total,
+            "coverage": float(row.coverage),
+            "missing_ingredients": missing[row.recipe_id],
+        }
+        for row in ranked
+    ]
+
+
+async def rebuild_ingredient_index(conn, batch_size: int = 500) -> None:
+    """Fill the index from the saved recipes if it is empty (startup backfill)."""
+    result = await conn.execute(select(RecipeIngredientTerm.id).limit(1))
+    if result.first() is not None:
+        return
+
+    result = await conn.execute(
+        select(Recipe.id, Recipe.user_id).where(Recipe.is_permanent == True).order_by(Recipe.id)
+    )
+    owners = {row.id: row.user_id for row in result}
+    recipe_ids = list(owners)
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        result = await conn.execute(
+            select(RecipeIngredient.recipe_id, RecipeIngredient.name).where(RecipeIngredient.recipe_id.in_(batch))
+        )
+        rows = {}
+        for recipe_id, name in result:
+            term = canonicalize_ingredient(name)
+            if term and term not in PANTRY_STAPLES:
+                rows[(recipe_id, term)] = {"recipe_id": recipe_id, "user_id": owners[recipe_id],
+                                           "term": term, "head": _head(term)}
+        if rows:
+            await conn.execute(insert(RecipeIngredientTerm), list(rows.values()))
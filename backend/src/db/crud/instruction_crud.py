@@ -2,7 +2,9 @@ from typing import List, Optional
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..entity_cache import invalidate_recipe
 from ..models.db_recipe import InstructionStep
+from . import recipe_crud, search_crud
 
 
 async def get_instructions_by_recipe_id(db: AsyncSession, recipe_id: int, user_id: str) -> List[InstructionStep]:
@@ -50,7 +52,11 @@ async def create_instruction_steps(
         db.add(instruction_step)
         instruction_steps.append(instruction_step)
 
+    await db.flush()
+    await recipe_crud.touch_recipe(db, recipe_id)
+    await search_crud.index_recipe(db, recipe_id)
     await db.commit()
+    await invalidate_recipe(recipe_id)
 
     # Refresh to get IDs
     for step in instruction_steps:
@@ -87,5 +93,8 @@ async def delete_instruction_steps(db: AsyncSession, recipe_id: int, user_id: st
             InstructionStep.recipe.user_id == user_id
         )
     )
+    await recipe_crud.touch_recipe(db, recipe_id)
+    await search_crud.index_recipe(db, recipe_id)
     await db.commit()
+    await invalidate_recipe(recipe_id)
     return True
\ No newline at end of file
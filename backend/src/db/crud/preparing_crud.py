@@ -1,11 +1,10 @@
 import json
 from typing import List, Optional
-from sqlalchemy import select
+from sqlalchemy import select, update, insert, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from ...api.schemas.recipe import Ingredient
-from ..models.db_recipe import Recipe, PreparingSession
+from ..models.db_recipe import Recipe, PreparingSession, PreparingSessionRecipe
 
 
 async def create_or_update_preparing_session(
@@ -36,66 +35,29 @@ async def create_or_update_preparing_session(
             if session.user_id != user_id:
                 raise PermissionError("Preparing session does not belong to the authenticated user.")
 
-            existing_recipe_ids = _load_recipe_id_list(session.context_suggestions)
-            if recipe_ids:
-                merged_context_ids = _merge_unique_ids(existing_recipe_ids, recipe_ids)
-                session.context_suggestions = json.dumps(merged_context_ids)
-
-            # Update recipe relationships
-            if recipe_ids:
-                # Fetch the recipes and set their preparing_session_id
-                result = await db.execute(select(Recipe).where(Recipe.id.in_(recipe_ids)))
-                recipes = result.scalars().all()
-                for recipe in recipes:
-                    recipe.preparing_session_id = preparing_session_id
-
+            await _append_recipe_links(db, session.id, recipe_ids)
             await db.commit()
             await db.refresh(session)
             return session
 
     # Create new session
-    serialized_ids = json.dumps(recipe_ids)
-    new_session = PreparingSession(
-        user_id=user_id,
-        context_suggestions=serialized_ids,
-    )
+    new_session = PreparingSession(user_id=user_id)
     db.add(new_session)
+    await db.flush()
+
+    await _append_recipe_links(db, new_session.id, recipe_ids)
     await db.commit()
     await db.refresh(new_session)
-
-    # Set recipes to belong to this session
-    if recipe_ids:
-        result = await db.execute(select(Recipe).where(Recipe.id.in_(recipe_ids)))
-        recipes = result.scalars().all()
-        for recipe in recipes:
-            recipe.preparing_session_id = new_session.id
-        await db.commit()
-        await db.refresh(new_session)
-
     return new_session
 
 
-async def delete_preparing_session(db: AsyncSession,
-                               preparing_session_id: int,
-                               user_id: str) -> bool:
-    """Delete a preparing session from the database."""
+async def get_preparing_session_by_id(db: AsyncSession,
+                                     preparing_session_id: int,
+                                     user_id: str) -> Optional[PreparingSession]:
+    """Retrieve a preparing session of a user. Deletion is done by cleanup_crud."""
     result = await db.execute(select(PreparingSession).filter(PreparingSession.id == preparing_session_id,
                                                              PreparingSession.user_id == user_id))
-    preparing_session = result.scalar_one_or_none()
-    if not preparing_session:
-        return False
-    
-    recipes = await db.execute(
-        select(Recipe)
-        .where(Recipe.user_id == preparing_session.user_id)
-        .where(Recipe.is_permanent == False)
-    )
-    for recipe in recipes.scalars():
-        await db.delete(recipe)
-
-    await db.delete(preparing_session)
-    await db.commit()
-    return True
+    return result.scalar_one_or_none()
 
 
 async def remove_recipe_from_current(
@@ -109,20 +71,17 @@ async def remove_recipe_from_current(
     if session is None:
         return None
 
-    # Find the recipe and set its preparing_session_id to NULL
-    target_id = int(recipe_id)
-    result = await db.execute(
-        select(Recipe).where(Recipe.id == target_id, Recipe.preparing_session_id == preparing_session_id)
+    await db.execute(
+        update(PreparingSessionRecipe)
+        .where(
+            PreparingSessionRecipe.preparing_session_id == preparing_session_id,
+            PreparingSessionRecipe.recipe_id == int(recipe_id),
+        )
+        .values(is_active=False)
     )
-    recipe = result.scalar_one_or_none()
-
-    if recipe:
-        recipe.preparing_session_id = None
-        await db.commit()
+    await db.commit()
 
-    # Return the current list of recipe IDs
-    await db.refresh(session)
-    return [r.id for r in session.current_recipes]
+    return await get_active_recipe_ids(db, preparing_session_id)
 
 
 async def add_recipe_to_current(
@@ -136,20 +95,75 @@ async def add_recipe_to_current(
     if session is None:
         return None
 
-    # Find the recipe and set its preparing_session_id
     target_id = int(recipe_id)
-    result = await db.execute(select(Recipe).where(Recipe.id == target_id))
-    recipe = result.scalar_one_or_none()
+    result = await db.execute(
+        update(PreparingSessionRecipe)
+        .where(
+            PreparingSessionRecipe.preparing_session_id == preparing_session_id,
+            PreparingSessionRecipe.recipe_id == target_id,
+        )
+        .values(is_active=True)
+    )
+    if result.rowcount == 0:
+        # Not suggested in this session yet: append it if the recipe exists
+        exists = await db.execute(select(Recipe.id).where(Recipe.id == target_id))
+        if exists.scalar_one_or_none() is not None:
+            await _append_recipe_links(db, preparing_session_id, [target_id])
+    await db.commit()
+
+    return await get_active_recipe_ids(db, preparing_session_id)
+
+
+async def get_active_recipe_ids(db: AsyncSession, preparing_session_id: int) -> List[int]:
+    """Return the active recipe IDs of a session in suggestion order."""
+    result = await db.execute(
+        select(PreparingSessionRecipe.recipe_id)
+        .where(
+            PreparingSessionRecipe.preparing_session_id == preparing_session_id,
+            PreparingSessionRecipe.is_active == True,
+        )
+        .order_by(PreparingSessionRecipe.position)
+    )
+    return list(result.scalars().all())
 
-    if recipe:
-        # Only update if not already assigned to this session
-        if recipe.preparing_session_id != preparing_session_id:
-            recipe.preparing_session_id = preparing_session_id
-            await db.commit()
 
-    # Return the current list of recipe IDs
-    await db.refresh(session)
-    return [r.id for r in session.current_recipes]
+async def _append_recipe_links(db: AsyncSession, preparing_session_id: int, recipe_ids: List[int]) -> None:
+    """Append recipes to a session's suggestions, skipping ones that are already linked."""
+    if not recipe_ids:
+        return
+
+    unique_ids = list(dict.fromkeys(recipe_ids))
+    result = await db.execute(
+        select(PreparingSessionRecipe.recipe_id)
+        .where(
+            PreparingSessionRecipe.preparing_session_id == preparing_session_id,
+            PreparingSessionRecipe.recipe_id.in_(unique_ids),
+        )
+    )
+    already_linked = set(result.scalars().all())
+    new_ids = [recipe_id for recipe_id in unique_ids if recipe_id not in already_linked]
+    if not new_ids:
+        return
+
+    result = await db.execute(
+        select(func.max(PreparingSessionRecipe.position))
+        .where(PreparingSessionRecipe.preparing_session_id == preparing_session_id)
+    )
+    max_position = result.scalar_one_or_none()
+    next_position = 0 if max_position is None else max_position + 1
+
+    await db.execute(
+        insert(PreparingSessionRecipe),
+        [
+            {
+                "preparing_session_id": preparing_session_id,
+                "recipe_id": recipe_id,
+                "position": next_position + offset,
+                "is_active": True,
+            }
+            for offset, recipe_id in enumerate(new_ids)
+        ],
+    )
 
 
 async def _get_session_for_user(
@@ -158,9 +172,7 @@ async def _get_session_for_user(
     user_id: str,
 ) -> Optional[PreparingSession]:
     result = await db.execute(
-        select(PreparingSession)
-        .options(selectinload(PreparingSession.current_recipes))
-        .filter(PreparingSession.id == preparing_session_id)
+        select(PreparingSession).filter(PreparingSession.id == preparing_session_id)
     )
     session = result.scalar_one_or_none()
     if session is None:
@@ -170,25 +182,6 @@ async def _get_session_for_user(
     return session
 
 
-def _load_recipe_id_list(raw_value: Optional[str]) -> List[int]:
-    """Parse a JSON encoded list of recipe identifiers."""
-    if not raw_value:
-        return []
-    try:
-        payload = json.loads(raw_value)
-    except (json.JSONDecodeError, TypeError):
-        return []
-    if not isinstance(payload, list):
-        return []
-    result: List[int] = []
-    for item in payload:
-        try:
-            result.append(int(item))
-        except (TypeError, ValueError):
-            continue
-    return result
-
-
 def _load_prompt_history(raw_value: Optional[str]) -> List[str]:
     """Parse stored prompts as a list of strings."""
     if not raw_value:
@@ -201,11 +194,3 @@ def _load_prompt_history(raw_value: Optional[str]) -> List[str]:
         return []
     return [str(item) for item in payload]
 
-
-def _merge_unique_ids(existing: List[int], additions: List[int]) -> List[int]:
-    """Append new identifiers while preserving order and uniqueness."""
-    merged = list(existing)
-    for recipe_id in additions:
-        if recipe_id not in merged:
-            merged.append(recipe_id)
-    return merged
\ No newline at end of file
@@ -1,11 +1,13 @@
-import json
-from typing import Any, List, Optional
-from sqlalchemy import select
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import String, and_, cast, func, literal, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.util import identity_key
 
 from ...api.schemas.recipe import Ingredient
-from ..models.db_recipe import Recipe, PreparingSession, RecipeIngredient
+from ..entity_cache import RECIPE, entity_cache, invalidate_recipe
+from ..models.db_recipe import Recipe, PreparingSession, PreparingSessionRecipe, RecipeIngredient, CollectionRecipe
+from . import collection_crud, ingredient_index_crud, search_crud, sync_crud
 
 
 async def get_recipe_by_id(db: AsyncSession, recipe_id: int) -> Optional[Recipe]:
@@ -20,6 +22,51 @@ async def get_recipe_by_id(db: AsyncSession, recipe_id: int) -> Optional[Recipe]
     )
     return result.scalar_one_or_none()
 
+async def get_recipe_aggregate(db: AsyncSession, recipe_id: int, min_version: Optional[int] = None) -> Optional[dict]:
+    """Retrieve a recipe with ingredients and instruction steps as plain data, served from the entity cache.
+
+    A cached aggregate older than min_version (e.g. from get_recipe_version) is reloaded.
+    Without min_version and without the shared cache tier (whose versions already cover other
+    workers' writes), the current version is read first (one primary key lookup), so a worker
+    never serves an aggregate another worker has changed since.
+    """
+    if min_version is None and entity_cache.enabled and entity_cache.shared is None:
+        current = await get_recipe_version(db, recipe_id)
+        if current is None:
+            return None
+        min_version = current.version
+
+    async def _load() -> Optional[dict]:
+        recipe = await get_recipe_by_id(db, recipe_id)
+        return _recipe_to_aggregate(recipe) if recipe else None
+
+    is_current = None if min_version is None else lambda aggregate: aggregate["version"] >= min_version
+    return await entity_cache.get_or_load(RECIPE, recipe_id, _load, is_current=is_current)
+
+async def get_recipe_version(db: AsyncSession, recipe_id: int) -> Optional[Any]:
+    """Retrieve only (user_id, version, updated_at) of a recipe, for conditional requests."""
+    result = await db.execute(
+        select(Recipe.user_id, Recipe.version, Recipe.updated_at).filter(Recipe.id == recipe_id)
+    )
+    return result.first()
+
+async def touch_recipe(db: AsyncSession, recipe_id: int) -> None:
+    """Bump the version of a recipe and of the collections containing it (within the current transaction)."""
+    await db.execute(
+        update(Recipe)
+        .where(Recipe.id == recipe_id)
+        .values(version=Recipe.version + 1, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    recipe = db.identity_map.get(identity_key(Recipe, recipe_id))
+    if recipe is not None:
+        # The bulk update bypasses the session; a loaded recipe must not keep its old version (ETags)
+        await db.refresh(recipe, attribute_names=["version", "updated_at"])
+    await collection_crud.touch_collections(
+        db, select(CollectionRecipe.collection_id).where(CollectionRecipe.recipe_id == recipe_id)
+    )
+    await sync_crud.log_recipe_upserts(db, recipe_id)
+
 async def get_recipes_by_user_id(db: AsyncSession, user_id: str) -> List[Recipe]:
     """Retrieve all permanent recipes for a user."""
     result = await db.execute(
@@ -28,84 +75,60 @@ async def get_recipes_by_user_id(db: AsyncSession, user_id: str) -> List[Recipe]
     return result.scalars().all()
 
 async def get_recipes_by_preparing_session_id(db: AsyncSession, preparing_session_id: int) -> Optional[List[Recipe]]:
-    """Retrieve the active recipes for a preparing session in creation order."""
-    # Get the preparing session with current_recipes relationship eagerly loaded
+    """Retrieve the active recipes for a preparing session in suggestion order."""
     result = await db.execute(
-        select(PreparingSession)
-        .options(
-            selectinload(PreparingSession.current_recipes)
-            .selectinload(Recipe.ingredients)
-        )
-        .options(
-            selectinload(PreparingSession.current_recipes)
-            .selectinload(Recipe.instruction_steps)
-        )
-        .where(PreparingSession.id == preparing_session_id)
+        select(PreparingSession.id).where(PreparingSession.id == preparing_session_id)
     )
-    preparing_session = result.scalars().first()
-
-    if not preparing_session:
+    if result.scalar_one_or_none() is None:
         return None
 
-    # Return the recipes from the relationship
-    # If no current recipes, fall back to the last 3 from context_suggestions
-    if preparing_session.current_recipes:
-        return list(preparing_session.current_recipes)
-
-    # Fallback: get the last 3 recipes from context_suggestions
-    active_recipe_ids = _parse_recipe_id_list(preparing_session.context_suggestions)[-3:]
-    if not active_recipe_ids:
-        return []
-
-    result = await db.execute(
-        select(Recipe)
-        .options(
-            selectinload(Recipe.ingredients),
-            selectinload(Recipe.instruction_steps)
-        )
-        .where(Recipe.id.in_(active_recipe_ids))
+    return await _get_session_recipes(
+        db,
+        preparing_session_id,
+        selectinload(Recipe.ingredients),
+        selectinload(Recipe.instruction_steps),
     )
-    recipes = result.scalars().all()
-    recipe_lookup = {recipe.id: recipe for recipe in recipes}
-    return [recipe_lookup[recipe_id] for recipe_id in active_recipe_ids if recipe_id in recipe_lookup]
 
 async def get_recipe_previews_by_preparing_session_id(db: AsyncSession, preparing_session_id: int, user_id: str) -> Optional[List[Recipe]]:
     """Retrieve the active recipes for a preparing session (lightweight - no ingredients/instructions)."""
-    # Get the preparing session with current_recipes relationship eagerly loaded (no extra relations)
     result = await db.execute(
-        select(PreparingSession)
-        .options(
-            selectinload(PreparingSession.current_recipes)
-        )
-        .where(PreparingSession.id == preparing_session_id,
-               PreparingSession.user_id == user_id)
+        select(PreparingSession.id).where(PreparingSession.id == preparing_session_id,
+                                          PreparingSession.user_id == user_id)
     )
-
-    preparing_session = result.scalars().first()
-
-
-    if not preparing_session:
+    if result.scalar_one_or_none() is None:
         return None
 
-    # Return the recipes from the relationship
-    # If no current recipes, fall back to the last 3 from context_suggestions
-    if preparing_session.current_recipes:
-        return list(preparing_session.current_recipes)
-
-
-    # Fallback: get the last 3 recipes from context_suggestions
-    active_recipe_ids = _parse_recipe_id_list(preparing_session.context_suggestions)[-3:]
-    if not active_recipe_ids:
-        return []
+    return await _get_session_recipes(db, preparing_session_id)
 
+async def _get_session_recipes(db: AsyncSession, preparing_session_id: int, *options) -> List[Recipe]:
+    """Load the active recipes of a session, falling back to the last 3 suggestions if none are active."""
     result = await db.execute(
         select(Recipe)
-        .where(Recipe.id.in_(active_recipe_ids))
+        .options(*options)
+        .join(PreparingSessionRecipe, PreparingSessionRecipe.recipe_id == Recipe.id)
+        .where(PreparingSessionRecipe.preparing_session_id == preparing_session_id,
+               PreparingSessionRecipe.is_active == True)
+        .order_by(PreparingSessionRecipe.position)
     )
-
     recipes = result.scalars().all()
-    recipe_lookup = {recipe.id: recipe for recipe in recipes}
-    return [recipe_lookup[recipe_id] for recipe_id in active_recipe_ids if recipe_id in recipe_lookup]
+    if recipes:
+        return list(recipes)
+
+    # Fallback: the last 3 suggested recipes, returned in suggestion order
+    last_links = (
+        select(PreparingSessionRecipe.recipe_id, PreparingSessionRecipe.position)
+        .where(PreparingSessionRecipe.preparing_session_id == preparing_session_id)
+        .order_by(PreparingSessionRecipe.position.desc())
+        .limit(3)
+        .subquery()
+    )
+    result = await db.execute(
+        select(Recipe)
+        .options(*options)
+        .join(last_links, last_links.c.recipe_id == Recipe.id)
+        .order_by(last_links.c.position)
+    )
+    return list(result.scalars().all())
 
 async def get_all_recipes_by_user_id(db: AsyncSession, user_id: str) -> List[Recipe]:
     """Retrieve all recipes for a given user ID."""
@@ -120,6 +143,130 @@ async def get_all_recipes_by_user_id(db: AsyncSession, user_id: str) -> List[Rec
     )
     return result.scalars().all()
 
+# Columns needed to render a recipe card in the library view
+RECIPE_CARD_COLUMNS = (
+    Recipe.id,
+    Recipe.title,
+    Recipe.description,
+    Recipe.image_url,
+    Recipe.total_time_minutes,
+    Recipe.difficulty,
+    Recipe.food_category,
+    Recipe.suggested_collection,
+    Recipe.created_at,
+    Recipe.updated_at,
+    Recipe.version,
+)
+
+async def get_recipe_page_by_user_id(db: AsyncSession,
+                                     user_id: str,
+                                     limit: Optional[int] = None,
+                                     after: Optional[Tuple[str, int]] = None,
+                                     preview: bool = False) -> Tuple[List[Any], Optional[Tuple[str, int]]]:
+    """Retrieve a keyset page of permanent recipes for a user, newest first.
+
+    Args:
+        db: Async database session.
+        user_id: Owner of the recipes.
+        limit: Page size, or None for all remaining recipes.
+        after: Page key (created_at as stored, id) of the last recipe of the previous page.
+        preview: Select only the card columns instead of full recipes with ingredients and steps.
+
+    Returns:
+        The page items (rows with RECIPE_CARD_COLUMNS in preview mode, Recipe objects otherwise)
+        and the key for the next page, or None if this is the last page.
+    """
+    created_at_key = _created_at_key()
+    if preview:
+        query = select(*RECIPE_CARD_COLUMNS, created_at_key)
+    else:
+        query = (
+            select(Recipe, created_at_key)
+            .options(
+                selectinload(Recipe.ingredients),
+                selectinload(Recipe.instruction_steps)
+            )
+        )
+    rows, next_key = await _fetch_recipe_page(db, query, user_id, limit, after)
+    items = list(rows) if preview else [row[0] for row in rows]
+    return items, next_key
+
+async def get_recipe_page_versions(db: AsyncSession,
+                                   user_id: str,
+                                   limit: Optional[int] = None,
+                                   after: Optional[Tuple[str, int]] = None) -> Tuple[List[Any], Optional[Tuple[str, int]]]:
+    """Version-only variant of get_recipe_page_by_user_id: (id, version, updated_at) rows of the same page."""
+    query = select(Recipe.id, Recipe.version, Recipe.updated_at, _created_at_key())
+    return await _fetch_recipe_page(db, query, user_id, limit, after)
+
+def _created_at_key():
+    # created_at is compared as stored: SQLite keeps CURRENT_TIMESTAMP text without the
+    # microseconds SQLAlchemy adds to bound datetimes, which would break equality.
+    return cast(Recipe.created_at, String).label("created_at_key")
+
+async def _fetch_recipe_page(db: AsyncSession,
+                             query,
+                             user_id: str,
+                             limit: Optional[int],
+                             after: Optional[Tuple[str, int]]) -> Tuple[List[Any], Optional[Tuple[str, int]]]:
+    """Apply owner filter, ordering and keyset bounds to a recipe query and fetch one page of rows."""
+    query = (
+        query
+        .filter(Recipe.user_id == user_id, Recipe.is_permanent == True)
+        .order_by(Recipe.created_at.desc(), Recipe.id.desc())
+    )
+    if after is not None:
+        after_created_at = literal(after[0], String)
+        query = query.filter(or_(
+            Recipe.created_at < after_created_at,
+            and_(Recipe.created_at == after_created_at, Recipe.id < after[1]),
+        ))
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    result = await db.execute(query)
+    rows = result.all()
+
+    next_key = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = (last.created_at_key, last.id if "id" in last._fields else last[0].id)
+    return rows, next_key
+
+async def search_recipes_by_user_id(db: AsyncSession,
+                                    user_id: str,
+                                    query: str,
+                                    limit: int = 20,
+                                    offset: int = 0) -> List[Any]:
+    """Full-text search over the saved recipes of a user, returning card rows best match first."""
+    recipe_ids = await search_crud.search_recipe_ids(db, user_id, query, limit=limit, offset=offset)
+    if not recipe_ids:
+        return []
+
+    result = await db.execute(
+        select(*RECIPE_CARD_COLUMNS)
+        .filter(Recipe.id.in_(recipe_ids), Recipe.user_id == user_id, Recipe.is_permanent == True)
+    )
+    rows_by_id = {row.id: row for row in result}
+    return [rows_by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in rows_by_id]
+
+async def match_recipes_by_ingredients(db: AsyncSession,
+                                       user_id: str,
+                                       ingredients: List[str],
+                                       limit: int = 10) -> List[Tuple[Any, dict]]:
+    """Rank the saved recipes of a user by ingredient coverage, returning (card row, match) pairs."""
+    matches = await ingredient_index_crud.match_recipes_by_ingredients(db, user_id, ingredients, limit=limit)
+    if not matches:
+        return []
+
+    result = await db.execute(
+        select(*RECIPE_CARD_COLUMNS)
+        .filter(Recipe.id.in_([match["recipe_id"] for match in matches]), Recipe.user_id == user_id)
+    )
+    rows_by_id = {row.id: row for row in result}
+    return [(rows_by_id[match["recipe_id"]], match) for match in matches if match["recipe_id"] in rows_by_id]
+
 async def create_recipe(db: AsyncSession,
                 user_id: str,
                 title: str,
@@ -161,6 +308,11 @@ async def create_recipe(db: AsyncSession,
         )
 
     db.add(recipe)
+    if is_permanent:
+        await db.flush()
+        await search_crud.index_recipe(db, recipe.id)
+        await ingredient_index_crud.index_recipe_ingredients(db, recipe.id)
+        await sync_crud.log_changes(db, user_id, sync_crud.RECIPE, [recipe.id], sync_crud.UPSERT)
     await db.commit()
     await db.refresh(recipe, attribute_names=["ingredients"])
     return recipe
@@ -194,6 +346,7 @@ async def update_recipe(db: AsyncSession,
         return None
     if user_id is not None and recipe.user_id != user_id:
         return None
+    was_permanent = recipe.is_permanent
     if title is not None:
         recipe.title = title
     if description is not None:
@@ -220,7 +373,15 @@ async def update_recipe(db: AsyncSession,
         recipe.cooking_overview = cooking_overview
 
     db.add(recipe)
+    await db.flush()
+    await touch_recipe(db, recipe.id)
+    await search_crud.index_recipe(db, recipe.id)
+    await ingredient_index_crud.index_recipe_ingredients(db, recipe.id)
+    if was_permanent and not recipe.is_permanent:
+        # Unsaved recipes leave the synced library
+        await sync_crud.log_changes(db, recipe.user_id, sync_crud.RECIPE, [recipe.id], sync_crud.DELETE)
     await db.commit()
+    await invalidate_recipe(recipe.id, recipe.user_id)
     await db.refresh(recipe, attribute_names=["ingredients", "instruction_steps"])
     return recipe
 
@@ -232,11 +393,47 @@ async def delete_recipe(db: AsyncSession, recipe_id: int, user_id: str) -> bool:
         return False
     if recipe.user_id != user_id:
         return False
+    await collection_crud.touch_collections(
+        db, select(CollectionRecipe.collection_id).where(CollectionRecipe.recipe_id == recipe_id)
+    )
+    if recipe.is_permanent:
+        await sync_crud.log_changes(db, user_id, sync_crud.RECIPE, [recipe_id], sync_crud.DELETE)
     await db.delete(recipe)
+    await search_crud.remove_recipe(db, recipe_id)
     await db.commit()
+    await invalidate_recipe(recipe_id, user_id)
     return True
 
 
+def _recipe_to_aggregate(recipe: Recipe) -> dict:
+    """Convert a recipe with loaded ingredients and instruction steps to cacheable plain data."""
+    return {
+        "id": recipe.id,
+        "user_id": recipe.user_id,
+        "is_permanent": recipe.is_permanent,
+        "version": recipe.version,
+        "updated_at": recipe.updated_at.isoformat() if recipe.updated_at else None,
+        "title": recipe.title,
+        "description": recipe.description,
+        "prompt": recipe.prompt,
+        "ingredients": [
+            {"id": ingredient.id, "name": ingredient.name, "quantity": ingredient.quantity, "unit": ingredient.unit}
+            for ingredient in recipe.ingredients
+        ],
+        "instructions": [
+            {"id": step.id, "heading": step.heading, "description": step.description,
+             "animation": step.animation, "timer": step.timer}
+            for step in recipe.instruction_steps
+        ],
+        "image_url": recipe.image_url,
+        "total_time_minutes": recipe.total_time_minutes,
+        "difficulty": recipe.difficulty,
+        "food_category": recipe.food_category,
+        "important_notes": recipe.important_notes,
+        "cooking_overview": recipe.cooking_overview,
+    }
+
+
 def _sync_recipe_ingredients(recipe: Recipe, incoming_ingredients: List[Ingredient]) -> None:
     """Upsert recipe ingredients to match the incoming payload."""
     normalized_payload = [_ingredient_to_payload(item) for item in incoming_ingredients]
@@ -284,21 +481,3 @@ def _ingredient_to_payload(ingredient: Any) -> dict:
 
     raise ValueError("Unsupported ingredient payload type")
 
-
-def _parse_recipe_id_list(raw_value: Optional[str]) -> List[int]:
-    """Parse a JSON encoded list of recipe identifiers."""
-    if not raw_value:
-        return []
-    try:
-        payload = json.loads(raw_value)
-    except (json.JSONDecodeError, TypeError):
-        return []
-    if not isinstance(payload, list):
-        return []
-    result: List[int] = []
-    for item in payload:
-        try:
-            result.append(int(item))
-        except (TypeError, ValueError):
-            continue
-    return result
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Full-text search over the saved recipes of a user.
+
+The index holds one document per permanent recipe (title, description, ingredient names and
+instruction text). It lives in an FTS5 virtual table on SQLite and in a table with FULLTEXT
+indexes on MySQL; RecipeSearchBackend hides the difference from the CRUD layer.
+"""
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from ..models.db_recipe import Recipe, RecipeIngredient, InstructionStep
+
+SEARCH_TABLE = "recipe_search"
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class RecipeSearchBackend(ABC):
+    """Dialect specific access to the recipe search index."""
+
+    key_column = "recipe_id"
+
+    @abstractmethod
+    async def create(self, conn: AsyncConnection) -> bool:
+        """Create the index if it does not exist. Returns True if it was created."""
+
+    @abstractmethod
+    async def upsert(self, db, recipe_id: int, user_id: str, title: str, body: str) -> None:
+        """Insert or replace the document of a recipe."""
+
+    async def delete(self, db, recipe_id: int) -> None:
+        await db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE {self.key_column} = :recipe_id"),
+                         {"recipe_id": recipe_id})
+
+    @abstractmethod
+    async def search(self, db, user_id: str, tokens: List[str], limit: int, offset: int) -> List[int]:
+        """Return recipe IDs matching all tokens (as prefixes), best match first."""
+
+
+class SQLiteRecipeSearch(RecipeSearchBackend):
+    """FTS5 virtual table keyed by rowid = recipe id, ranked with bm25."""
+
+    key_column = "rowid"
+
+    async def create(self, conn: AsyncConnection) -> bool:
+        result = await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": SEARCH_TABLE},
+        )
+        if result.first() is not None:
+            return False
+        await conn.execute(text(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            "title, body, user_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        return True
+
+    async def upsert(self, db, recipe_id: int, user_id: str, title: str, body: str) -> None:
+        await db.execute(
+            text(f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, body, user_id) "
+                 "VALUES (:recipe_id, :title, :body, :user_id)"),
+            {"recipe_id": recipe_id, "title": title, "body": body, "user_id": user_id},
+        )
+
+    async def search(self, db, user_id: str, tokens: List[str], limit: int, offset: int) -> List[int]:
+        match = " ".join(f'"{token}"*' for token in tokens)
+        result = await db.execute(
+            text(f"SELECT rowid FROM {SEARCH_TABLE} "
+                 f"WHERE {SEARCH_TABLE} MATCH :match AND user_id = :user_id "
+                 f"ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0) LIMIT :limit OFFSET :offset"),
+            {"match": match, "user_id": user_id, "limit": limit, "offset": offset},
+        )
+        return [row[0] for row in result]
+
+
+class MySQLRecipeSearch(RecipeSearchBackend):
+    """InnoDB table with FULLTEXT indexes, ranked by natural relevance with title boost."""
+
+    async def create(self, conn: AsyncConnection) -> bool:
+        result = await conn.execute(
+            text("SELECT 1 FROM information_schema.tables "
+                 "WHERE table_schema = DATABASE() AND table_name = :name"),
+            {"name": SEARCH_TABLE},
+        )
+        if result.first() is not None:
+            return False
+        await conn.execute(text(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            "recipe_id INT NOT NULL PRIMARY KEY, "
+            "user_id VARCHAR(50) NOT NULL, "
+            "title VARCHAR(255) NOT NULL, "
+            "body MEDIUMTEXT NOT NULL, "
+            "INDEX ix_recipe_search_user (user_id), "
+            "FULLTEXT INDEX ft_recipe_search_title (title), "
+            "FULLTEXT INDEX ft_recipe_search_all (title, body)"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+        ))
+        return True
+
+    async def upsert(self, db, recipe_id: int, user_id: str, title: str, body: str) -> None:
+        await db.execute(
+            text(f"INSERT INTO {SEARCH_TABLE} (recipe_id, user_id, title, body) "
+                 "VALUES (:recipe_id, :user_id, :title, :body) "
+                 "ON DUPLICATE KEY UPDATE user_id = VALUES(user_id), title = VALUES(title), body = VALUES(body)"),
+            {"recipe_id": recipe_id, "title": title, "body": body, "user_id": user_id},
+        )
+
+    async def search(self, db, user_id: str, tokens: List[str], limit: int, offset: int) -> List[int]:
+        match = " ".join(f"+{token}*" for token in tokens)
+        result = await db.execute(
+            text(f"SELECT recipe_id FROM {SEARCH_TABLE} "
+                 "WHERE user_id = :user_id AND MATCH(title, body) AGAINST(:match IN BOOLEAN MODE) "
+                 "ORDER BY 2 * MATCH(title) AGAINST(:match IN BOOLEAN MODE) "
+                 "+ MATCH(title, body) AGAINST(:match IN BOOLEAN MODE) DESC, recipe_id DESC "
+                 "LIMIT :limit OFFSET :offset"),
+            {"match": match, "user_id": user_id, "limit": limit, "offset": offset},
+        )
+        return [row[0] for row in result]
+
+
+_BACKENDS: Dict[str, RecipeSearchBackend] = {
+    "sqlite": SQLiteRecipeSearch(),
+    "mysql": MySQLRecipeSearch(),
+}
+
+
+def get_search_backend(dialect_name: str) -> RecipeSearchBackend:
+    """Return the search backend for a SQLAlchemy dialect name."""
+    try:
+        return _BACKENDS[dialect_name]
+    except KeyError:
+        raise ValueError(f"Full-text search is not supported on {dialect_name}") from None
+
+
+def _backend_for(db) -> RecipeSearchBackend:
+    bind = db.get_bind() if isinstance(db, AsyncSession) else db
+    return get_search_backend(bind.dialect.name)
+
+
+def tokenize_query(query: str) -> List[str]:
+    """Split a user query into plain word tokens, dropping search operators."""
+    return _TOKEN_PATTERN.findall(query.lower())
+
+
+async def index_recipe(db, recipe_id: int) -> None:
+    """Bring the index entry of a recipe in line with the database (within the current transaction).
+
+    Permanent recipes are (re)indexed, temporary or missing ones are removed from the index.
+    """
+    backend = _backend_for(db)
+    documents = await _load_documents(db, [recipe_id])
+    if recipe_id in documents:
+        await backend.upsert(db, recipe_id, **documents[recipe_id])
+    else:
+        await backend.delete(db, recipe_id)
+
+
+async def remove_recipe(db, recipe_id: int) -> None:
+    """Remove a recipe from the index (within the current transaction)."""
+    await _backend_for(db).delete(db, recipe_id)
+
+
+async def search_recipe_ids(db: AsyncSession, user_id: str, query: str, limit: int = 20, offset: int = 0) -> List[int]:
+    """Return the IDs of the saved recipes of a user that match the query, best match first."""
+    tokens = tokenize_query(query)
+    if not tokens:
+        return []
+    return await _backend_for(db).search(db, user_id, tokens, limit, offset)
+
+
+async def create_search_index(conn: AsyncConnection, batch_size: int = 500) -> None:
+    """Create the search index if needed and fill it from the saved recipes."""
+    backend = _backend_for(conn)
+    if not await backend.create(conn):
+        return
+
+    result = await conn.execute(select(Recipe.id).where(Recipe.is_permanent == True).order_by(Recipe.id))
+    recipe_ids = list(result.scalars().all())
+    for start in range(0, len(recipe_ids), batch_size):
+        documents = await _load_documents(conn, recipe_ids[start:start + batch_size])
+        for recipe_id, document in documents.items():
+            await backend.upsert(conn, recipe_id, **document)
+
+
+async def _load_documents(db, recipe_ids: List[int]) -> Dict[int, Dict[str, Optional[str]]]:
+    """Build the search documents of the given permanent recipes."""
+    result = await db.execute(
+        select(Recipe.id, Recipe.user_id, Recipe.title, Recipe.description)
+        .where(Recipe.id.in_(recipe_ids), Recipe.is_permanent == True)
+    )
+    recipes = result.all()
+    if not recipes:
+        return {}
+
+    found_ids = [row.id for row in recipes]
+    parts: Dict[int, List[str]] = {row.id: [row.description or ""] for row in recipes}
+
+    result = await db.execute(
+        select(RecipeIngredient.recipe_id, RecipeIngredient.name)
+        .where(RecipeIngredient.recipe_id.in_(found_ids))
+        .order_by(RecipeIngredient.recipe_id, RecipeIngredient.id)
+    )
+    for recipe_id, name in result:
+        parts[recipe_id].append(name)
+
+    result = await db.execute(
+        select(InstructionStep.recipe_id, InstructionStep.heading, InstructionStep.description)
+        .where(InstructionStep.recipe_id.in_(found_ids))
+        .order_by(InstructionStep.recipe_id, InstructionStep.step_number)
+    )
+    for recipe_id, heading, description in result:
+        parts[recipe_id].extend((heading, description))
+
+    return {
+        row.id: {"user_id": row.user_id, "title": row.title, "body": "\n".join(filter(None, parts[row.id]))}
+        for row in recipes
+    }
@@ -0,0 +1,220 @@
+"""
+Change log behind the delta-sync feed (/sync/changes).
+
+The CRUD layer records every change of a saved recipe, a collection or a collection membership
+in sync_changes, within the transaction of the change itself. The feed returns the entries
+after a client's cursor, coalesced to the last operation per entity, together with the current
+state of the upserted entities.
+
+The cursor is the autoincrement id, which is assigned on insert, not on commit: an entry can
+become visible after one with a higher id. The feed therefore stops before the first entry
+younger than the commit lag (get_settled_before), and a client only skips an entry whose
+transaction stayed open for longer than that. Entries past the retention period are pruned
+(prune_changes); a cursor before the oldest retained entry needs a full resync.
+
+Deleting a recipe or a collection also removes its memberships; clients drop them locally
+instead of receiving one entry per membership.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import String, cast, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..models.db_recipe import Collection, CollectionRecipe, Recipe, SyncChange
+
+RECIPE = "recipe"
+COLLECTION = "collection"
+MEMBERSHIP = "membership"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def membership_id(collection_id: int, recipe_id: int) -> str:
+    return f"{collection_id}:{recipe_id}"
+
+
+def _log_from_select(query):
+    """INSERT of the (user_id, entity, entity_id, op) rows selected by query."""
+    return insert(SyncChange).from_select(["user_id", "entity", "entity_id", "op"], query)
+
+
+async def log_changes(db: AsyncSession, user_id: str, entity: str, entity_ids: Iterable, op: str) -> None:
+    """Record changes of entities whose owner is known (within the current transaction)."""
+    rows = [{"user_id": user_id, "entity": entity, "entity_id": str(entity_id), "op": op} for entity_id in entity_ids]
+    if rows:
+        await db.execute(insert(SyncChange), rows)
+
+
+async def log_recipe_upserts(db: AsyncSession, recipe_id: int) -> None:
+    """Record an upsert of a recipe if it is saved (within the current transaction)."""
+    await db.execute(
+        _log_from_select(
+            select(Recipe.user_id, literal(RECIPE), cast(Recipe.id, String), literal(UPSERT))
+            .where(Recipe.id == recipe_id, Recipe.is_permanent == True)
+        )
+    )
+
+
+async def log_collection_upserts(db: AsyncSession, collection_ids) -> None:
+    """Record upserts of collections, given as IDs or a subquery (within the current transaction)."""
+    await db.execute(
+        _log_from_select(
+            select(Collection.owner_id, literal(COLLECTION), cast(Collection.id, String), literal(UPSERT))
+            .where(Collection.id.in_(collection_ids))
+        )
+    )
+
+
+async def log_membership_changes(db: AsyncSession, collection_id: int, recipe_ids: Iterable[int], op: str) -> None:
+    """Record added (upsert) or removed (delete) memberships of a collection (within the current transaction)."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    result = await db.execute(select(Collection.owner_id).where(Collection.id == collection_id))
+    owner_id = result.scalar_one_or_none()
+    if owner_id is not None:
+        await log_changes(db, owner_id, MEMBERSHIP,
+                          (membership_id(collection_id, recipe_id) for recipe_id in recipe_ids), op)
+
+
+async def get_settled_before(db: AsyncSession, commit_lag_seconds: float) -> datetime:
+    """Database time minus the commit lag; entries created before it are served."""
+    result = await db.execute(select(func.now()))
+    return result.scalar_one() - timedelta(seconds=commit_lag_seconds)
+
+
+async def get_latest_cursor(db: AsyncSession, user_id: str, settled_before: Optional[datetime] = None) -> int:
+    """The cursor of the latest (settled) change of a user (0 if there is none)."""
+    query = select(func.max(SyncChange.id)).where(SyncChange.user_id == user_id)
+    if settled_before is not None:
+        query = query.where(SyncChange.created_at < settled_before)
+    result = await db.execute(query)
+    return result.scalar_one_or_none() or 0
+
+
+async def get_oldest_cursor(db: AsyncSession) -> Optional[int]:
+    """The oldest cursor the retained log can continue from (None while the log is empty)."""
+    result = await db.execute(select(func.min(SyncChange.id)))
+    oldest_id = result.scalar_one_or_none()
+    return None if oldest_id is None else oldest_id - 1
+
+
+async def get_changes(db: AsyncSession,
+                      user_id: str,
+                      cursor: int,
+                      limit: int,
+                      settled_before: Optional[datetime] = None) -> Tuple[Dict[Tuple[str, str], str], int, bool]:
+    """Retrieve the changes of a user after a cursor, coalesced to the last operation per entity.
+
+    With settled_before, the page ends before the first entry created at or after it (an entry
+    with a lower id may still be uncommitted); it is served by a later call.
+
+    Returns:
+        ({(entity, entity_id): op}, next cursor, whether more changes follow)
+    """
+    result = await db.execute(
+        select(SyncChange.id, SyncChange.entity, SyncChange.entity_id, SyncChange.op, SyncChange.created_at)
+        .where(SyncChange.user_id == user_id, SyncChange.id > cursor)
+        .order_by(SyncChange.id)
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if settled_before is not None:
+        for index, row in enumerate(rows):
+            if row.created_at >= settled_before:
+                rows, has_more = rows[:index], False
+                break
+
+    changes: Dict[Tuple[str, str], str] = {}
+    for _, entity, entity_id, op, _ in rows:
+        changes[(entity, entity_id)] = op
+    next_cursor = rows[-1].id if rows else cursor
+    return changes, next_cursor, has_more
+
+
+async def prune_changes(db: AsyncSession, created_before: datetime, limit: int) -> int:
+    """Delete up to limit entries created before the given time; returns the number deleted.
+
+    The latest entry is always kept, so get_oldest_cursor still detects cursors before pruned entries.
+    """
+    latest_id = select(func.max(SyncChange.id)).scalar_subquery()
+    result = await db.execute(
+        select(SyncChange.id)
+        .where(SyncChange.created_at < created_before, SyncChange.id < latest_id)
+        .limit(limit)
+    )
+    ids = list(result.scalars().all())
+    if ids:
+        await db.execute(delete(SyncChange).where(SyncChange.id.in_(ids)))
+    return len(ids)
+
+
+async def get_synced_recipes(db: AsyncSession, user_id: str, recipe_ids: List[int], full: bool = True) -> List[Recipe]:
+    """Retrieve the current state of saved recipes of a user (missing ones were deleted or unsaved)."""
+    if not recipe_ids:
+        return []
+    query = select(Recipe).where(Recipe.id.in_(recipe_ids), Recipe.user_id == user_id, Recipe.is_permanent == True)
+    if full:
+        query = query.options(selectinload(Recipe.ingredients), selectinload(Recipe.instruction_steps))
+    result = await db.execute(query.order_by(Recipe.id))
+    return result.scalars().all()
+
+
+async def get_synced_collections(db: AsyncSession, user_id: str, collection_ids: List[int]) -> List[Collection]:
+    """Retrieve the current state of collections of a user (missing ones were deleted)."""
+    if not collection_ids:
+        return []
+    result = await db.execute(
+        select(Collection)
+        .where(Collection.id.in_(collection_ids), Collection.owner_id == user_id)
+        .order_by(Collection.id)
+    )
+    return result.scalars().all()
+
+
+async def get_existing_memberships(db: AsyncSession, user_id: str, memberships: List[Tuple[int, int]]) -> set:
+    """Return the (collection_id, recipe_id) pairs of the given ones that currently exist."""
+    if not memberships:
+        return set()
+    collection_ids = {collection_id for collection_id, _ in memberships}
+    result = await db.execute(
+        select(CollectionRecipe.collection_id, CollectionRecipe.recipe_id)
+        .join(Collection, Collection.id == CollectionRecipe.collection_id)
+        .where(CollectionRecipe.collection_id.in_(collection_ids), Collection.owner_id == user_id)
+    )
+    wanted = set(memberships)
+    return {tuple(row) for row in result.all()} & wanted
+
+
+async def backfill_sync_changes(conn: AsyncConnection) -> bool:
+    """Seed an empty change log with upserts of all existing saved recipes, collections and memberships.
+
+    Lets clients without a cursor start from 0. Returns True if the log was seeded.
+    """
+    result = await conn.execute(select(SyncChange.id).limit(1))
+    if result.first() is not None:
+        return False
+    await conn.execute(_log_from_select(
+        select(Recipe.user_id, literal(RECIPE), cast(Recipe.id, String), literal(UPSERT))
+        .where(Recipe.is_permanent == True)
+        .order_by(Recipe.id)
+    ))
+    await conn.execute(_log_from_select(
+        select(Collection.owner_id, literal(COLLECTION), cast(Collection.id, String), literal(UPSERT))
+        .order_by(Collection.id)
+    ))
+    await conn.execute(_log_from_select(
+        select(
+            Collection.owner_id, literal(MEMBERSHIP),
+            cast(CollectionRecipe.collection_id, String) + ":" + cast(CollectionRecipe.recipe_id, String),
+            literal(UPSERT),
+        )
+        .join(Collection, Collection.id == CollectionRecipe.collection_id)
+        .order_by(CollectionRecipe.id)
+    ))
+    return True
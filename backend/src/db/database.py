@@ -1,40 +1,98 @@
 import asyncio
 import logging
-from typing import AsyncGenerator, Optional
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, Optional
 from contextlib import asynccontextmanager
 from urllib.parse import quote_plus
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import text
-from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy import event, text
+from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from sqlalchemy.exc import SQLAlchemyError
+from starlette.requests import HTTPConnection
 from ..config import settings
+from ..core import security
+from ..utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
 engine = None  # Global engine instance
+replica_engine = None  # Optional read replica engine
+_replica_initialized = False
+_replica_retry_at = 0.0  # monotonic time of the next connection attempt after a failed one
+_replica_lock = asyncio.Lock()
+# Engines are created once; concurrent cold requests wait for the first one
+_engine_lock = asyncio.Lock()
+_session_factories: Dict[Any, async_sessionmaker] = {}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts take, including waits for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = {"checkouts": 0, "waits": 0, "timeouts": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy_exc.TimeoutError:
+            self.checkout_stats["timeouts"] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = self.checkout_stats
+            stats["checkouts"] += 1
+            if elapsed_ms >= 1:
+                stats["waits"] += 1
+            stats["total_wait_ms"] += elapsed_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], elapsed_ms)
+
+
+def _pool_arguments() -> Dict[str, Any]:
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
 
 # ✅ Local SQLite fallback
 async def _create_local_engine(url: str):
     if url.startswith("sqlite://") and not url.startswith("sqlite+aiosqlite://"):
         url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    # In-memory databases exist per connection and cannot be pooled this way
+    pooled = settings.DB_SQLITE_POOLED and ":memory:" not in url and "mode=memory" not in url
     engine = create_async_engine(
         url,
-        poolclass=NullPool,
         connect_args={"check_same_thread": False},
+        **(_pool_arguments() if pooled else {"poolclass": NullPool}),
     )
+    if pooled:
+        @event.listens_for(engine.sync_engine, "connect")
+        def _configure_sqlite(dbapi_connection, _connection_record):
+            # WAL lets readers proceed while a writer commits; busy_timeout waits for locks instead of failing
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={settings.DB_SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.close()
     return engine
 
 # ✅ Retry-enabled MySQL Cloud connection
-async def _create_cloud_engine_with_retry(max_retries=5, wait_seconds=2):
+async def _create_cloud_engine_with_retry(max_retries=5, wait_seconds=2, host=None, port=None):
     # Build MySQL connection URL safely
     safe_password = quote_plus(settings.DB_PASSWORD)
     mysql_url= (
         f"mysql+aiomysql://{settings.DB_USER}:{safe_password}"
-        f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+        f"@{host or settings.DB_HOST}:{port or settings.DB_PORT}/{settings.DB_NAME}"
     )
-    logger.info("Connecting to Cloud SQL: %s", mysql_url)
+    logger.info("Connecting to Cloud SQL: %s", mysql_url.replace(safe_password, "***"))
 
     last_exc: Optional[Exception] = None
     for attempt in range(1, max_retries + 1):
@@ -43,9 +101,8 @@ async def _create_cloud_engine_with_retry(max_retries=5, wait_seconds=2):
                 mysql_url,
                 pool_recycle=settings.DB_POOL_RECYCLE,
                 pool_pre_ping=settings.DB_POOL_PRE_PING,
-                pool_size=settings.DB_POOL_SIZE,
-                max_overflow=settings.DB_MAX_OVERFLOW,
                 connect_args={"connect_timeout": settings.DB_CONNECT_TIMEOUT},
+                **_pool_arguments(),
             )
             async with new_engine.connect() as conn:
                 await conn.execute(text("SELECT 1"))
@@ -62,41 +119,297 @@ async def get_engine():
     """Get or create the global database engine based on configuration."""
     global engine
     if engine is None:
-        if settings.DATABASE_URL and settings.DATABASE_URL.startswith("sqlite"):
-            logger.info("Using LOCAL SQLite database.")
-            engine = await _create_local_engine(settings.DATABASE_URL)
-        else:
-            logger.info("Using Cloud SQL MySQL database.")
-            engine = await _create_cloud_engine_with_retry()
+        async with _engine_lock:
+            if engine is None:
+                if settings.DATABASE_URL and settings.DATABASE_URL.startswith("sqlite"):
+                    logger.info("Using LOCAL SQLite database.")
+                    engine = await _create_local_engine(settings.DATABASE_URL)
+                else:
+                    logger.info("Using Cloud SQL MySQL database.")
+                    engine = await _create_cloud_engine_with_retry()
     return engine
 
-# ✅ Session factory
-async_session_factory = sessionmaker(
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autoflush=False,
-    autocommit=False,
-)
+async def _create_replica_engine():
+    if settings.DATABASE_REPLICA_URL and settings.DATABASE_REPLICA_URL.startswith("sqlite"):
+        logger.info("Using LOCAL SQLite read replica.")
+        new_engine = await _create_local_engine(settings.DATABASE_REPLICA_URL)
+    elif settings.DATABASE_REPLICA_URL:
+        new_engine = create_async_engine(
+            settings.DATABASE_REPLICA_URL,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            **_pool_arguments(),
+        )
+    else:
+        logger.info("Using Cloud SQL MySQL read replica.")
+        # One attempt: requests must not wait for retries, the next attempt follows after a backoff
+        return await _create_cloud_engine_with_retry(
+            max_retries=1, wait_seconds=0, host=settings.DB_REPLICA_HOST, port=settings.DB_REPLICA_PORT
+        )
+    try:
+        async with new_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception:
+        await new_engine.dispose()
+        raise
+    return new_engine
+
+async def get_replica_engine():
+    """Get or create the read replica engine; None if no replica is configured or it is unreachable.
+
+    An unreachable replica is retried after DB_REPLICA_RETRY_SECONDS. Until then, and while a
+    connection attempt is under way, reads go to the primary.
+    """
+    global replica_engine, _replica_initialized, _replica_retry_at
+    if _replica_initialized or not _replica_configured():
+        return replica_engine
+    if _replica_lock.locked() or time.monotonic() < _replica_retry_at:
+        return None
+    async with _replica_lock:
+        if not _replica_initialized:
+            try:
+                replica_engine = await _create_replica_engine()
+                _replica_initialized = True
+            except Exception as e:  # noqa: BLE001
+                _replica_retry_at = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+                _routing_stats["replica_failures"] += 1
+                logger.error("Read replica unreachable, reading from the primary for %.0fs: %s",
+                             settings.DB_REPLICA_RETRY_SECONDS, e)
+    return replica_engine
+
+def session_factory(db_engine) -> async_sessionmaker:
+    """The session factory bound to an engine, created once per engine."""
+    factory = _session_factories.get(db_engine)
+    if factory is None:
+        factory = async_sessionmaker(
+            db_engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        _session_factories[db_engine] = factory
+    return factory
+
+async def warm_pool(db_engine, size: Optional[int] = None) -> int:
+    """Open up to size (default DB_POOL_SIZE) pooled connections so first requests do not pay for connecting."""
+    if db_engine is None or not isinstance(db_engine.sync_engine.pool, AsyncAdaptedQueuePool):
+        return 0
+    size = settings.DB_POOL_SIZE if size is None else size
+
+    async def _open():
+        connection = await db_engine.connect()
+        await connection.execute(text("SELECT 1"))
+        return connection
+
+    results = await asyncio.gather(*(_open() for _ in range(size)), return_exceptions=True)
+    opened = 0
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning("Pre-warming a database connection failed: %s", result)
+            continue
+        await result.close()  # returns the connection to the pool
+        opened += 1
+    return opened
+
+def _pool_metrics(db_engine) -> Optional[Dict[str, Any]]:
+    if db_engine is None:
+        return None
+    pool = db_engine.sync_engine.pool
+    snapshot: Dict[str, Any] = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            snapshot[name] = getattr(pool, name)()
+    stats = getattr(pool, "checkout_stats", None)
+    if stats is not None:
+        snapshot.update({
+            "checkouts": stats["checkouts"],
+            "checkout_waits": stats["waits"],
+            "checkout_timeouts": stats["timeouts"],
+            "avg_checkout_ms": round(stats["total_wait_ms"] / stats["checkouts"], 3) if stats["checkouts"] else None,
+            "max_checkout_ms": round(stats["max_wait_ms"], 3),
+        })
+    return snapshot
+
+def pool_metrics() -> Dict[str, Any]:
+    """Pool snapshot per engine and replica routing counters."""
+    return {
+        "primary": _pool_metrics(engine),
+        "replica": _pool_metrics(replica_engine),
+        "routing": dict(_routing_stats),
+    }
+
+
+# Scope state key under which batched sub-requests receive a shared session (see routers/batch.py)
+SHARED_SESSION_STATE = "shared_db_session"
+
+
+class SerializedAsyncSession(AsyncSession):
+    """AsyncSession that concurrent tasks may share: database operations are serialized by a lock.
+
+    Meant for concurrent read-only work such as batched sub-requests; the tasks share one
+    connection and identity map instead of checking out a connection each.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._operation_lock = asyncio.Lock()
+
+    async def execute(self, *args, **kwargs):
+        async with self._operation_lock:
+            return await super().execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        async with self._operation_lock:
+            return await super().scalar(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        async with self._operation_lock:
+            return await super().get(*args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        async with self._operation_lock:
+            return await super().refresh(*args, **kwargs)
+
+    async def flush(self, *args, **kwargs):
+        async with self._operation_lock:
+            return await super().flush(*args, **kwargs)
+
+    async def commit(self):
+        async with self._operation_lock:
+            return await super().commit()
+
+    async def rollback(self):
+        async with self._operation_lock:
+            return await super().rollback()
+
+
+# Replica routing: GET endpoints authorized by get_read_only_user_id (and no write-level
+# dependency) read from the replica, unless the user wrote within DB_REPLICA_STICKY_SECONDS
+# or the route depends on use_primary. Stickiness is tracked per process.
+_READ_METHODS = {"GET", "HEAD"}
+_read_only_routes: Dict[int, bool] = {}  # by id() of the route
+_recent_writers: "OrderedDict[str, float]" = OrderedDict()
+_MAX_RECENT_WRITERS = 10000
+_routing_stats = {"primary": 0, "replica": 0, "sticky": 0, "replica_failures": 0}
+
+
+def use_primary() -> None:
+    """Route dependency that keeps a read-only endpoint on the primary, for reads that must not lag."""
+
+
+def _dependency_calls(dependant) -> set:
+    calls = set()
+    for dependency in dependant.dependencies:
+        calls.add(dependency.call)
+        calls |= _dependency_calls(dependency)
+    return calls
+
+
+def _is_read_only_route(connection: HTTPConnection) -> bool:
+    """Whether the matched route only reads (see the routing note above)."""
+    if connection.scope.get("type") != "http" or connection.scope.get("method") not in _READ_METHODS:
+        return False
+    route = connection.scope.get("route")
+    dependant = getattr(route, "dependant", None)
+    if dependant is None:
+        return False
+    read_only = _read_only_routes.get(id(route))
+    if read_only is None:
+        from ..utils import auth  # auth imports the models, which import this module
+
+        calls = _dependency_calls(dependant)
+        write_dependencies = {auth.get_user_id, auth.get_read_write_user_id, auth.get_read_write_user_token_data,
+                              auth.get_admin_user_id}
+        read_only = (auth.get_read_only_user_id in calls and not calls & write_dependencies
+                     and use_primary not in calls)
+        _read_only_routes[id(route)] = read_only
+    return read_only
+
+
+def _request_user_id(connection: HTTPConnection) -> Optional[str]:
+    token = connection.cookies.get("__session")
+    if not token:
+        return None
+    try:
+        return security.decode_token(token).get("user_id")
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def _replica_configured() -> bool:
+    return bool(settings.DATABASE_REPLICA_URL or settings.DB_REPLICA_HOST)
+
+
+def mark_user_write(user_id: str) -> None:
+    """Route the reads of a user to the primary for the stickiness window."""
+    _recent_writers[user_id] = time.monotonic() + settings.DB_REPLICA_STICKY_SECONDS
+    _recent_writers.move_to_end(user_id)
+    while len(_recent_writers) > _MAX_RECENT_WRITERS:
+        _recent_writers.popitem(last=False)
+
+
+def _wrote_recently(user_id: Optional[str]) -> bool:
+    if user_id is None:
+        return False
+    until = _recent_writers.get(user_id)
+    if until is None:
+        return False
+    if until < time.monotonic():
+        del _recent_writers[user_id]
+        return False
+    return True
 
 
 # ✅ FastAPI dependency
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    db_engine = await get_engine()
-    async_session_factory.configure(bind=db_engine)
-    session = async_session_factory()
+async def get_db(connection: HTTPConnection) -> AsyncGenerator[AsyncSession, None]:
+    shared_session = connection.scope.get("state", {}).get(SHARED_SESSION_STATE)
+    if shared_session is not None:
+        # Owned and closed by the batch request that started this sub-request
+        yield shared_session
+        return
+
+    method = connection.scope.get("method")
+    writer_id = None
+    if method is not None and method not in _READ_METHODS and _replica_configured():
+        writer_id = _request_user_id(connection)
+        if writer_id is not None:
+            mark_user_write(writer_id)
+    db_engine = await get_replica_engine() if _is_read_only_route(connection) else None
+    if db_engine is not None and _wrote_recently(_request_user_id(connection)):
+        _routing_stats["sticky"] += 1
+        db_engine = None
+    if db_engine is None:
+        db_engine = await get_engine()
+        _routing_stats["primary"] += 1
+    else:
+        _routing_stats["replica"] += 1
+
+    session = session_factory(db_engine)()
     try:
         yield session
     finally:
         await session.close()
+        if writer_id is not None:
+            # The window starts when the write is done
+            mark_user_write(writer_id)
 
 Base = declarative_base()
 
+@asynccontextmanager
+async def get_shared_db_context():
+    """Session that concurrent tasks may share (see SerializedAsyncSession)."""
+    db_engine = await get_engine()
+    session = SerializedAsyncSession(bind=db_engine, expire_on_commit=False, autoflush=False)
+    try:
+        yield session
+    finally:
+        await session.close()
+
 # ✅ Optional: Async context manager
 @asynccontextmanager
 async def get_async_db_context():
     db_engine = await get_engine()
-    async_session_factory.configure(bind=db_engine)
-    session = async_session_factory()
+    session = session_factory(db_engine)()
     try:
         yield session
         await session.commit()
@@ -105,3 +418,6 @@ async def get_async_db_context():
         raise
     finally:
         await session.close()
+
+
+register_metrics("db_pool", pool_metrics)
@@ -0,0 +1,264 @@
+"""
+Read-through cache for entities that are read far more often than they change.
+
+Entries are plain JSON-compatible data (never ORM objects) stored in an in-process LRU tier
+and, if ENTITY_CACHE_REDIS_URL is set, in a shared Redis tier used by all workers.
+
+Every entity has a version. Writers bump it after their commit, readers remember the version
+seen before loading and only accept entries stored under the current version. A load that
+raced with a write therefore never serves stale data, and bumping the shared version
+invalidates the entry in every worker. Without the shared tier another worker's entry is only
+invalidated after ENTITY_CACHE_TTL_SECONDS, so readers pass is_current with the database
+version of the entity (recipe_crud.get_recipe_aggregate, collection_crud.get_collection_overview
+read it when the caller has not and there is no shared tier).
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from ..utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+RECIPE = "recipe"
+COLLECTION_OVERVIEW = "collection_overview"
+
+Key = Tuple[str, str]
+
+
+class LocalTier:
+    """Bounded in-process LRU of (version, expires_at, value) entries."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._entries: "OrderedDict[Key, Tuple[Any, float, Any]]" = OrderedDict()
+
+    def get(self, key: Key, version: Any) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        entry_version, expires_at, value = entry
+        if entry_version != version or expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Key, version: Any, value: Any) -> None:
+        self._entries[key] = (version, time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Key) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisTier:
+    """Shared tier holding the entity versions and JSON encoded entries."""
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "piatto:entity"):
+        import redis.asyncio as redis  # optional dependency, only needed for the shared tier
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    def _version_key(self, key: Key) -> str:
+        return f"{self.prefix}:version:{key[0]}:{key[1]}"
+
+    def _entry_key(self, key: Key, version: int) -> str:
+        return f"{self.prefix}:entry:{key[0]}:{key[1]}:{version}"
+
+    async def get_version(self, key: Key) -> int:
+        return int(await self._client.get(self._version_key(key)) or 0)
+
+    async def bump_version(self, key: Key) -> int:
+        return int(await self._client.incr(self._version_key(key)))
+
+    async def get(self, key: Key, version: int) -> Tuple[bool, Any]:
+        raw = await self._client.get(self._entry_key(key, version))
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    async def set(self, key: Key, version: int, value: Any) -> None:
+        await self._client.set(self._entry_key(key, version), json.dumps(value, default=str), ex=self.ttl_seconds)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class EntityCache:
+    """Versioned read-through cache with an in-process tier and an optional shared tier."""
+
+    def __init__(self,
+                 enabled: bool = True,
+                 max_entries: int = 2048,
+                 ttl_seconds: int = 300,
+                 shared: Optional[RedisTier] = None):
+        self.enabled = enabled
+        self.local = LocalTier(max_entries, ttl_seconds)
+        self.shared = shared
+        # Local versions are (epoch, counter); the epoch changes when the table is reset,
+        # so entries loaded before the reset can never match again.
+        self._epoch = 0
+        self._versions: Dict[Key, int] = {}
+        self._max_versions = max_entries * 8
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, field: str) -> None:
+        counters = self._stats.setdefault(
+            namespace, {"hits": 0, "shared_hits": 0, "misses": 0, "stale": 0, "invalidations": 0, "errors": 0}
+        )
+        counters[field] += 1
+
+    async def _current_version(self, key: Key) -> Any:
+        if self.shared is not None:
+            return self._epoch, await self.shared.get_version(key)
+        return self._epoch, self._versions.get(key, 0)
+
+    async def get_or_load(self,
+                          namespace: str,
+                          entity_id: Any,
+                          loader: Callable[[], Awaitable[Any]],
+                          is_current: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Return the cached value of an entity, calling loader on a miss.
+
+        A loader result of None (entity not found) is not cached. is_current lets callers that
+        already know the database version of an entity reject an outdated cached value, e.g.
+        one written by this worker before another worker changed the entity.
+        """
+        if not self.enabled:
+            return await loader()
+
+        key = (namespace, str(entity_id))
+        try:
+            version = await self._current_version(key)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Entity cache unavailable, loading %s %s from the database: %s", namespace, entity_id, e)
+            self._count(namespace, "errors")
+            return await loader()
+
+        found, value = self.local.get(key, version)
+        if found and is_current is not None and not is_current(value):
+            self.local.delete(key)
+            self._count(namespace, "stale")
+            found = False
+        if found:
+            self._count(namespace, "hits")
+            return value
+
+        if self.shared is not None:
+            try:
+                found, value = await self.shared.get(key, version[1])
+            except Exception as e:  # noqa: BLE001
+                logger.warning("Reading %s %s from the shared cache failed: %s", namespace, entity_id, e)
+                self._count(namespace, "errors")
+                found = False
+            if found and is_current is not None and not is_current(value):
+                self._count(namespace, "stale")
+                found = False
+            if found:
+                self._count(namespace, "shared_hits")
+                self.local.set(key, version, value)
+                return value
+
+        self._count(namespace, "misses")
+        value = await loader()
+        if value is None:
+            return None
+
+        self.local.set(key, version, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, version[1], value)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("Writing %s %s to the shared cache failed: %s", namespace, entity_id, e)
+                self._count(namespace, "errors")
+        return value
+
+    async def invalidate(self, namespace: str, entity_id: Any) -> None:
+        """Bump the version of an entity. Call after the write has been committed."""
+        key = (namespace, str(entity_id))
+        self.local.delete(key)
+        self._count(namespace, "invalidations")
+        if self.shared is not None:
+            try:
+                await self.shared.bump_version(key)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("Invalidating %s %s in the shared cache failed: %s", namespace, entity_id, e)
+                self._count(namespace, "errors")
+            return
+
+        if key not in self._versions and len(self._versions) >= self._max_versions:
+            self.clear()
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self) -> None:
+        """Drop all local entries and versions."""
+        self._epoch += 1
+        self._versions.clear()
+        self.local.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit-rate snapshot per namespace."""
+        namespaces = {}
+        for namespace, counters in self._stats.items():
+            lookups = counters["hits"] + counters["shared_hits"] + counters["misses"]
+            namespaces[namespace] = {
+                **counters,
+                "hit_rate": round((counters["hits"] + counters["shared_hits"]) / lookups, 4) if lookups else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "shared_tier": self.shared is not None,
+            "entries": len(self.local),
+            "max_entries": self.local.max_entries,
+            "evictions": self.local.evictions,
+            "namespaces": namespaces,
+        }
+
+
+def _create_entity_cache() -> EntityCache:
+    shared = None
+    if settings.ENTITY_CACHE_ENABLED and settings.ENTITY_CACHE_REDIS_URL:
+        try:
+            shared = RedisTier(settings.ENTITY_CACHE_REDIS_URL, settings.ENTITY_CACHE_TTL_SECONDS)
+        except ImportError:
+            logger.warning("ENTITY_CACHE_REDIS_URL is set but the redis package is not installed; "
+                           "using the in-process entity cache only")
+    return EntityCache(
+        enabled=settings.ENTITY_CACHE_ENABLED,
+        max_entries=settings.ENTITY_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ENTITY_CACHE_TTL_SECONDS,
+        shared=shared,
+    )
+
+
+entity_cache = _create_entity_cache()
+register_metrics("entity_cache", entity_cache.metrics)
+
+
+async def invalidate_recipe(recipe_id: int, user_id: Optional[str] = None) -> None:
+    """Invalidate a recipe aggregate and, if the owner is known, their collection overview."""
+    await entity_cache.invalidate(RECIPE, recipe_id)
+    if user_id is not None:
+        await entity_cache.invalidate(COLLECTION_OVERVIEW, user_id)
+
+
+async def invalidate_collection_overview(user_id: str) -> None:
+    """Invalidate the collection overview of a user."""
+    await entity_cache.invalidate(COLLECTION_OVERVIEW, user_id)
@@ -0,0 +1,105 @@
+"""
+Keeps the files table (crud/file_crud.py) in step with the storage bucket.
+
+bucket_base_repo calls record() after every successful upload and remove() after every
+delete, through the index of its BucketSession (None disables indexing, e.g. in storage tests).
+The object is the source of truth: a failed index write is logged and counted but does not
+fail the upload or delete; reindex() repairs the entries under a prefix from a bucket listing,
+e.g. for files uploaded before the index existed.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .crud import file_crud
+from .database import get_async_db_context, mark_user_write
+from .storage_backends import ObjectInfo, StorageBackend
+from ..utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+REINDEX_PAGE_SIZE = 1000
+
+
+def key_owner(key: str) -> Optional[Tuple[str, str]]:
+    """(user_id, category) of a key of the form users/<user_id>/<category>/..., else None."""
+    parts = key.split("/")
+    if len(parts) < 4 or parts[0] != "users" or not parts[1] or not parts[2]:
+        return None
+    return parts[1], parts[2]
+
+
+class FileIndex:
+    """Writes the files table entries of uploaded and deleted objects."""
+
+    def __init__(self) -> None:
+        self._stats = {"recorded": 0, "removed": 0, "errors": 0}
+
+    async def record(
+        self,
+        key: str,
+        size: int,
+        content_type: Optional[str],
+        sha256: Optional[str],
+        original_filename: Optional[str] = None,
+        content_addressed: bool = False,
+    ) -> None:
+        owner = key_owner(key)
+        if owner is None:
+            return
+        user_id, category = owner
+        try:
+            async with get_async_db_context() as db:
+                await file_crud.record_file(
+                    db, key, user_id, category, size, content_type, sha256, original_filename, content_addressed
+                )
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error("Recording %s in the file index failed: %s", key, e)
+            return
+        self._stats["recorded"] += 1
+        mark_user_write(user_id)  # the next listing must see the file, even on a replica
+
+    async def remove(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            async with get_async_db_context() as db:
+                self._stats["removed"] += await file_crud.delete_file_records(db, keys)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error("Removing %d keys from the file index failed: %s", len(keys), e)
+            return
+        for owner in {key_owner(key) for key in keys} - {None}:
+            mark_user_write(owner[0])
+
+    async def release(self, key: str) -> None:
+        """Hand a deleted content-addressed object over to the blob sweep (see file_crud.release_file)."""
+        try:
+            async with get_async_db_context() as db:
+                await file_crud.release_file(db, key, datetime.utcnow())
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error("Releasing %s in the file index failed: %s", key, e)
+
+    async def reindex(self, backend: StorageBackend, prefix: str) -> int:
+        """Record every object under prefix (without content hash); returns the number of objects.
+
+        Listings are capped per call, so very large prefixes should be reindexed per user.
+        """
+        infos = await backend.list(prefix, REINDEX_PAGE_SIZE)
+        for info in infos:
+            await self.record_info(info)
+        return len(infos)
+
+    async def record_info(self, info: ObjectInfo) -> None:
+        metadata = info.metadata or {}
+        await self.record(info.name, info.size, info.content_type, None, metadata.get("original_filename"))
+
+    def metrics(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+
+file_index = FileIndex()
+register_metrics("file_index", file_index.metrics)
@@ -0,0 +1,327 @@
+"""
+Async-native client for the Google Cloud Storage JSON API.
+
+google-cloud-storage is synchronous, so BucketEngine runs each call in the default thread
+pool, where storage calls compete with everything else offloaded there. This client talks to
+the JSON API over a pooled httpx.AsyncClient instead; concurrency is bounded by a semaphore
+(GCS_MAX_CONCURRENCY) rather than by the thread count.
+
+Errors are raised as google.api_core exceptions (NotFound, PreconditionFailed, ...), the
+same types the synchronous client raises, and transient errors are retried like
+BucketEngine._retry. Signing URLs stays with the synchronous client; it is a local operation.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+from google.api_core import exceptions as gapi_exc
+from google.auth.credentials import AnonymousCredentials, Credentials
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = "https://storage.googleapis.com"
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_INITIAL_BACKOFF = 1.0  # seconds
+DEFAULT_TIMEOUT = 30.0  # per request
+RESUMABLE_CHUNK_BYTES = 4 * 256 * 1024  # must be a multiple of 256 KB
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Retried with exponential backoff, as in BucketEngine._retry
+TRANSIENT_ERRORS = (
+    gapi_exc.TooManyRequests,
+    gapi_exc.ServiceUnavailable,
+    gapi_exc.InternalServerError,
+    gapi_exc.DeadlineExceeded,
+)
+
+
+class TokenRefresher:
+    """Keeps the access token of google-auth credentials fresh without blocking the event loop."""
+
+    def __init__(self, credentials: Optional[Credentials]):
+        if isinstance(credentials, AnonymousCredentials):
+            credentials = None
+        self._credentials = credentials
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+
+    def _is_fresh(self) -> bool:
+        expiry = self._credentials.expiry  # naive UTC
+        return bool(self._credentials.token) and (
+            expiry is None or expiry - TOKEN_REFRESH_MARGIN > datetime.utcnow()
+        )
+
+    async def headers(self) -> Dict[str, str]:
+        """Authorization header, refreshing the token shortly before it expires."""
+        if self._credentials is None:
+            return {}
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._refresh()
+        return {"Authorization": f"Bearer {self._credentials.token}"}
+
+    async def invalidate(self) -> None:
+        """Force a refresh, e.g. after the server rejected the token."""
+        if self._credentials is not None:
+            async with self._lock:
+                await self._refresh()
+
+    async def _refresh(self) -> None:
+        from google.auth.transport.requests import Request
+
+        # Token endpoint calls are rare (about once an hour), a thread is fine for them
+        await asyncio.to_thread(self._credentials.refresh, Request())
+        self.refreshes += 1
+
+
+def _error_from_response(response: httpx.Response) -> gapi_exc.GoogleAPICallError:
+    try:
+        message = response.json()["error"]["message"]
+    except Exception:  # noqa: BLE001
+        message = response.text[:200] or response.reason_phrase
+    if response.status_code == 504:
+        return gapi_exc.DeadlineExceeded(message)
+    return gapi_exc.from_http_status(response.status_code, message)
+
+
+class AsyncGcsClient:
+    """Bucket-scoped GCS JSON API client on a pooled httpx.AsyncClient."""
+
+    def __init__(
+        self,
+        bucket_name: str,
+        credentials: Optional[Credentials] = None,
+        endpoint: str = DEFAULT_ENDPOINT,
+        max_concurrency: int = 64,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
+    ) -> None:
+        self.bucket_name = bucket_name
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self._tokens = TokenRefresher(credentials)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=endpoint.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    def _object_path(self, name: str) -> str:
+        return f"/storage/v1/b/{quote(self.bucket_name, safe='')}/o/{quote(name, safe='')}"
+
+    # ---------- Retry Helper ----------
+    async def _with_retries(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        backoff = self.initial_backoff
+        last_exc: Optional[Exception] = None
+        for attempt_number in range(1, self.max_retries + 1):
+            try:
+                return await attempt()
+            except TRANSIENT_ERRORS as e:
+                last_exc = e
+                self._stats["retries"] += 1
+                logger.warning("GCS transient error on attempt %d/%d: %s (retrying in %.1fs)",
+                               attempt_number, self.max_retries, e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 16.0)
+        self._stats["errors"] += 1
+        raise last_exc
+
+    async def _send(self, method: str, url: str, expected=(200,), **kwargs) -> httpx.Response:
+        """One request; HTTP errors are raised as google.api_core exceptions."""
+        headers = kwargs.pop("headers", {})
+        for attempt in range(2):
+            try:
+                async with self._semaphore:
+                    self._stats["requests"] += 1
+                    response = await self._http.request(
+                        method, url, headers={**headers, **await self._tokens.headers()}, **kwargs
+                    )
+            except httpx.TimeoutException as e:
+                raise gapi_exc.DeadlineExceeded(f"{method} {url} timed out") from e
+            except httpx.TransportError as e:
+                # Dropped keep-alive connections and the like: worth another attempt
+                raise gapi_exc.ServiceUnavailable(f"{method} {url} failed: {e}") from e
+            if response.status_code == 401 and attempt == 0:
+                await self._tokens.invalidate()
+                continue
+            break
+        if response.status_code not in expected:
+            raise _error_from_response(response)
+        return response
+
+    async def _request(self, method: str, url: str, expected=(200,), **kwargs) -> httpx.Response:
+        return await self._with_retries(lambda: self._send(method, url, expected, **kwargs))
+
+    # ---------- Objects ----------
+    async def get_object(self, name: str) -> Dict[str, Any]:
+        """Object resource (metadata) of an object."""
+        return (await self._request("GET", self._object_path(name))).json()
+
+    async def exists(self, name: str) -> bool:
+        try:
+            await self._request("GET", self._object_path(name), params={"fields": "name"})
+        except gapi_exc.NotFound:
+            return False
+        return True
+
+    async def download(
+        self,
+        name: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        if_generation_match: Optional[int] = None,
+    ) -> bytes:
+        """Object content, or the bytes start..end (inclusive)."""
+        params: Dict[str, Any] = {"alt": "media"}
+        if if_generation_match is not None:
+            params["ifGenerationMatch"] = if_generation_match
+        headers = {}
+        if start is not None or end is not None:
+            headers["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+        response = await self._request("GET", self._object_path(name), expected=(200, 206),
+                                       params=params, headers=headers)
+        return response.content
+
+    async def delete(self, name: str) -> None:
+        await self._request("DELETE", self._object_path(name), expected=(200, 204))
+
+    async def make_public(self, name: str) -> Dict[str, Any]:
+        response = await self._request("PATCH", self._object_path(name),
+                                       params={"predefinedAcl": "publicRead"}, json={})
+        return response.json()
+
+    async def list_objects(self, prefix: str, max_results: int = 1000) -> List[Dict[str, Any]]:
+        """Object resources under a prefix, following pages up to max_results."""
+        items: List[Dict[str, Any]] = []
+        params: Dict[str, Any] = {"prefix": prefix}
+        while len(items) < max_results:
+            params["maxResults"] = min(max_results - len(items), 1000)
+            page = (await self._request("GET", f"/storage/v1/b/{quote(self.bucket_name, safe='')}/o",
+                                        params=params)).json()
+            items.extend(page.get("items", []))
+            if not page.get("nextPageToken"):
+                break
+            params["pageToken"] = page["nextPageToken"]
+        return items[:max_results]
+
+    async def start_resumable_upload(
+        self,
+        name: str,
+        content_type: str,
+        metadata: Optional[Dict[str, str]] = None,
+        if_generation_match: Optional[int] = None,
+        chunk_size: int = RESUMABLE_CHUNK_BYTES,
+    ) -> "ResumableUpload":
+        """Open a resumable upload session; the object is created when the upload is closed."""
+        params: Dict[str, Any] = {"uploadType": "resumable"}
+        if if_generation_match is not None:
+            params["ifGenerationMatch"] = if_generation_match
+        response = await self._request(
+            "POST",
+            f"/upload/storage/v1/b/{quote(self.bucket_name, safe='')}/o",
+            params=params,
+            json={"name": name, "contentType": content_type, "metadata": metadata or {}},
+            headers={"X-Upload-Content-Type": content_type},
+        )
+        return ResumableUpload(self, response.headers["Location"], chunk_size)
+
+    async def upload(
+        self,
+        name: str,
+        data: bytes,
+        content_type: str,
+        metadata: Optional[Dict[str, str]] = None,
+        if_generation_match: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Upload bytes as one object; returns the object resource."""
+        upload = await self.start_resumable_upload(
+            name, content_type, metadata, if_generation_match, chunk_size=max(len(data), RESUMABLE_CHUNK_BYTES)
+        )
+        await upload.write(data)
+        return await upload.close()
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "token_refreshes": self._tokens.refreshes}
+
+
+class ResumableUpload:
+    """Writer for a resumable upload session; buffers at most one chunk.
+
+    After a transient error the persisted offset is queried and only the missing bytes are
+    sent again, so retries never duplicate or skip data.
+    """
+
+    def __init__(self, client: AsyncGcsClient, session_url: str, chunk_size: int):
+        self._client = client
+        self._session_url = session_url
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._offset = 0  # bytes persisted by the server
+        self.resource: Optional[Dict[str, Any]] = None
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            chunk = bytes(self._buffer[:self._chunk_size])
+            del self._buffer[:self._chunk_size]
+            await self._put(chunk, final=False)
+
+    async def close(self) -> Dict[str, Any]:
+        """Send the remaining bytes and finalize the object."""
+        chunk = bytes(self._buffer)
+        self._buffer.clear()
+        await self._put(chunk, final=True)
+        return self.resource
+
+    async def abandon(self) -> None:
+        """Cancel the session; no object is created."""
+        try:
+            await self._client._send("DELETE", self._session_url, expected=(204, 499))
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Cancelling a resumable upload failed: %s", e)
+
+    async def _persisted_offset(self) -> int:
+        response = await self._client._send("PUT", self._session_url, expected=(200, 201, 308),
+                                            headers={"Content-Range": "bytes */*"})
+        if response.status_code in (200, 201):
+            self.resource = response.json()
+            return -1  # already finalized
+        persisted = response.headers.get("Range")  # e.g. "bytes=0-1048575"
+        return int(persisted.rsplit("-", 1)[1]) + 1 if persisted else 0
+
+    async def _put(self, chunk: bytes, final: bool) -> None:
+        start = self._offset
+        first_attempt = True
+
+        async def _attempt() -> None:
+            nonlocal first_attempt
+            sent_from = start
+            if not first_attempt:
+                persisted = await self._persisted_offset()
+                if persisted < 0:
+                    return
+                sent_from = persisted
+            first_attempt = False
+            data = chunk[sent_from - start:]
+            total = str(start + len(chunk)) if final else "*"
+            content_range = f"bytes {sent_from}-{sent_from + len(data) - 1}/{total}" if data else f"bytes */{total}"
+            response = await self._client._send(
+                "PUT", self._session_url, expected=(200, 201, 308),
+                content=data, headers={"Content-Range": content_range},
+            )
+            if response.status_code in (200, 201):
+                self.resource = response.json()
+
+        await self._client._with_retries(_attempt)
+        self._offset = start + len(chunk)
+
@@ -0,0 +1,276 @@
+"""
+Local file system storage backend.
+
+Objects are plain files under the storage root, at their key's path, so the API can serve
+them zero-copy (api/file_response.py). Content type, custom metadata and the public flag live
+in a JSON sidecar under <root>/.meta/, unfinished writes under <root>/.tmp/. A new object
+becomes visible atomically: the finished temp file is hard-linked to its key, which also
+fails if the key exists. The generation of an object is the mtime of its file in nanoseconds.
+
+Signed URLs point to the /files/local endpoints and carry an HMAC-SHA256 of method, key,
+expiry and content type (STORAGE_LOCAL_SIGNING_KEY). For development, tests, benchmarks and
+single-node deployments; several nodes would need a shared file system.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional
+from urllib.parse import quote, urlencode
+
+from google.api_core import exceptions as gapi_exc
+
+from .storage_backends import ObjectInfo, StorageBackend, StorageWriter, run_blocking
+
+logger = logging.getLogger(__name__)
+
+_META_DIR = ".meta"
+_TMP_DIR = ".tmp"
+
+
+def sign_local(secret: str, method: str, key: str, expires: int, content_type: Optional[str] = None) -> str:
+    """HMAC signature of a local storage URL."""
+    payload = "\n".join((method.upper(), key, str(expires), content_type or ""))
+    return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def verify_local_signature(
+    secret: str,
+    method: str,
+    key: str,
+    expires: int,
+    signature: str,
+    content_type: Optional[str] = None,
+    now: Optional[float] = None,
+) -> bool:
+    """Whether a local storage URL signature is valid and not expired."""
+    if expires < (datetime.now(timezone.utc).timestamp() if now is None else now):
+        return False
+    return hmac.compare_digest(sign_local(secret, method, key, expires, content_type), signature)
+
+
+class _LocalWriter(StorageWriter):
+    """Writes into a temp file that close() links to the key."""
+
+    def __init__(self, backend: "LocalBackend", key: str, content_type: str, metadata: Dict[str, str]):
+        self._backend = backend
+        self._key = key
+        self._meta = {"content_type": content_type, "metadata": metadata}
+        self._tmp_path = backend._tmp_path()
+        self._file = open(self._tmp_path, "wb")
+
+    async def write(self, data: bytes) -> None:
+        await run_blocking(self._file.write, data)
+
+    async def close(self) -> None:
+        await run_blocking(self._file.close)
+        try:
+            await run_blocking(self._backend._publish, self._tmp_path, self._key, self._meta, False)
+        finally:
+            await run_blocking(_unlink_quietly, self._tmp_path)
+
+    async def abandon(self) -> None:
+        self._file.close()
+        _unlink_quietly(self._tmp_path)
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class LocalBackend(StorageBackend):
+    """Objects as files under root; signed URLs served by the API itself."""
+
+    kind = "local"
+    is_remote = False
+
+    def __init__(self, root: str, base_url: str, signing_key: str) -> None:
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self._signing_key = signing_key
+
+    def uri(self, key: str) -> str:
+        return f"file://{os.path.join(self.root, key)}"
+
+    async def start(self) -> None:
+        for directory in (self.root, os.path.join(self.root, _META_DIR), os.path.join(self.root, _TMP_DIR)):
+            os.makedirs(directory, exist_ok=True)
+
+    # ---------- Paths ----------
+    def _path(self, key: str, base: Optional[str] = None) -> str:
+        parts = key.split("/")
+        # No traversal, no absolute keys and no access to the hidden sidecar directories
+        if not key or any(part in ("", ".", "..") or part.startswith(".") for part in parts):
+            raise gapi_exc.BadRequest(f"Invalid object key: {key!r}")
+        return os.path.join(base or self.root, *parts)
+
+    def _meta_path(self, key: str) -> str:
+        return self._path(key, os.path.join(self.root, _META_DIR)) + ".json"
+
+    def _tmp_path(self) -> str:
+        return os.path.join(self.root, _TMP_DIR, uuid.uuid4().hex)
+
+    # ---------- Blocking helpers (run in threads) ----------
+    def _read_meta(self, key: str) -> Dict:
+        try:
+            with open(self._meta_path(key), "rb") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_meta(self, key: str, meta: Dict) -> None:
+        path = self._meta_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = self._tmp_path()
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def _info(self, key: str, st: os.stat_result) -> ObjectInfo:
+        meta = self._read_meta(key)
+        return ObjectInfo(
+            name=key,
+            size=st.st_size,
+            content_type=meta.get("content_type") or mimetypes.guess_type(key)[0],
+            generation=st.st_mtime_ns,
+            updated=datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            metadata=meta.get("metadata"),
+        )
+
+    def _stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            return self._info(key, os.stat(self._path(key)))
+        except FileNotFoundError:
+            return None
+
+    def _open(self, key: str, if_generation_match: Optional[int]):
+        """Open an object for reading; an open file keeps its content even if the key is replaced."""
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise gapi_exc.NotFound(f"No such object: {key}")
+        if if_generation_match is not None and os.fstat(f.fileno()).st_mtime_ns != if_generation_match:
+            f.close()
+            raise gapi_exc.PreconditionFailed(f"Generation of {key} does not match {if_generation_match}")
+        return f
+
+    def _read(self, key: str, start: Optional[int], end: Optional[int], if_generation_match: Optional[int]) -> bytes:
+        with self._open(key, if_generation_match) as f:
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(end - (start or 0) + 1)
+
+    def _publish(self, tmp_path: str, key: str, meta: Dict, overwrite: bool) -> None:
+        path = self._path(key)
+        if not overwrite and os.path.exists(path):
+            raise gapi_exc.PreconditionFailed(f"Object {key} already exists")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if overwrite:
+            self._write_meta(key, meta)
+            os.replace(tmp_path, path)
+            return
+        try:
+            os.link(tmp_path, path)  # atomic create-if-absent
+        except FileExistsError:
+            raise gapi_exc.PreconditionFailed(f"Object {key} already exists")
+        self._write_meta(key, meta)  # only the winner of a concurrent create writes the metadata
+
+    def _delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            raise gapi_exc.NotFound(f"No such object: {key}")
+        _unlink_quietly(self._meta_path(key))
+
+    def _list(self, prefix: str, max_results: int) -> List[ObjectInfo]:
+        directory, _ = prefix.rsplit("/", 1) if "/" in prefix else ("", prefix)
+        top = self._path(directory) if directory else self.root
+        keys = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            relative = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            for filename in filenames:
+                key = filename if relative == "." else f"{relative}/{filename}"
+                if key.startswith(prefix):
+                    keys.append(key)
+        infos = []
+        for key in sorted(keys)[:max_results]:
+            info = self._stat(key)
+            if info is not None:  # deleted meanwhile
+                infos.append(info)
+        return infos
+
+    # ---------- StorageBackend ----------
+    async def stat(self, key: str) -> Optional[ObjectInfo]:
+        return await run_blocking(self._stat, key)
+
+    async def download(self, key, start=None, end=None, if_generation_match=None) -> bytes:
+        return await run_blocking(self._read, key, start, end, if_generation_match)
+
+    async def stream(self, info: ObjectInfo, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+        # One open file for the whole stream instead of one open per chunk
+        f = await run_blocking(self._open, info.name, info.generation)
+        try:
+            position = start
+            while position <= end:
+                chunk = await run_blocking(os.pread, f.fileno(), min(chunk_size, end + 1 - position), position)
+                if not chunk:
+                    break
+                yield chunk
+                position += len(chunk)
+        finally:
+            f.close()
+
+    async def open_local(self, info: ObjectInfo) -> Optional[BinaryIO]:
+        return await run_blocking(self._open, info.name, info.generation)
+
+    async def delete(self, key: str) -> None:
+        await run_blocking(self._delete, key)
+
+    async def list(self, prefix: str, max_results: int) -> List[ObjectInfo]:
+        return await run_blocking(self._list, prefix, max_results)
+
+    async def open_writer(self, key, content_type, metadata, chunk_size) -> StorageWriter:
+        self._path(key)  # validate before creating the temp file
+        return await run_blocking(_LocalWriter, self, key, content_type, metadata)
+
+    async def upload(self, key, data, content_type, metadata) -> None:
+        def _upload():
+            tmp_path = self._tmp_path()
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            try:
+                self._publish(tmp_path, key, {"content_type": content_type, "metadata": metadata}, True)
+            finally:
+                _unlink_quietly(tmp_path)
+
+        await run_blocking(_upload)
+
+    async def make_public(self, key: str) -> None:
+        def _make_public():
+            if not os.path.exists(self._path(key)):
+                raise gapi_exc.NotFound(f"No such object: {key}")
+            self._write_meta(key, {**self._read_meta(key), "public": True})
+
+        await run_blocking(_make_public)
+
+    async def is_public(self, key: str) -> bool:
+        return bool((await run_blocking(self._read_meta, key)).get("public"))
+
+    def public_url(self, key: str) -> str:
+        return f"{self.base_url}/files/local/{quote(key)}"
+
+    def sign_url(self, key, expiration, method="GET", content_type=None) -> str:
+        expires = int(expiration.timestamp())
+        query = {"expires": expires, "signature": sign_local(self._signing_key, method, key, expires, content_type)}
+        return f"{self.public_url(key)}?{urlencode(query)}"
+
+    def verify(self, method: str, key: str, expires: int, signature: str, content_type: Optional[str] = None) -> bool:
+        """Check a signature of a URL created with sign_url."""
+        return verify_local_signature(self._signing_key, method, key, expires, signature, content_type)
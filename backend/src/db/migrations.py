@@ -0,0 +1,164 @@
+"""
+Idempotent schema and data migrations that run at startup after the tables are created.
+"""
+import json
+import logging
+from typing import List, Optional
+
+from sqlalchemy import inspect, select, update, insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .database import Base
+from .crud.ingredient_index_crud import rebuild_ingredient_index
+from .crud.search_crud import create_search_index
+from .crud.sync_crud import backfill_sync_changes
+from .models.db_recipe import Recipe, PreparingSession, PreparingSessionRecipe
+
+logger = logging.getLogger(__name__)
+
+
+async def run_migrations(conn: AsyncConnection) -> None:
+    """Run all pending migrations on the given connection."""
+    await add_version_columns(conn)
+    await add_file_reference_columns(conn)
+    await add_collage_key_column(conn)
+    await create_missing_indexes(conn)
+    await migrate_preparing_session_suggestions(conn)
+    await create_search_index(conn)
+    await rebuild_ingredient_index(conn)
+    await backfill_sync_changes(conn)
+
+
+VERSIONED_TABLES = ("recipes", "collections")
+
+
+async def add_version_columns(conn: AsyncConnection) -> None:
+    """Add the updated_at and version columns to recipes and collections created before they existed."""
+    def _existing_columns(sync_conn):
+        inspector = inspect(sync_conn)
+        return {table: {column["name"] for column in inspector.get_columns(table)} for table in VERSIONED_TABLES}
+
+    existing = await conn.run_sync(_existing_columns)
+    for table, columns in existing.items():
+        if "version" not in columns:
+            await conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if "updated_at" not in columns:
+            # SQLite cannot add a column defaulting to CURRENT_TIMESTAMP; new rows get it from the model
+            await conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME NULL")
+            await conn.exec_driver_sql(f"UPDATE {table} SET updated_at = created_at")
+        if {"version", "updated_at"} - columns:
+            logger.info("Added version columns to %s", table)
+
+
+async def add_file_reference_columns(conn: AsyncConnection) -> None:
+    """Add the content-addressing and reference count columns to a files table created before them."""
+    def _existing_columns(sync_conn):
+        return {column["name"] for column in inspect(sync_conn).get_columns("files")}
+
+    columns = await conn.run_sync(_existing_columns)
+    if "content_addressed" not in columns:
+        await conn.exec_driver_sql("ALTER TABLE files ADD COLUMN content_addressed BOOLEAN NOT NULL DEFAULT 0")
+    if "ref_count" not in columns:
+        await conn.exec_driver_sql("ALTER TABLE files ADD COLUMN ref_count INTEGER NULL")
+    if "unreferenced_since" not in columns:
+        await conn.exec_driver_sql("ALTER TABLE files ADD COLUMN unreferenced_since DATETIME NULL")
+    if {"content_addressed", "ref_count", "unreferenced_since"} - columns:
+        logger.info("Added reference columns to files")
+
+
+async def add_collage_key_column(conn: AsyncConnection) -> None:
+    """Add the collage_key column to a collections table created before it."""
+    def _existing_columns(sync_conn):
+        return {column["name"] for column in inspect(sync_conn).get_columns("collections")}
+
+    if "collage_key" not in await conn.run_sync(_existing_columns):
+        await conn.exec_driver_sql("ALTER TABLE collections ADD COLUMN collage_key VARCHAR(512) NULL")
+        logger.info("Added collage_key to collections")
+
+
+async def create_missing_indexes(conn: AsyncConnection) -> None:
+    """Create declared indexes that are missing on already existing tables.
+
+    Base.metadata.create_all only creates indexes together with their table, so indexes
+    added to a model later have to be created explicitly.
+    """
+    def _create(sync_conn) -> None:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(_create)
+
+
+async def migrate_preparing_session_suggestions(conn: AsyncConnection) -> int:
+    """Move the legacy PreparingSession.context_suggestions JSON lists into preparing_session_recipes.
+
+    The active flag is taken from the legacy Recipe.preparing_session_id column. Migrated sessions
+    get their context_suggestions cleared, so running this again is a no-op.
+
+    Returns:
+        The number of migrated preparing sessions.
+    """
+    result = await conn.execute(
+        select(PreparingSession.id, PreparingSession.context_suggestions)
+        .where(PreparingSession.context_suggestions.isnot(None))
+    )
+    pending = result.all()
+
+    for session_id, raw_value in pending:
+        result = await conn.execute(select(Recipe.id).where(Recipe.preparing_session_id == session_id))
+        active_ids = set(result.scalars().all())
+
+        # Active recipes that were never recorded in the JSON list are appended at the end
+        suggested_ids = list(dict.fromkeys(_load_recipe_id_list(raw_value) + sorted(active_ids)))
+
+        if suggested_ids:
+            result = await conn.execute(select(Recipe.id).where(Recipe.id.in_(suggested_ids)))
+            existing_ids = set(result.scalars().all())
+            result = await conn.execute(
+                select(PreparingSessionRecipe.recipe_id)
+                .where(PreparingSessionRecipe.preparing_session_id == session_id)
+            )
+            linked_ids = set(result.scalars().all())
+
+            rows = [
+                {
+                    "preparing_session_id": session_id,
+                    "recipe_id": recipe_id,
+                    "position": position,
+                    "is_active": recipe_id in active_ids,
+                }
+                for position, recipe_id in enumerate(suggested_ids)
+                if recipe_id in existing_ids and recipe_id not in linked_ids
+            ]
+            if rows:
+                await conn.execute(insert(PreparingSessionRecipe), rows)
+
+        await conn.execute(
+            update(PreparingSession)
+            .where(PreparingSession.id == session_id)
+            .values(context_suggestions=None)
+        )
+
+    if pending:
+        logger.info("Migrated %d preparing sessions to preparing_session_recipes", len(pending))
+    return len(pending)
+
+
+def _load_recipe_id_list(raw_value: Optional[str]) -> List[int]:
+    """Parse a JSON encoded list of recipe identifiers."""
+    if not raw_value:
+        return []
+    try:
+        payload = json.loads(raw_value)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if not isinstance(payload, list):
+        return []
+    result: List[int] = []
+    for item in payload:
+        try:
+            result.append(int(item))
+        except (TypeError, ValueError):
+            continue
+    return result
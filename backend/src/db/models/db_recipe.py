@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, func, Boolean, Float
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, Text, func, Boolean, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from ..database import Base
 
@@ -6,9 +6,15 @@ from ..database import Base
 class Recipe(Base):
     """Database model for a recipe."""
     __tablename__ = "recipes"
+    __table_args__ = (
+        Index("ix_recipes_user_permanent_created", "user_id", "is_permanent", "created_at"),
+        # Reference counts of content-addressed images (file_crud.refresh_ref_counts)
+        Index("ix_recipes_image_url", "image_url"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(String(50), ForeignKey("users.id"), nullable=False)
+    # Legacy: superseded by preparing_session_recipes, only read by the data migration
     preparing_session_id = Column(Integer, ForeignKey("preparing_sessions.id", ondelete="SET NULL"), nullable=True)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
@@ -23,6 +29,9 @@ class Recipe(Base):
     food_category = Column(String(20), nullable=True)  # vegan, vegetarian, meat
     suggested_collection = Column(String(255), nullable=True)  # AI-suggested collection for this recipe
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    # Bumped by recipe_crud.touch_recipe on every change of the recipe, its ingredients or steps
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    version = Column(Integer, server_default="1", nullable=False)
     
     
 
@@ -46,7 +55,16 @@ class Recipe(Base):
         back_populates="recipes"
     )
 
-    preparing_session = relationship("PreparingSession", back_populates="current_recipes")
+    preparing_session_links = relationship(
+        "PreparingSessionRecipe",
+        back_populates="recipe",
+        cascade="all, delete-orphan",
+    )
+
+    ingredient_terms = relationship(
+        "RecipeIngredientTerm",
+        cascade="all, delete-orphan",
+    )
 
 
 class RecipeIngredient(Base):
@@ -54,7 +72,7 @@ class RecipeIngredient(Base):
     __tablename__ = "recipe_ingredients"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
     quantity = Column(Float, nullable=True)
     unit = Column(String(50), nullable=True)
@@ -62,9 +80,28 @@ class RecipeIngredient(Base):
     recipe = relationship("Recipe", back_populates="ingredients")
 
 
+class RecipeIngredientTerm(Base):
+    """Inverted index entry mapping a canonical ingredient name to a saved recipe."""
+    __tablename__ = "recipe_ingredient_terms"
+    __table_args__ = (
+        UniqueConstraint("recipe_id", "term", name="uq_recipe_ingredient_term"),
+        Index("ix_recipe_ingredient_terms_user_term", "user_id", "term"),
+        Index("ix_recipe_ingredient_terms_user_head", "user_id", "head"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(String(50), ForeignKey("users.id"), nullable=False)
+    term = Column(String(100), nullable=False)  # Canonical ingredient name, e.g. "red onion"
+    head = Column(String(100), nullable=False)  # Last word of the term, e.g. "onion"
+
+
 class InstructionStep(Base):
     """Database model for a recipe instruction step."""
     __tablename__ = "instruction_steps"
+    __table_args__ = (
+        Index("ix_instruction_steps_recipe_step", "recipe_id", "step_number"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
@@ -83,10 +120,45 @@ class PreparingSession(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(String(50), ForeignKey("users.id"), nullable=False)
-    context_suggestions = Column(Text, nullable=True)  # Store suggestions as JSON string
+    # Legacy JSON list of suggested recipe ids, moved into preparing_session_recipes by the data migration
+    context_suggestions = Column(Text, nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
-    current_recipes = relationship("Recipe", back_populates="preparing_session", order_by="Recipe.created_at")
+    recipe_links = relationship(
+        "PreparingSessionRecipe",
+        back_populates="preparing_session",
+        cascade="all, delete-orphan",
+        order_by="PreparingSessionRecipe.position",
+    )
+
+    current_recipes = relationship(
+        "Recipe",
+        secondary="preparing_session_recipes",
+        primaryjoin="and_(PreparingSession.id == PreparingSessionRecipe.preparing_session_id, "
+                    "PreparingSessionRecipe.is_active == True)",
+        secondaryjoin="Recipe.id == PreparingSessionRecipe.recipe_id",
+        order_by="PreparingSessionRecipe.position",
+        viewonly=True,
+    )
+
+
+class PreparingSessionRecipe(Base):
+    """Database model for a recipe suggested within a preparing session."""
+    __tablename__ = "preparing_session_recipes"
+    __table_args__ = (
+        UniqueConstraint("preparing_session_id", "recipe_id", name="uq_preparing_session_recipe"),
+        Index("ix_preparing_session_recipes_active", "preparing_session_id", "is_active", "position"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    preparing_session_id = Column(Integer, ForeignKey("preparing_sessions.id", ondelete="CASCADE"), nullable=False)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # Order in which the recipe was suggested
+    is_active = Column(Boolean, default=True, nullable=False)  # Shown in the current options list
+    added_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    preparing_session = relationship("PreparingSession", back_populates="recipe_links")
+    recipe = relationship("Recipe", back_populates="preparing_session_links")
 
 
 class CookingSession(Base):
@@ -94,7 +166,7 @@ class CookingSession(Base):
     __tablename__ = "cooking_sessions"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    user_id = Column(String(50), ForeignKey("users.id"), nullable=False)
+    user_id = Column(String(50), ForeignKey("users.id"), nullable=False, index=True)
     recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
     state = Column(Integer, default=0)  # 0: not started, 1,2... steps of the recipe
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -104,6 +176,9 @@ class CookingSession(Base):
 class PromptHistory(Base):
     """Database model for prompt history during a cooking session."""
     __tablename__ = "prompt_histories"
+    __table_args__ = (
+        Index("ix_prompt_histories_session_state", "cooking_session_id", "state"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     cooking_session_id = Column(Integer, ForeignKey("cooking_sessions.id"), nullable=False)
@@ -118,12 +193,21 @@ class PromptHistory(Base):
 class Collection(Base):
     """Database model for a recipe collection."""
     __tablename__ = "collections"
+    __table_args__ = (
+        Index("ix_collections_owner_created", "owner_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     owner_id = Column(String(50), ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    # Bumped by collection_crud.touch_collections on every change of the collection, its
+    # memberships or one of its recipes
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    version = Column(Integer, server_default="1", nullable=False)
+    # Key of the last rendered preview collage (services/collage_service.py)
+    collage_key = Column(String(512), nullable=True)
 
     recipes = relationship(
         "Recipe",
@@ -135,8 +219,64 @@ class Collection(Base):
 class CollectionRecipe(Base):
     """Database model for the many-to-many relationship between collections and recipes."""
     __tablename__ = "collection_recipes"
+    __table_args__ = (
+        Index("ix_collection_recipes_collection_recipe", "collection_id", "recipe_id"),
+        Index("ix_collection_recipes_collection_added", "collection_id", "added_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     collection_id = Column(Integer, ForeignKey("collections.id", ondelete="CASCADE"), nullable=False)
-    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
-    added_at = Column(DateTime, server_default=func.now(), nullable=False)
\ No newline at end of file
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False, index=True)
+    added_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+class SyncChange(Base):
+    """Change log entry of the delta-sync feed: an entity of a user was upserted or deleted.
+
+    The autoincrement id is the sync cursor. Entities are "recipe" (saved recipes only),
+    "collection" and "membership" (entity_id "<collection_id>:<recipe_id>").
+    """
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        Index("ix_sync_changes_user_id", "user_id", "id"),
+        Index("ix_sync_changes_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(50), nullable=False)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(String(64), nullable=False)
+    op = Column(String(10), nullable=False)  # upsert, delete
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class StoredFile(Base):
+    """Index entry of an object in the storage bucket, written by bucket_base_repo on upload and delete.
+
+    Listing a user's files and their storage usage are served from this table instead of
+    listing the bucket. The newest files have the highest id (keyset pagination).
+
+    Content-addressed objects (CONTENT_ADDRESSED_STORAGE) are shared by every recipe and user
+    row that references their key; ref_count is recomputed from those rows by the blob sweep,
+    which deletes objects unreferenced for longer than the grace period.
+    """
+    __tablename__ = "files"
+    __table_args__ = (
+        Index("ix_files_user_id", "user_id", "id"),
+        # Covers listing by category and the usage aggregate (sum of size per category)
+        Index("ix_files_user_category", "user_id", "category", "id", "size"),
+        Index("ix_files_unreferenced", "content_addressed", "unreferenced_since"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(512), nullable=False, unique=True)
+    user_id = Column(String(50), nullable=False)
+    category = Column(String(50), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100), nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    original_filename = Column(String(255), nullable=True)
+    content_addressed = Column(Boolean, server_default="0", nullable=False)
+    ref_count = Column(Integer, nullable=True)  # None until the first blob sweep
+    unreferenced_since = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,313 @@
+"""
+Node-local cache of hot object bytes (recipe images served via /files/serve).
+
+Two tiers, both keyed by (object key, generation), so a replaced object can never be served
+from an old entry:
+
+- memory: LRU bounded by bytes
+- disk: LRU of files under OBJECT_CACHE_DIR bounded by bytes, read through mmap so a range
+  request only touches the pages it needs and repeated reads come from the page cache
+
+Admission control keeps the tiers for what they are meant for: only image content types up to
+OBJECT_CACHE_MAX_OBJECT_MB are admitted, and the memory tier only takes objects up to 1/16 of
+its size. Large PDFs or documents therefore never evict images.
+
+Object metadata (ObjectInfo) is cached for OBJECT_CACHE_INFO_TTL_SECONDS as well, so a hot
+image is served without any storage request. Generated keys are never overwritten; deletes
+through bucket_base_repo invalidate the entry of this worker, other workers notice them at the
+latest after the TTL.
+"""
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+from ..utils.metrics import register_metrics
+from .storage_backends import ObjectInfo
+
+logger = logging.getLogger(__name__)
+
+ADMITTED_CONTENT_TYPES = ("image/",)
+MEMORY_OBJECT_FRACTION = 16  # memory tier takes objects up to max_bytes / 16
+
+Key = Tuple[str, int]
+
+
+class MemoryTier:
+    """LRU of object bytes bounded by their total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Key, bytes]" = OrderedDict()
+
+    def admits(self, size: int) -> bool:
+        return size <= self.max_bytes // MEMORY_OBJECT_FRACTION
+
+    def get(self, key: Key) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: Key, data: bytes) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = data
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def delete(self, name: str) -> None:
+        for key in [key for key in self._entries if key[0] == name]:
+            self.bytes -= len(self._entries.pop(key))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)  # signal 0 only checks that the process exists
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # owned by another user
+        return True
+    return True
+
+
+def _remove_stale_directories(root: str) -> None:
+    """Remove the directories of processes that have exited (restarts, recycled workers)."""
+    if os.name != "posix":  # os.kill would terminate the process
+        return
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.isdigit() and int(name) != os.getpid() and not _process_exists(int(name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class DiskTier:
+    """LRU of object files bounded by their total size; the index lives in this process.
+
+    Every process uses its own directory below root, which is emptied on start. Directories
+    of processes that no longer exist are removed at the same time.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.join(root, str(os.getpid()))
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Key, int]" = OrderedDict()  # key -> size
+        _remove_stale_directories(root)
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: Key) -> str:
+        digest = hashlib.blake2b(key[0].encode(), digest_size=16).hexdigest()
+        return os.path.join(self.root, f"{digest}-{key[1]}")
+
+    def contains(self, key: Key) -> bool:
+        if key not in self._entries:
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def read(self, key: Key, start: int, end: int) -> Optional[bytes]:
+        """The bytes start..end (inclusive) of a cached object. Blocking, run in a thread."""
+        try:
+            with open(self._path(key), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[start:end + 1]
+        except (FileNotFoundError, ValueError):  # evicted meanwhile / empty file
+            return None
+
+    def write(self, key: Key, data: bytes) -> None:
+        """Store an object file. Blocking, run in a thread."""
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def add(self, key: Key, size: int) -> list:
+        """Register a written file; returns the paths of evicted files to remove."""
+        if key in self._entries:  # written concurrently by another request
+            self._entries.move_to_end(key)
+            return []
+        self._entries[key] = size
+        self.bytes += size
+        evicted = []
+        while self.bytes > self.max_bytes:
+            old_key, old_size = self._entries.popitem(last=False)
+            self.bytes -= old_size
+            self.evictions += 1
+            evicted.append(self._path(old_key))
+        return evicted
+
+    def delete(self, name: str) -> list:
+        paths = []
+        for key in [key for key in self._entries if key[0] == name]:
+            self.bytes -= self._entries.pop(key)
+            paths.append(self._path(key))
+        return paths
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _remove_files(paths: list) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+class ObjectCache:
+    """Two-tier byte cache with admission control, plus a short-lived metadata cache."""
+
+    def __init__(self,
+                 enabled: bool = True,
+                 memory_bytes: int = 64 * 1024 * 1024,
+                 disk_dir: Optional[str] = None,
+                 disk_bytes: int = 0,
+                 max_object_bytes: int = 5 * 1024 * 1024,
+                 info_ttl_seconds: float = 60):
+        self.enabled = enabled
+        self.max_object_bytes = max_object_bytes
+        self.info_ttl_seconds = info_ttl_seconds
+        self.memory = MemoryTier(memory_bytes)
+        self.disk = DiskTier(disk_dir, disk_bytes) if enabled and disk_dir and disk_bytes > 0 else None
+        self._infos: "OrderedDict[str, Tuple[float, ObjectInfo]]" = OrderedDict()
+        self._max_infos = 10_000
+        self._stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "info_hits": 0, "info_misses": 0,
+            "admitted": 0, "rejected": 0, "errors": 0,
+        }
+
+    # ---------- Metadata ----------
+    def get_info(self, key: str) -> Optional[ObjectInfo]:
+        if not self.enabled:
+            return None
+        entry = self._infos.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._stats["info_misses"] += 1
+            return None
+        self._stats["info_hits"] += 1
+        return entry[1]
+
+    def put_info(self, info: ObjectInfo) -> None:
+        if not self.enabled or not self.admits(info):
+            return
+        self._infos[info.name] = (time.monotonic() + self.info_ttl_seconds, info)
+        self._infos.move_to_end(info.name)
+        while len(self._infos) > self._max_infos:
+            self._infos.popitem(last=False)
+
+    # ---------- Bytes ----------
+    def admits(self, info: ObjectInfo) -> bool:
+        """Admission control: only images up to max_object_bytes are cached."""
+        return (
+            self.enabled
+            and info.generation is not None
+            and 0 < info.size <= self.max_object_bytes
+            and (info.content_type or "").startswith(ADMITTED_CONTENT_TYPES)
+        )
+
+    async def get(self, info: ObjectInfo, start: int, end: int) -> Optional[bytes]:
+        """The bytes start..end (inclusive) of exactly this generation, None on a miss."""
+        if not self.admits(info):
+            return None
+        key = (info.name, info.generation)
+        data = self.memory.get(key)
+        if data is not None:
+            self._stats["memory_hits"] += 1
+            return data[start:end + 1]
+
+        if self.disk is not None and self.disk.contains(key):
+            promote = self.memory.admits(info.size)
+            data = await asyncio.to_thread(self.disk.read, key, 0 if promote else start, info.size - 1 if promote else end)
+            if data is not None:
+                self._stats["disk_hits"] += 1
+                if promote:
+                    self.memory.put(key, data)
+                    return data[start:end + 1]
+                return data
+
+        self._stats["misses"] += 1
+        return None
+
+    async def put(self, info: ObjectInfo, data: bytes) -> None:
+        """Store the complete content of an object, if admitted."""
+        if not self.admits(info) or len(data) != info.size:
+            self._stats["rejected"] += 1
+            return
+        key = (info.name, info.generation)
+        self._stats["admitted"] += 1
+        if self.memory.admits(info.size):
+            self.memory.put(key, data)
+        if self.disk is not None and not self.disk.contains(key):
+            try:
+                await asyncio.to_thread(self.disk.write, key, data)
+            except OSError as e:
+                logger.warning("Writing %s to the disk cache failed: %s", info.name, e)
+                self._stats["errors"] += 1
+                return
+            evicted = self.disk.add(key, info.size)
+            if evicted:
+                await asyncio.to_thread(_remove_files, evicted)
+
+    def invalidate(self, key: str) -> None:
+        """Drop all generations and the metadata of an object (after a delete)."""
+        self._infos.pop(key, None)
+        self.memory.delete(key)
+        if self.disk is not None:
+            _remove_files(self.disk.delete(key))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit-ratio snapshot."""
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        info_lookups = self._stats["info_hits"] + self._stats["info_misses"]
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "info_hit_ratio": round(self._stats["info_hits"] / info_lookups, 4) if info_lookups else None,
+            "memory": {"entries": len(self.memory), "bytes": self.memory.bytes,
+                       "max_bytes": self.memory.max_bytes, "evictions": self.memory.evictions},
+            "disk": None if self.disk is None else {
+                "entries": len(self.disk), "bytes": self.disk.bytes,
+                "max_bytes": self.disk.max_bytes, "evictions": self.disk.evictions,
+            },
+        }
+
+
+def _create_object_cache() -> ObjectCache:
+    return ObjectCache(
+        enabled=settings.OBJECT_CACHE_ENABLED,
+        memory_bytes=int(settings.OBJECT_CACHE_MEMORY_MB * 1024 * 1024),
+        disk_dir=settings.OBJECT_CACHE_DIR or os.path.join(tempfile.gettempdir(), "piatto-object-cache"),
+        disk_bytes=int(settings.OBJECT_CACHE_DISK_MB * 1024 * 1024),
+        max_object_bytes=int(settings.OBJECT_CACHE_MAX_OBJECT_MB * 1024 * 1024),
+        info_ttl_seconds=settings.OBJECT_CACHE_INFO_TTL_SECONDS,
+    )
+
+
+object_cache = _create_object_cache()
+register_metrics("object_cache", object_cache.metrics)
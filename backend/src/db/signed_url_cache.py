@@ -0,0 +1,128 @@
+"""
+Cache of signed GET URLs for bucket objects.
+
+Signing a URL is a local operation (no storage request), but it is CPU bound and listing screens
+sign dozens of keys per request. URLs are cached per (key, TTL, TTL bucket): time is divided
+into buckets of the requested TTL and every URL is signed to expire one full TTL after the
+end of its bucket. Within a bucket the same URL is returned (stable for browser caches) and it
+is always valid for at least the requested TTL.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..config import settings
+from ..utils.metrics import register_metrics
+from .bucket_session import BucketEngine, BucketSession, get_async_bucket_session
+
+# V4 signed URLs are valid for at most 7 days; a URL lives for up to two TTLs
+MAX_TTL_MINUTES = 7 * 24 * 60 // 2
+
+Key = Tuple[str, int, int]
+
+
+def ttl_bucket(minutes: int, now: Optional[float] = None) -> int:
+    """Index of the current TTL bucket for URLs valid for the given minutes."""
+    return int((time.time() if now is None else now) // (minutes * 60))
+
+
+def bucket_expires_at(minutes: int, bucket: int) -> datetime:
+    """Expiry of URLs signed in the given TTL bucket."""
+    return datetime.fromtimestamp((bucket + 2) * minutes * 60, tz=timezone.utc)
+
+
+def is_signable(key: Optional[str]) -> bool:
+    """Whether a stored image reference is a bucket key (and not empty or an external URL)."""
+    return bool(key) and not key.startswith(("http://", "https://"))
+
+
+class SignedUrlCache:
+    """Bounded LRU of signed URLs keyed by (key, TTL minutes, TTL bucket)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Key, str]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    async def sign_many(self, sess: BucketSession, keys: Iterable[str], minutes: int) -> Dict[str, str]:
+        """Signed GET URLs for the given keys. External URLs are returned unchanged, empty keys skipped."""
+        if not 1 <= minutes <= MAX_TTL_MINUTES:
+            raise HTTPException(status_code=400, detail=f"minutes must be between 1 and {MAX_TTL_MINUTES}")
+
+        bucket = ttl_bucket(minutes)
+        urls: Dict[str, str] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            if not key:
+                continue
+            if not is_signable(key):
+                urls[key] = key
+                continue
+            url = self._entries.get((key, minutes, bucket))
+            if url is None:
+                missing.append(key)
+                continue
+            self._entries.move_to_end((key, minutes, bucket))
+            self._stats["hits"] += 1
+            urls[key] = url
+
+        if missing:
+            self._stats["misses"] += len(missing)
+            expiration = bucket_expires_at(minutes, bucket)
+
+            def _sign_all():
+                return [sess.backend.sign_url(key, expiration) for key in missing]
+
+            # One thread hop for all misses; signing needs no network (GCS: with a service account key)
+            for key, url in zip(missing, await BucketEngine._run_blocking(_sign_all)):
+                self._set((key, minutes, bucket), url)
+                urls[key] = url
+        return urls
+
+    async def sign(self, sess: BucketSession, key: str, minutes: int) -> str:
+        """Signed GET URL for a single key."""
+        return (await self.sign_many(sess, [key], minutes))[key]
+
+    def _set(self, key: Key, url: str) -> None:
+        self._entries[key] = url
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit-rate snapshot."""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+signed_url_cache = SignedUrlCache(settings.SIGNED_URL_CACHE_MAX_ENTRIES)
+register_metrics("signed_url_cache", signed_url_cache.metrics)
+
+
+def etag_parts(embedded: bool, minutes: Optional[int] = None) -> Tuple:
+    """Extra ETag parts for responses embedding signed URLs, which change with the TTL bucket."""
+    if not embedded:
+        return ()
+    minutes = minutes or settings.SIGNED_URL_EMBED_MINUTES
+    return "signed_urls", minutes, ttl_bucket(minutes)
+
+
+async def sign_image_keys(keys: Iterable[Optional[str]], minutes: Optional[int] = None) -> Dict[str, str]:
+    """Signed URLs for stored image references, to embed them in payloads."""
+    keys = [key for key in keys if key]
+    if not any(is_signable(key) for key in keys):
+        return {key: key for key in keys}
+    async with get_async_bucket_session() as sess:
+        return await signed_url_cache.sign_many(sess, keys, minutes or settings.SIGNED_URL_EMBED_MINUTES)
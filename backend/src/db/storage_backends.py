@@ -0,0 +1,307 @@
+"""
+Storage backend interface and the Google Cloud Storage implementation.
+
+bucket_base_repo works against StorageBackend only: upload (one-shot or resumable writer),
+info, download (ranges), delete, list and URL signing. Backends raise google.api_core
+exceptions (NotFound, PreconditionFailed, ...) whatever they are built on, so callers handle
+errors the same way for every backend. The local-filesystem backend lives in local_storage.py;
+settings.STORAGE_BACKEND selects the active one (see bucket_session.BucketEngine).
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional
+
+from google.api_core import exceptions as gapi_exc
+from google.cloud import storage
+
+from .gcs_async import TRANSIENT_ERRORS, AsyncGcsClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_INITIAL_BACKOFF = 1.0  # seconds
+
+
+@dataclass(slots=True)
+class ObjectInfo:
+    """Metadaten eines Objekts, unabhängig davon, über welchen Client sie geladen wurden."""
+    name: str
+    size: int
+    content_type: Optional[str]
+    generation: Optional[int]
+    updated: Optional[datetime]
+    metadata: Optional[Dict[str, str]]
+
+    @classmethod
+    def from_blob(cls, blob: storage.Blob) -> "ObjectInfo":
+        return cls(blob.name, blob.size or 0, blob.content_type, blob.generation, blob.updated, blob.metadata)
+
+    @classmethod
+    def from_resource(cls, resource: Dict[str, Any]) -> "ObjectInfo":
+        """Aus einer Objekt-Ressource der JSON API."""
+        updated = resource.get("updated")
+        return cls(
+            resource["name"],
+            int(resource.get("size", 0)),
+            resource.get("contentType"),
+            int(resource["generation"]) if resource.get("generation") else None,
+            datetime.fromisoformat(updated.replace("Z", "+00:00")) if updated else None,
+            resource.get("metadata"),
+        )
+
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """Run a blocking call (google-cloud-storage, file system) in the default thread pool."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+async def retry_blocking(
+    fn: Callable,
+    *args,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
+    **kwargs,
+):
+    """Run a blocking storage call in a thread, retrying transient errors with exponential backoff."""
+    backoff = initial_backoff
+    last_exc = None
+    for attempt in range(1, max_retries + 1):
+        try:
+            return await run_blocking(fn, *args, **kwargs)
+        except TRANSIENT_ERRORS as e:
+            last_exc = e
+            logger.warning("GCS transient error on attempt %d/%d: %s (retrying in %.1fs)", attempt, max_retries, e, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 16.0)
+        except (gapi_exc.NotFound, gapi_exc.PermissionDenied, gapi_exc.BadRequest) as e:
+            # Expected errors - don't retry, don't log as error
+            raise e
+        except Exception as e:
+            last_exc = e
+            logger.error("GCS non-retryable error: %s", e)
+            break
+    raise last_exc
+
+
+class StorageWriter(ABC):
+    """Writer of a new object; the object only becomes visible on close()."""
+
+    @abstractmethod
+    async def write(self, data: bytes) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    async def abandon(self) -> None:
+        """Discard the written bytes; no object is created."""
+
+
+class StorageBackend(ABC):
+    """Object storage used by bucket_base_repo."""
+
+    #: Short backend name for logs and metrics ("gcs", "local")
+    kind: str = ""
+    #: Every access costs a network round trip, so node-local caching (object_cache) pays off
+    is_remote: bool = True
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """Human readable location of a key for logs, e.g. gs://bucket/key."""
+
+    async def start(self) -> None:
+        """Check that the storage is reachable (called once by BucketEngine)."""
+
+    async def close(self) -> None:
+        """Release connections and other resources."""
+
+    # ---------- Objects ----------
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Metadata of an object, None if it does not exist."""
+
+    @abstractmethod
+    async def download(
+        self,
+        key: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        if_generation_match: Optional[int] = None,
+    ) -> bytes:
+        """Object content, or the bytes start..end (inclusive). Raises NotFound / PreconditionFailed."""
+
+    async def stream(self, info: ObjectInfo, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+        """The bytes start..end (inclusive) of exactly the generation in info, in chunks.
+
+        One ranged download per chunk by default; backends with cheaper access override this.
+        """
+        position = start
+        while position <= end:
+            chunk_end = min(position + chunk_size, end + 1) - 1
+            chunk = await self.download(info.name, position, chunk_end, if_generation_match=info.generation)
+            if not chunk:
+                break
+            yield chunk
+            position += len(chunk)
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete an object. Raises NotFound if it does not exist."""
+
+    @abstractmethod
+    async def list(self, prefix: str, max_results: int) -> List[ObjectInfo]:
+        """Objects whose key starts with prefix, ordered by key."""
+
+    @abstractmethod
+    async def open_writer(self, key: str, content_type: str, metadata: Dict[str, str], chunk_size: int) -> StorageWriter:
+        """Writer for a new object; fails with PreconditionFailed if the key already exists."""
+
+    @abstractmethod
+    async def upload(self, key: str, data: bytes, content_type: str, metadata: Dict[str, str]) -> None:
+        """Store bytes as one object."""
+
+    # ---------- Access ----------
+    @abstractmethod
+    async def make_public(self, key: str) -> None:
+        """Make a single object readable without credentials under public_url(key)."""
+
+    @abstractmethod
+    def public_url(self, key: str) -> str:
+        """URL of an object made public with make_public."""
+
+    @abstractmethod
+    def sign_url(self, key: str, expiration: datetime, method: str = "GET", content_type: Optional[str] = None) -> str:
+        """Signed URL granting method on key until expiration. Local and CPU bound (no I/O)."""
+
+    async def open_local(self, info: ObjectInfo) -> Optional[BinaryIO]:
+        """Open file of exactly the generation in info, if objects are local files (zero-copy serving).
+
+        None for remote backends. Raises NotFound / PreconditionFailed like download.
+        """
+        return None
+
+
+class _ThreadedBlobWriter(StorageWriter):
+    """BlobWriter (Resumable Upload von google-cloud-storage) mit dem async Interface von gcs_async.ResumableUpload."""
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    async def write(self, data: bytes) -> None:
+        await run_blocking(self._writer.write, data)
+
+    async def close(self) -> None:
+        await run_blocking(self._writer.close)
+
+    async def abandon(self) -> None:
+        # BlobWriter.close() (auch implizit beim Garbage Collect) würde die gepufferten Bytes als
+        # Objekt committen; nur den Puffer zu schließen lässt die Resumable-Session verfallen.
+        self._writer._buffer.close()
+
+
+class GcsBackend(StorageBackend):
+    """Google Cloud Storage, via the native async client if given, else google-cloud-storage in threads.
+
+    Signing always uses the synchronous client; it needs no network with a service account key.
+    """
+
+    kind = "gcs"
+
+    def __init__(self, client: storage.Client, bucket: storage.Bucket, timeout: float,
+                 http: Optional[AsyncGcsClient] = None) -> None:
+        self.client = client
+        self.bucket = bucket
+        self.timeout = timeout
+        self.http = http
+
+    def uri(self, key: str) -> str:
+        return f"gs://{self.bucket.name}/{key}"
+
+    async def start(self) -> None:
+        # leichte Probe
+        await run_blocking(self.bucket.exists, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self.http is not None:
+            await self.http.close()
+
+    async def stat(self, key: str) -> Optional[ObjectInfo]:
+        if self.http is not None:
+            try:
+                return ObjectInfo.from_resource(await self.http.get_object(key))
+            except gapi_exc.NotFound:
+                return None
+        blob = await retry_blocking(self.bucket.get_blob, key, timeout=self.timeout)
+        return ObjectInfo.from_blob(blob) if blob is not None else None
+
+    async def download(self, key, start=None, end=None, if_generation_match=None) -> bytes:
+        if self.http is not None:
+            return await self.http.download(key, start, end, if_generation_match)
+        return await retry_blocking(
+            self.bucket.blob(key).download_as_bytes,
+            start=start,
+            end=end,
+            if_generation_match=if_generation_match,
+            timeout=self.timeout,
+        )
+
+    async def exists(self, key: str) -> bool:
+        if self.http is not None:
+            return await self.http.exists(key)
+        return await retry_blocking(self.bucket.blob(key).exists, timeout=self.timeout)
+
+    async def delete(self, key: str) -> None:
+        if self.http is not None:
+            await self.http.delete(key)
+        else:
+            await retry_blocking(self.bucket.blob(key).delete, timeout=self.timeout)
+
+    async def list(self, prefix: str, max_results: int) -> List[ObjectInfo]:
+        if self.http is not None:
+            return [ObjectInfo.from_resource(item) for item in await self.http.list_objects(prefix, max_results)]
+
+        # list_blobs ist ein sync-Iterator → in Thread ausführen
+        def _list_blobs():
+            return [ObjectInfo.from_blob(b)
+                    for b in self.client.list_blobs(self.bucket, prefix=prefix, max_results=max_results)]
+
+        return await run_blocking(_list_blobs)
+
+    async def open_writer(self, key, content_type, metadata, chunk_size) -> StorageWriter:
+        # if_generation_match=0: nur neue Keys, macht Chunk-Retries sicher
+        if self.http is not None:
+            return await self.http.start_resumable_upload(
+                key, content_type, metadata, if_generation_match=0, chunk_size=chunk_size
+            )
+        blob = self.bucket.blob(key)
+        blob.metadata = metadata
+        return _ThreadedBlobWriter(blob.open("wb", chunk_size=chunk_size, content_type=content_type,
+                                             if_generation_match=0, timeout=self.timeout))
+
+    async def upload(self, key, data, content_type, metadata) -> None:
+        if self.http is not None:
+            await self.http.upload(key, data, content_type, metadata)
+            return
+        blob = self.bucket.blob(key)
+        blob.metadata = metadata
+        await retry_blocking(blob.upload_from_string, data, content_type=content_type, timeout=self.timeout)
+
+    async def make_public(self, key: str) -> None:
+        if self.http is not None:
+            await self.http.make_public(key)
+        else:
+            await retry_blocking(self.bucket.blob(key).make_public, timeout=self.timeout)
+
+    def public_url(self, key: str) -> str:
+        return self.bucket.blob(key).public_url
+
+    def sign_url(self, key, expiration, method="GET", content_type=None) -> str:
+        return self.bucket.blob(key).generate_signed_url(
+            version="v4", expiration=expiration, method=method, content_type=content_type
+        )
@@ -7,10 +7,13 @@ from starlette.middleware.sessions import SessionMiddleware
 
 from .config.settings import SESSION_SECRET_KEY, FRONTEND_BASE_URL
 from .core.lifespan import lifespan
+from .utils.auth import get_admin_user_id
+from .utils.metrics import collect_metrics
 
 from .api.routers import auth as auth_router
 from .api.routers import users
 from .api.routers import files, cooking, preparing, recipe, collection, instruction, voice_assistant
+from .api.routers import batch, sync
 
 
 
@@ -44,6 +47,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 
@@ -52,6 +56,12 @@ def health():
     return {"ok": True}
 
 
+@app.get("/metrics")
+def metrics(_admin_id: str = Depends(get_admin_user_id)):
+    """Runtime metrics of caches, pools and background jobs."""
+    return collect_metrics()
+
+
 # Include your existing routers under this api_router
 app.include_router(users.router)
 app.include_router(auth_router.api_router)
@@ -62,6 +72,8 @@ app.include_router(recipe.router)
 app.include_router(collection.router)
 app.include_router(instruction.router)
 app.include_router(voice_assistant.router)
+app.include_router(batch.router)
+app.include_router(sync.router)
 
 
 
@@ -7,6 +7,7 @@ from logging import getLogger
 from typing import Optional
 from fastapi import HTTPException
 import threading
+from collections import OrderedDict
 
 from ..agents.chat_agent.agent import ChatAgent
 from ..agents.instruction_agent.agent import InstructionAgent
@@ -18,12 +19,15 @@ from ..agents.image_analyzer_agent import ImageAnalyzerAgent
 from ..agents.recipe_agent import RecipeAgent
 from ..db.bucket_session import get_bucket_session, get_async_bucket_session
 from ..db.crud import recipe_crud, preparing_crud, cooking_crud, instruction_crud, collection_crud
-from ..db.crud.bucket_base_repo import get_file, upload_file, save_image_bytes
+from ..db.crud.bucket_base_repo import (
+    get_file, upload_file, save_image_bytes, fetch_direct_upload, verify_user_access,
+)
 from google.adk.sessions import InMemorySessionService
 from ..agents.utils import create_text_query, create_docs_query
 from ..db.database import get_async_db_context, get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from ..config import settings
 
 
 logger = getLogger(__name__)
@@ -38,13 +42,15 @@ class AgentService:
         self.image_agent = ImageAgent(self.app_name, self.session_service)
         self.chat_agent = ChatAgent(self.app_name, self.session_service)
         self.instruction_agent = InstructionAgent(self.app_name, self.session_service)
+        # Analyses of uploaded ingredient photos by key; uploaded keys are unique and never rewritten
+        self._image_analyses: "OrderedDict[str, str]" = OrderedDict()
 
-    async def analyze_ingredients(self, user_id: str, file: bytes) -> str:
+    async def analyze_ingredients(self, user_id: str, file: bytes, mime_type: str = "image/png") -> str:
         """
         Analyze the ingredients in the uploaded image file.
         """
 
-        query = create_docs_query("Analyze this image for food items.", [file])
+        query = create_docs_query("Analyze this image for food items.", [file], mime_type)
         response = await self.image_analyzer_agent.run(
             user_id=user_id,
             state={},
@@ -56,6 +62,30 @@ class AgentService:
             output = json.dumps(output)
         return output
 
+    async def analyze_ingredients_by_key(self, user_id: str, image_key: str) -> str:
+        """
+        Analyze the ingredients in a photo the client uploaded directly to the bucket (signed PUT).
+
+        The image never passes through the API on upload; it is fetched, checked and indexed here.
+        Repeated analyses of the same key (e.g. a later generate call) are answered from memory.
+        """
+        verify_user_access(image_key, user_id)
+        cached = self._image_analyses.get(image_key)
+        if cached is not None:
+            self._image_analyses.move_to_end(image_key)
+            return cached
+
+        async with get_async_bucket_session() as bs:
+            image, mime_type = await fetch_direct_upload(
+                bs, image_key, int(settings.IMAGE_ANALYSIS_MAX_MB * 1024 * 1024)
+            )
+        analysis = await self.analyze_ingredients(user_id, image, mime_type)
+
+        self._image_analyses[image_key] = analysis
+        while len(self._image_analyses) > settings.IMAGE_ANALYSIS_CACHE_ENTRIES:
+            self._image_analyses.popitem(last=False)
+        return analysis
+
     async def _generate_and_save_images_async(self, user_id, recipes, recipe_ids):
         """
         Internal async method that runs in a separate thread's event loop.
@@ -101,8 +131,15 @@ class AgentService:
         prompt: str,
         written_ingredients: str,
         preparing_session_id: Optional[int] = None,
-        background_tasks = None
+        background_tasks = None,
+        image_key: Optional[str] = None,
     ):
+        if image_key:
+            # Ingredients seen on the uploaded photo complement the written ones
+            analysis = await self.analyze_ingredients_by_key(user_id, image_key)
+            if analysis.strip().lower() != "none":
+                written_ingredients = f"{written_ingredients}, {analysis}" if written_ingredients else analysis
+
         previous_recipes = None
         if preparing_session_id is not None:
             async with get_async_db_context() as db:
@@ -310,9 +347,7 @@ class AgentService:
         if recipe is None:
             raise HTTPException(status_code=404, detail="Recipe not found for this cooking session")
 
-        prompt_history = await cooking_crud.get_prompt_history_by_cooking_session_id(db, cooking_session_id, user_id)
-        if prompt_history is None:
-            raise HTTPException(status_code=500, detail="Failed to retrieve prompt history for cooking session")
+        prompt_history = await cooking_crud.get_or_create_prompt_history(db, cooking_session)
 
         query = get_chat_agent_query(prompt, recipe, cooking_session, prompt_history)
 
@@ -0,0 +1,177 @@
+"""
+Server-rendered preview collages of collections.
+
+Instead of loading up to four recipe images per collection card, the library shows one WebP
+collage per collection. Its key is derived from the collection and its preview image keys,
+so a collage never changes once written and a changed membership or recipe image simply
+yields a new key. The collection overview (api/routers/collection.py) exposes the collage
+only while the stored collage_key matches the current preview images and otherwise schedules
+a re-render in the background; until it is done, clients fall back to the single images.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+from ..config import settings
+from ..db.bucket_session import get_async_bucket_session
+from ..db.crud import collection_crud
+from ..db.crud.bucket_base_repo import delete_object, get_file, write_object
+from ..db.database import get_async_db_context
+from ..db.storage_backends import run_blocking
+from ..utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+COLLAGE_CATEGORY = "collage"
+MAX_COLLAGE_IMAGES = 4
+_GAP_PX = 4
+_BACKGROUND = (255, 255, 255)
+
+
+def collage_key(owner_id: str, collection_id: int, image_keys: Sequence[str]) -> Optional[str]:
+    """Key of the collage of the given preview images, None without images."""
+    image_keys = list(image_keys)[:MAX_COLLAGE_IMAGES]
+    if not image_keys:
+        return None
+    digest = hashlib.sha256("\n".join(image_keys).encode()).hexdigest()[:16]
+    return f"users/{owner_id}/{COLLAGE_CATEGORY}/{collection_id}-{digest}.webp"
+
+
+def is_collage_key(key: str) -> bool:
+    """Whether a key names a collage (immutable, like content-addressed objects)."""
+    parts = key.split("/")
+    return len(parts) == 4 and parts[0] == "users" and parts[2] == COLLAGE_CATEGORY
+
+
+def _tiles(count: int, width: int, height: int) -> List[Tuple[int, int, int, int]]:
+    """(left, top, width, height) of the tiles, in the layouts of the frontend's CollectionImageCollage."""
+    half_w, half_h = (width - _GAP_PX) // 2, (height - _GAP_PX) // 2
+    right, bottom = half_w + _GAP_PX, half_h + _GAP_PX
+    if count == 1:
+        return [(0, 0, width, height)]
+    if count == 2:
+        return [(0, 0, half_w, height), (right, 0, width - right, height)]
+    if count == 3:
+        return [(0, 0, width, half_h), (0, bottom, half_w, height - bottom), (right, bottom, width - right, height - bottom)]
+    return [
+        (0, 0, half_w, half_h), (right, 0, width - right, half_h),
+        (0, bottom, half_w, height - bottom), (right, bottom, width - right, height - bottom),
+    ]
+
+
+def render_collage(images: Sequence[bytes], width: int, height: int, quality: int) -> bytes:
+    """Compose up to four images (cropped to fill their tiles) into one WebP."""
+    images = list(images)[:MAX_COLLAGE_IMAGES]
+    canvas = Image.new("RGB", (width, height), _BACKGROUND)
+    for data, (left, top, tile_w, tile_h) in zip(images, _tiles(len(images), width, height)):
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (tile_w, tile_h))  # JPEGs decode at reduced scale
+            tile = ImageOps.fit(image.convert("RGB"), (tile_w, tile_h), Image.Resampling.LANCZOS)
+        canvas.paste(tile, (left, top))
+    out = io.BytesIO()
+    canvas.save(out, "WEBP", quality=quality, method=4)
+    return out.getvalue()
+
+
+async def _single_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+class CollageService:
+    """Renders collages in background tasks, at most one per collection at a time."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._stats = {"scheduled": 0, "rendered": 0, "failed": 0, "seconds": 0.0}
+
+    def resolve(self, collection: Dict[str, Any]) -> Optional[str]:
+        """Key of the current collage of an overview entry; schedules a render if it is missing or stale."""
+        if not settings.COLLAGE_ENABLED:
+            return None
+        expected = collage_key(collection["owner_id"], collection["id"], collection["preview_image_urls"])
+        if expected is None or collection.get("collage_key") == expected:
+            return expected
+        self.schedule(collection["owner_id"], collection["id"], collection["preview_image_urls"])
+        return None
+
+    def schedule(self, owner_id: str, collection_id: int, image_keys: Sequence[str]) -> None:
+        if collection_id in self._tasks:
+            return  # the next overview read schedules the render of later changes
+        self._stats["scheduled"] += 1
+        task = asyncio.create_task(self.regenerate(owner_id, collection_id, image_keys))
+        self._tasks[collection_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(collection_id, None))
+
+    async def regenerate(self, owner_id: str, collection_id: int, image_keys: Sequence[str]) -> Optional[str]:
+        """Render and store the collage of the given preview images; returns its key.
+
+        Missing images are left out; any other failure is logged and retried on a later read.
+        """
+        image_keys = list(image_keys)[:MAX_COLLAGE_IMAGES]
+        key = collage_key(owner_id, collection_id, image_keys)
+        if key is None:
+            return None
+        started = time.perf_counter()
+        try:
+            async with get_async_bucket_session() as sess:
+                images = await asyncio.gather(*(self._fetch(sess, image_key) for image_key in image_keys))
+                images = [image for image in images if image is not None]
+                if not images:
+                    return None
+                data = await run_blocking(
+                    render_collage, images, settings.COLLAGE_WIDTH_PX, settings.COLLAGE_HEIGHT_PX,
+                    settings.COLLAGE_WEBP_QUALITY,
+                )
+                try:
+                    await write_object(sess, key, _single_chunk(data), "image/webp",
+                                       {"original_filename": f"collection-{collection_id}.webp"})
+                except HTTPException as e:
+                    if e.status_code != 412:  # 412: rendered meanwhile by another worker
+                        raise
+
+                async with get_async_db_context() as db:
+                    exists, previous = await collection_crud.set_collage_key(db, collection_id, key)
+                if not exists:  # deleted while rendering
+                    await delete_object(sess, key)
+                    return None
+                if previous and previous != key:
+                    await delete_object(sess, previous)
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error("Rendering the collage of collection %s failed: %s", collection_id, e)
+            return None
+        self._stats["rendered"] += 1
+        self._stats["seconds"] += time.perf_counter() - started
+        return key
+
+    async def discard(self, key: str) -> None:
+        """Delete the collage of a deleted collection."""
+        async with get_async_bucket_session() as sess:
+            await delete_object(sess, key)
+
+    @staticmethod
+    async def _fetch(sess, key: str) -> Optional[bytes]:
+        try:
+            return await get_file(sess, key)
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    def metrics(self) -> Dict[str, Any]:
+        rendered = self._stats["rendered"]
+        return {
+            **self._stats,
+            "in_progress": len(self._tasks),
+            "avg_seconds": round(self._stats["seconds"] / rendered, 3) if rendered else None,
+        }
+
+
+collage_service = CollageService()
+register_metrics("collages", collage_service.metrics)
@@ -0,0 +1,125 @@
+"""
+Tests for the server-rendered collection collages (src/services/collage_service.py).
+
+Run with `python -m pytest src/test/test_collage.py`.
+"""
+import asyncio
+import io
+import os
+from contextlib import asynccontextmanager
+
+os.environ.setdefault("SECRET_KEY", "collage-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "collage-tests")
+
+from PIL import Image
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import settings
+from src.db.bucket_session import BucketSession
+from src.db.database import Base
+from src.db.local_storage import LocalBackend
+from src.db.models.db_recipe import Collection
+from src.db.models.db_user import User
+from src.services.collage_service import CollageService, collage_key, is_collage_key, render_collage
+
+RED, BLUE, GREEN = (255, 0, 0), (0, 0, 255), (0, 255, 0)
+
+
+def _png(color, size=(64, 48)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "PNG")
+    return out.getvalue()
+
+
+def _decode(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    assert image.format == "WEBP"
+    return image.convert("RGB")
+
+
+def _close_to(pixel, color) -> bool:
+    return all(abs(a - b) < 40 for a, b in zip(pixel, color))
+
+
+def test_render_collage_layouts():
+    two = _decode(render_collage([_png(RED), _png(BLUE)], 200, 100, 80))
+    assert two.size == (200, 100)
+    assert _close_to(two.getpixel((20, 50)), RED) and _close_to(two.getpixel((180, 50)), BLUE)
+
+    three = _decode(render_collage([_png(RED), _png(BLUE), _png(GREEN)], 200, 100, 80))
+    assert _close_to(three.getpixel((180, 20)), RED)  # first image spans the top row
+    assert _close_to(three.getpixel((20, 80)), BLUE) and _close_to(three.getpixel((180, 80)), GREEN)
+
+    five = _decode(render_collage([_png(RED)] * 3 + [_png(BLUE)] * 2, 200, 100, 80))
+    assert _close_to(five.getpixel((180, 80)), BLUE)  # the fifth image is left out
+
+
+def test_collage_keys_follow_the_preview_images():
+    key = collage_key("u1", 7, ["users/u1/image/a.png", "users/u1/image/b.png"])
+    assert key.startswith("users/u1/collage/7-") and key.endswith(".webp") and is_collage_key(key)
+    assert key == collage_key("u1", 7, ["users/u1/image/a.png", "users/u1/image/b.png"])
+    assert key != collage_key("u1", 7, ["users/u1/image/b.png", "users/u1/image/a.png"])
+    assert collage_key("u1", 7, []) is None
+    assert not is_collage_key("users/u1/image/a.png")
+
+
+def test_regenerate_stores_the_collage_and_replaces_the_previous_one(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/collage.db", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    backend = LocalBackend(str(tmp_path / "storage"), "http://testserver", "local-signing-key")
+    sess = BucketSession(backend=backend, timeout=10)
+
+    @asynccontextmanager
+    async def db_context():
+        async with sessions() as db:
+            yield db
+            await db.commit()
+
+    @asynccontextmanager
+    async def bucket_session():
+        yield sess
+
+    monkeypatch.setattr("src.services.collage_service.get_async_db_context", db_context)
+    monkeypatch.setattr("src.services.collage_service.get_async_bucket_session", bucket_session)
+    monkeypatch.setattr(settings, "COLLAGE_ENABLED", True)
+    service = CollageService()
+
+    async def scenario():
+        await backend.start()
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            await db.execute(insert(User).values(id="u1", username="u1", email="u1@example.com", hashed_password="x"))
+            await db.execute(insert(Collection).values(id=7, owner_id="u1", name="Dinner"))
+            await db.commit()
+        images = {"users/u1/image/red.png": _png(RED), "users/u1/image/blue.png": _png(BLUE)}
+        for image_key, data in images.items():
+            await backend.upload(image_key, data, "image/png", {})
+
+        first = await service.regenerate("u1", 7, ["users/u1/image/red.png", "users/u1/image/missing.png"])
+        assert _close_to(_decode(await backend.download(first)).getpixel((10, 10)), RED)
+        second = await service.regenerate("u1", 7, list(images))
+        assert second != first and await backend.stat(first) is None
+
+        async with sessions() as db:
+            collection = (await db.execute(select(Collection).filter(Collection.id == 7))).scalar_one()
+        assert collection.collage_key == second and collection.version == 3
+
+        entry = {"id": 7, "owner_id": "u1", "collage_key": second, "preview_image_urls": list(images)}
+        assert service.resolve(entry) == second
+        assert service.resolve({**entry, "preview_image_urls": ["users/u1/image/blue.png"]}) is None
+        assert service.metrics()["in_progress"] == 1  # stale: re-rendered in the background
+        await asyncio.gather(*service._tasks.values())
+
+        # The collection is deleted while its collage renders: the new collage is removed again
+        async with sessions() as db:
+            await db.execute(Collection.__table__.delete())
+            await db.commit()
+        orphan = await service.regenerate("u1", 7, ["users/u1/image/red.png"])
+        assert orphan is None and await backend.stat(collage_key("u1", 7, ["users/u1/image/red.png"])) is None
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+    assert service.metrics()["rendered"] == 3
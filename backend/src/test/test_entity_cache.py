@@ -0,0 +1,123 @@
+"""
+Tests for reads through the entity cache (src/db/entity_cache.py) and the recipe versions it checks.
+
+A write of another worker only reaches this worker's local tier through the database version,
+which the CRUD readers check on every read. Run with `python -m pytest src/test/test_entity_cache.py`.
+"""
+import asyncio
+import os
+
+os.environ.setdefault("SECRET_KEY", "entity-cache-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "entity-cache-tests")
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.db.crud import collection_crud, recipe_crud, search_crud
+from src.db.database import Base
+from src.db.entity_cache import EntityCache, entity_cache
+from src.db.models.db_recipe import Collection, CollectionRecipe, Recipe
+from src.db.models.db_user import User
+
+
+def test_reads_see_writes_of_other_workers(tmp_path):
+    assert entity_cache.enabled and entity_cache.shared is None
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/entities.db", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            await db.execute(insert(User).values(id="u1", username="u1", email="u1@example.com", hashed_password="x"))
+            await db.execute(insert(Recipe).values(id=1, user_id="u1", title="Soup", description="d", prompt="p",
+                                                  is_permanent=True))
+            await db.execute(insert(Collection).values(id=1, owner_id="u1", name="Dinner"))
+            await db.commit()
+
+            assert (await recipe_crud.get_recipe_aggregate(db, 1))["image_url"] is None
+            assert (await collection_crud.get_collection_overview(db, "u1"))[0]["recipe_count"] == 0
+
+            # Another worker stores the image and adds the recipe, without invalidating this worker
+            await db.execute(update(Recipe).where(Recipe.id == 1).values(image_url="users/u1/image/a.png",
+                                                                         version=Recipe.version + 1))
+            await db.execute(insert(CollectionRecipe).values(collection_id=1, recipe_id=1))
+            await db.execute(update(Collection).where(Collection.id == 1).values(version=Collection.version + 1))
+            await db.commit()
+
+            assert (await recipe_crud.get_recipe_aggregate(db, 1))["image_url"] == "users/u1/image/a.png"
+            overview = await collection_crud.get_collection_overview(db, "u1")
+            assert overview[0]["preview_image_urls"] == ["users/u1/image/a.png"]
+            assert await recipe_crud.get_recipe_aggregate(db, 2) is None
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+
+
+def test_updated_recipe_carries_its_new_version(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/entities.db", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await search_crud.create_search_index(conn)
+        async with sessions() as db:
+            await db.execute(insert(User).values(id="u1", username="u1", email="u1@example.com", hashed_password="x"))
+            await db.execute(insert(Recipe).values(id=1, user_id="u1", title="Soup", description="d", prompt="p"))
+            await db.commit()
+
+            recipe = await recipe_crud.update_recipe(db, 1, title="Stew")
+            assert recipe.version == 2 and recipe.version == (await recipe_crud.get_recipe_version(db, 1)).version
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+
+
+class _SharedTier:
+    """In-memory stand-in for the Redis tier."""
+
+    def __init__(self):
+        self.versions, self.entries = {}, {}
+
+    async def get_version(self, key):
+        return self.versions.get(key, 0)
+
+    async def bump_version(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return self.versions[key]
+
+    async def get(self, key, version):
+        return (key, version) in self.entries, self.entries.get((key, version))
+
+    async def set(self, key, version, value):
+        self.entries[(key, version)] = value
+
+
+def test_reads_with_a_shared_tier_skip_the_database(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/entities.db", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(recipe_crud, "entity_cache", EntityCache(shared=_SharedTier()))
+    monkeypatch.setattr(collection_crud, "entity_cache", recipe_crud.entity_cache)
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            await db.execute(insert(User).values(id="u1", username="u1", email="u1@example.com", hashed_password="x"))
+            await db.execute(insert(Recipe).values(id=1, user_id="u1", title="Soup", description="d", prompt="p"))
+            await db.execute(insert(Collection).values(id=1, owner_id="u1", name="Dinner"))
+            await db.commit()
+            await recipe_crud.get_recipe_aggregate(db, 1)
+            await collection_crud.get_collection_overview(db, "u1")
+
+            statements.clear()
+            assert (await recipe_crud.get_recipe_aggregate(db, 1))["title"] == "Soup"
+            assert (await collection_crud.get_collection_overview(db, "u1"))[0]["name"] == "Dinner"
+            assert statements == []
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
@@ -0,0 +1,24 @@
+"""
+Tests for the canonicalization of ingredient names (src/db/crud/ingredient_index_crud.py).
+
+Run with `python -m pytest src/test/test_ingredient_index.py`.
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "ingredient-index-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "ingredient-index-tests")
+
+from src.db.crud.ingredient_index_crud import canonicalize_ingredient, canonicalize_ingredient_list
+
+
+def test_canonicalize_ingredient():
+    assert canonicalize_ingredient("2 Fresh Tomatoes (diced)") == "tomato"
+    assert canonicalize_ingredient("Crème Fraîche") == "creme fraiche"
+    assert canonicalize_ingredient("1 cup") is None
+
+
+def test_ingredient_lists_split_on_separators_in_any_case():
+    assert canonicalize_ingredient_list(["Salt AND Pepper", "Salt And pepper"]) == set()
+    assert canonicalize_ingredient_list(["Tomatoes And Basil; onions\ngarlic, Rice"]) == {
+        "tomato", "basil", "onion", "garlic", "rice",
+    }
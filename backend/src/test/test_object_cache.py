@@ -0,0 +1,93 @@
+"""
+Tests for the node-local object byte cache (src/db/object_cache.py).
+
+Run with `python -m pytest src/test/test_object_cache.py`.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+os.environ.setdefault("SECRET_KEY", "object-cache-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "object-cache-tests")
+
+from src.db.object_cache import ObjectCache
+from src.db.storage_backends import ObjectInfo
+
+KB = 1024
+
+
+def _info(name: str, size: int, content_type: str = "image/png", generation: int = 1) -> ObjectInfo:
+    return ObjectInfo(name, size, content_type, generation, None, {})
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    cache = ObjectCache(memory_bytes=64 * KB, max_object_bytes=64 * KB)
+
+    async def scenario():
+        for index in range(20):
+            await cache.put(_info(f"img/{index}.png", 4 * KB), bytes([index]) * 4 * KB)
+        assert cache.memory.bytes <= 64 * KB
+        assert await cache.get(_info("img/0.png", 4 * KB), 0, 10) is None  # evicted (LRU)
+        assert await cache.get(_info("img/19.png", 4 * KB), 2, 5) == bytes([19]) * 4
+
+    asyncio.run(scenario())
+    metrics = cache.metrics()
+    assert metrics["memory_hits"] == 1 and metrics["misses"] == 1 and metrics["hit_ratio"] == 0.5
+    assert metrics["memory"]["evictions"] == 4
+
+
+def test_admission_keeps_documents_and_large_objects_out():
+    cache = ObjectCache(memory_bytes=64 * KB, max_object_bytes=16 * KB)
+    image = _info("img/a.png", 4 * KB)
+
+    async def scenario():
+        await cache.put(image, b"i" * 4 * KB)
+        await cache.put(_info("doc/a.pdf", 4 * KB, "application/pdf"), b"p" * 4 * KB)
+        await cache.put(_info("img/huge.png", 32 * KB), b"h" * 32 * KB)
+        assert await cache.get(image, 0, 3) == b"iiii"
+
+    asyncio.run(scenario())
+    assert len(cache.memory) == 1
+    assert cache.metrics()["rejected"] == 2
+
+
+def test_disk_tier_serves_ranges_and_respects_generations(tmp_path):
+    cache = ObjectCache(memory_bytes=16 * KB, disk_dir=str(tmp_path), disk_bytes=64 * KB, max_object_bytes=32 * KB)
+    data = os.urandom(8 * KB)  # too large for the memory tier (16 KB / 16), disk only
+    info = _info("img/b.png", len(data), generation=7)
+
+    async def scenario():
+        await cache.put(info, data)
+        assert len(cache.memory) == 0 and len(cache.disk) == 1
+        assert await cache.get(info, 100, 199) == data[100:200]
+        assert await cache.get(_info("img/b.png", len(data), generation=8), 0, 9) is None
+
+        cache.invalidate("img/b.png")
+        assert await cache.get(info, 0, 9) is None
+        assert os.listdir(cache.disk.root) == []
+
+    asyncio.run(scenario())
+    assert cache.metrics()["disk_hits"] == 1
+
+
+def test_disk_tier_removes_directories_of_exited_processes(tmp_path):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    for pid in (exited.pid, os.getppid()):
+        os.makedirs(tmp_path / str(pid))
+        (tmp_path / str(pid) / "object").write_bytes(b"x")
+
+    cache = ObjectCache(memory_bytes=16 * KB, disk_dir=str(tmp_path), disk_bytes=64 * KB, max_object_bytes=32 * KB)
+    assert sorted(os.listdir(tmp_path)) == sorted([str(os.getpid()), str(os.getppid())])
+    assert os.listdir(cache.disk.root) == []
+
+
+def test_metadata_cache_expires(monkeypatch):
+    cache = ObjectCache(info_ttl_seconds=60)
+    info = _info("img/c.png", KB)
+    cache.put_info(info)
+    assert cache.get_info("img/c.png") is info
+
+    monkeypatch.setattr("src.db.object_cache.time.monotonic", lambda: 1e12)
+    assert cache.get_info("img/c.png") is None
@@ -0,0 +1,34 @@
+"""
+Tests for the read replica engine (src/db/database.py).
+
+Run with `python -m pytest src/test/test_replica_routing.py`.
+"""
+import asyncio
+import os
+
+os.environ.setdefault("SECRET_KEY", "replica-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "replica-tests")
+
+from src.config import settings
+from src.db import database
+
+
+def test_unreachable_replica_falls_back_to_the_primary(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    monkeypatch.setattr(settings, "DB_REPLICA_RETRY_SECONDS", 60)
+    monkeypatch.setattr(database, "replica_engine", None)
+    monkeypatch.setattr(database, "_replica_initialized", False)
+    monkeypatch.setattr(database, "_replica_retry_at", 0.0)
+    failures = database._routing_stats["replica_failures"]
+
+    assert asyncio.run(database.get_replica_engine()) is None
+    assert database._routing_stats["replica_failures"] == failures + 1
+    assert asyncio.run(database.get_replica_engine()) is None  # no new attempt within the backoff
+    assert database._routing_stats["replica_failures"] == failures + 1
+
+    # The replica is back once the backoff has passed
+    (tmp_path / "missing").mkdir()
+    database._replica_retry_at = 0.0
+    replica = asyncio.run(database.get_replica_engine())
+    assert replica is not None and database._replica_initialized
+    asyncio.run(replica.dispose())
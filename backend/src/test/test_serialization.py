@@ -0,0 +1,180 @@
+"""
+Parity tests and micro-benchmarks for the fast serialization path (src/api/serializers.py).
+
+The parity tests always run and check that the fast path produces the same JSON as the
+regular path (pydantic schemas, response_model validation, stdlib json).
+
+The benchmarks compare both paths on 1k and 10k recipe payloads. They run when
+RUN_BENCHMARKS=1 is set, or directly with `python -m src.test.test_serialization`.
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "serialization-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "serialization-tests")
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from src.api import serializers
+from src.api.schemas.recipe import Ingredient, Instruction, Recipe as RecipeSchema, RecipePreview
+from src.db.models.db_recipe import InstructionStep, Recipe, RecipeIngredient
+
+BENCHMARK_SIZES = (1_000, 10_000)
+INGREDIENTS_PER_RECIPE = 10
+STEPS_PER_RECIPE = 8
+
+_RECIPE_LIST = TypeAdapter(List[RecipeSchema])
+_PREVIEW_LIST = TypeAdapter(List[RecipePreview])
+
+
+def _make_recipes(count: int) -> List[Recipe]:
+    """Build transient ORM recipes with ingredients and instruction steps."""
+    created_at = datetime(2025, 1, 1, 12, 0, 0)
+    recipes = []
+    for recipe_id in range(1, count + 1):
+        recipe = Recipe(
+            id=recipe_id,
+            user_id="user-1",
+            title=f"Recipe {recipe_id}",
+            description="A quick weeknight dinner with crispy edges and a creamy sauce.",
+            prompt="something with tomatoes",
+            important_notes=None if recipe_id % 3 == 0 else "Let the dough rest.",
+            cooking_overview="Prepare, cook, serve.",
+            image_url=f"users/user-1/image/{recipe_id}.webp",
+            total_time_minutes=30 + recipe_id % 60,
+            difficulty=("easy", "medium", "hard")[recipe_id % 3],
+            food_category="vegetarian",
+            suggested_collection="Dinner" if recipe_id % 2 else None,
+            created_at=created_at - timedelta(minutes=recipe_id, microseconds=recipe_id),
+        )
+        recipe.ingredients = [
+            RecipeIngredient(id=recipe_id * 100 + index, name=f"Ingredient {index}",
+                             quantity=None if index == 0 else index * 50, unit="g")
+            for index in range(INGREDIENTS_PER_RECIPE)
+        ]
+        recipe.instruction_steps = [
+            InstructionStep(id=recipe_id * 100 + index, step_number=index, heading=f"Step {index}",
+                            description="Stir gently until everything is combined.",
+                            animation="stirring.json", timer=None if index % 2 else 120)
+            for index in range(STEPS_PER_RECIPE)
+        ]
+        recipes.append(recipe)
+    return recipes
+
+
+def _regular_recipe(recipe: Recipe) -> RecipeSchema:
+    """The schema construction of the regular path (as in the recipe router before the fast path)."""
+    return RecipeSchema(
+        id=recipe.id,
+        title=recipe.title,
+        description=recipe.description,
+        prompt=recipe.prompt,
+        ingredients=[
+            Ingredient(id=ingredient.id, name=ingredient.name, quantity=ingredient.quantity, unit=ingredient.unit)
+            for ingredient in recipe.ingredients
+        ],
+        instructions=[
+            Instruction(id=step.id, heading=step.heading, description=step.description,
+                        animation=step.animation, timer=step.timer)
+            for step in recipe.instruction_steps
+        ],
+        image_url=recipe.image_url,
+        total_time_minutes=recipe.total_time_minutes,
+        difficulty=recipe.difficulty,
+        food_category=recipe.food_category,
+        important_notes=recipe.important_notes or serializers.DEFAULT_IMPORTANT_NOTES,
+        cooking_overview=recipe.cooking_overview or serializers.DEFAULT_COOKING_OVERVIEW,
+    )
+
+
+def regular_path(recipes: List[Recipe]) -> bytes:
+    """Schemas per row, response_model validation and serialization, stdlib json encoding."""
+    models = [_regular_recipe(recipe) for recipe in recipes]
+    validated = _RECIPE_LIST.validate_python(models)
+    return json.dumps(_RECIPE_LIST.dump_python(validated, mode="json"), ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(recipes: List[Recipe]) -> bytes:
+    """Direct projection to dicts, encoded by ORJSONResponse."""
+    return ORJSONResponse(serializers.recipes_payload(recipes)).body
+
+
+def regular_preview_path(recipes: List[Recipe]) -> bytes:
+    models = [RecipePreview.model_validate(recipe) for recipe in recipes]
+    validated = _PREVIEW_LIST.validate_python(models)
+    return json.dumps(_PREVIEW_LIST.dump_python(validated, mode="json"), ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def fast_preview_path(recipes: List[Recipe]) -> bytes:
+    return ORJSONResponse([serializers.recipe_preview_payload(recipe) for recipe in recipes]).body
+
+
+def test_recipe_fast_path_matches_regular_path():
+    recipes = _make_recipes(25)
+    assert orjson.loads(fast_path(recipes)) == json.loads(regular_path(recipes))
+
+
+def test_recipe_preview_fast_path_matches_regular_path():
+    recipes = _make_recipes(25)
+    assert orjson.loads(fast_preview_path(recipes)) == json.loads(regular_preview_path(recipes))
+
+
+def test_recipe_aggregate_payload_matches_regular_path():
+    from src.db.crud.recipe_crud import _recipe_to_aggregate
+
+    recipes = _make_recipes(5)
+    payload = [serializers.recipe_aggregate_payload(_recipe_to_aggregate(recipe)) for recipe in recipes]
+    assert orjson.loads(orjson.dumps(payload)) == json.loads(regular_path(recipes))
+
+
+def _best_of(function, recipes, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(recipes)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run_benchmarks(sizes=BENCHMARK_SIZES) -> List[dict]:
+    """Time the regular and the fast path on payloads of the given sizes."""
+    results = []
+    for size in sizes:
+        recipes = _make_recipes(size)
+        for name, regular, fast in (
+            ("recipe", regular_path, fast_path),
+            ("preview", regular_preview_path, fast_preview_path),
+        ):
+            regular_seconds = _best_of(regular, recipes)
+            fast_seconds = _best_of(fast, recipes)
+            results.append({
+                "payload": name,
+                "recipes": size,
+                "regular_ms": round(regular_seconds * 1000, 1),
+                "fast_ms": round(fast_seconds * 1000, 1),
+                "speedup": round(regular_seconds / fast_seconds, 1),
+            })
+    return results
+
+
+@pytest.mark.skipif(os.getenv("RUN_BENCHMARKS") != "1", reason="set RUN_BENCHMARKS=1 to run benchmarks")
+@pytest.mark.parametrize("size", BENCHMARK_SIZES)
+def test_benchmark_fast_path_is_faster(size):
+    for result in run_benchmarks([size]):
+        print(result)
+        assert result["fast_ms"] < result["regular_ms"], result
+
+
+if __name__ == "__main__":
+    for row in run_benchmarks():
+        print(f"{row['payload']:>8} x {row['recipes']:>6}: regular {row['regular_ms']:>8} ms, "
+              f"fast {row['fast_ms']:>8} ms, speedup {row['speedup']}x")
@@ -0,0 +1,607 @@
+"""
+Contract tests and benchmark for the storage backends of bucket_base_repo.
+
+The GCS backend runs against a minimal fake of the GCS JSON API served on localhost, both with
+the synchronous google-cloud-storage client in threads (the default path) and with the native
+async client (src/db/gcs_async.py, GCS_NATIVE_ASYNC). The local backend (src/db/local_storage.py)
+runs in a temporary directory. The contract tests always run and check that all of them give
+the same results.
+
+The benchmark compares the throughput of concurrent downloads on all of them. It runs when
+RUN_BENCHMARKS=1 is set, or directly with `python -m src.test.test_storage_clients`.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "storage-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "storage-tests")
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from google.api_core import exceptions as gapi_exc
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.api.routers import files
+from src.config import settings
+from src.core import sweeper
+from src.db.bucket_session import BucketSession, get_bucket_session
+from src.db.crud import bucket_base_repo as repo
+from src.db.database import Base, get_db
+from src.db.file_index import FileIndex
+from src.db.gcs_async import AsyncGcsClient
+from src.db.local_storage import LocalBackend
+from src.db.models.db_recipe import Recipe
+from src.db.models.db_user import User
+from src.db.signed_url_cache import SignedUrlCache
+from src.db.storage_backends import GcsBackend
+from src.utils.auth import get_read_only_user_id, get_read_write_user_id
+
+BUCKET = "test-bucket"
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+BENCHMARK_OBJECTS = 200
+BENCHMARK_OBJECT_BYTES = 64 * 1024
+BENCHMARK_CONCURRENCY = (8, 16, 32)
+BENCHMARK_LATENCY_SECONDS = 0.02  # simulated round trip to GCS
+
+
+class FakeGcs:
+    """In-memory objects and resumable sessions behind the fake server."""
+
+    def __init__(self):
+        self.objects: Dict[str, dict] = {}
+        self.latency = 0.0
+        self.reads = 0
+        self.sessions: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self._generations = itertools.count(1000)
+        self._session_ids = itertools.count(1)
+
+    def put(self, name: str, data: bytes, content_type: str, metadata=None) -> dict:
+        with self.lock:
+            resource = {
+                "kind": "storage#object",
+                "bucket": BUCKET,
+                "name": name,
+                "size": str(len(data)),
+                "contentType": content_type,
+                "generation": str(next(self._generations)),
+                "metageneration": "1",
+                "updated": "2025-01-01T12:00:00.000Z",
+                "metadata": metadata or {},
+            }
+            self.objects[name] = {"resource": resource, "data": data}
+            return resource
+
+
+def _make_handler(fake: FakeGcs):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):  # keep test output quiet
+            pass
+
+        def _reply(self, status: int, body: bytes = b"", headers=None, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, payload: dict, headers=None):
+            self._reply(status, json.dumps(payload).encode(), headers)
+
+        def _error(self, status: int, message: str):
+            self._json(status, {"error": {"code": status, "message": message}})
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _route(self) -> Tuple[str, Dict[str, List[str]]]:
+            url = urlparse(self.path)
+            return url.path, parse_qs(url.query)
+
+        def _object(self, path: str):
+            match = re.fullmatch(r"(?:/download)?/storage/v1/b/[^/]+/o/(.+)", path)
+            return unquote(match.group(1)) if match else None
+
+        def do_GET(self):
+            path, query = self._route()
+            fake.reads += 1
+            time.sleep(fake.latency)
+            if re.fullmatch(r"/storage/v1/b/[^/]+/o", path):
+                prefix = query.get("prefix", [""])[0]
+                items = [entry["resource"] for name, entry in sorted(fake.objects.items()) if name.startswith(prefix)]
+                return self._json(200, {"kind": "storage#objects", "items": items[:int(query.get("maxResults", ["1000"])[0])]})
+            name = self._object(path)
+            entry = fake.objects.get(name)
+            if entry is None:
+                return self._error(404, "No such object")
+            if query.get("alt") != ["media"]:
+                return self._json(200, entry["resource"])
+            match = query.get("ifGenerationMatch")
+            if match and match[0] != entry["resource"]["generation"]:
+                return self._error(412, "Precondition failed")
+            data = entry["data"]
+            byte_range = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            headers = {"x-goog-generation": entry["resource"]["generation"]}
+            if byte_range:
+                start = int(byte_range.group(1))
+                end = int(byte_range.group(2)) if byte_range.group(2) else len(data) - 1
+                headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+                return self._reply(206, data[start:end + 1], headers, entry["resource"]["contentType"])
+            return self._reply(200, data, headers, entry["resource"]["contentType"])
+
+        def do_DELETE(self):
+            path, _ = self._route()
+            if path.startswith("/upload/session/"):
+                fake.sessions.pop(path.rsplit("/", 1)[1], None)
+                return self._reply(499)
+            name = self._object(path)
+            if fake.objects.pop(name, None) is None:
+                return self._error(404, "No such object")
+            self._reply(204)
+
+        def do_PATCH(self):
+            path, _ = self._route()
+            self._body()
+            entry = fake.objects.get(self._object(path))
+            if entry is None:
+                return self._error(404, "No such object")
+            self._json(200, entry["resource"])
+
+        def do_POST(self):
+            path, query = self._route()
+            body = self._body()
+            upload_type = query.get("uploadType", [""])[0]
+            if upload_type == "resumable":
+                metadata = json.loads(body or b"{}")
+                session_id = str(next(fake._session_ids))
+                fake.sessions[session_id] = {
+                    "name": metadata.get("name") or query.get("name", [""])[0],
+                    "content_type": metadata.get("contentType") or self.headers.get("X-Upload-Content-Type"),
+                    "metadata": metadata.get("metadata"),
+                    "data": bytearray(),
+                }
+                host = self.headers["Host"]
+                return self._reply(200, headers={"Location": f"http://{host}/upload/session/{session_id}"})
+            if upload_type == "multipart":
+                message = BytesParser().parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+                )
+                meta_part, data_part = message.get_payload()
+                metadata = json.loads(meta_part.get_payload(decode=True))
+                resource = fake.put(metadata["name"], data_part.get_payload(decode=True),
+                                    data_part.get_content_type(), metadata.get("metadata"))
+                return self._json(200, resource)
+            self._error(400, "Unsupported upload")
+
+        def do_PUT(self):
+            path, _ = self._route()
+            body = self._body()
+            session = fake.sessions.get(path.rsplit("/", 1)[1])
+            if session is None:
+                return self._error(404, "No such upload")
+            content_range = re.fullmatch(r"bytes (\*|(\d+)-(\d+))/(\*|\d+)", self.headers.get("Content-Range", ""))
+            if content_range.group(2) is not None:
+                if int(content_range.group(2)) != len(session["data"]):
+                    return self._error(400, "Invalid offset")
+                session["data"] += body
+            total = content_range.group(4)
+            if total != "*" and int(total) == len(session["data"]):
+                resource = fake.put(session["name"], bytes(session["data"]), session["content_type"], session["metadata"])
+                return self._json(200, resource)
+            headers = {"Range": f"bytes=0-{len(session['data']) - 1}"} if session["data"] else {}
+            self._reply(308, headers=headers)
+
+    return Handler
+
+
+@pytest.fixture(scope="module")
+def fake_gcs():
+    fake = FakeGcs()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(fake))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+
+
+def _threaded_session(endpoint: str, native: bool = False, max_concurrency: int = 64) -> BucketSession:
+    client = storage.Client(project="test", credentials=AnonymousCredentials(),
+                            client_options={"api_endpoint": endpoint})
+    http = None
+    if native:
+        http = AsyncGcsClient(BUCKET, endpoint=endpoint, max_concurrency=max_concurrency, initial_backoff=0.01)
+    return BucketSession(backend=GcsBackend(client, client.bucket(BUCKET), 10, http), timeout=10)
+
+
+def _native_session(endpoint: str, max_concurrency: int = 64) -> BucketSession:
+    return _threaded_session(endpoint, native=True, max_concurrency=max_concurrency)
+
+
+async def _local_session(root) -> BucketSession:
+    backend = LocalBackend(str(root), "http://testserver", "local-signing-key")
+    await backend.start()
+    return BucketSession(backend=backend, timeout=10)
+
+
+@pytest.mark.parametrize("backend", ["threaded", "native", "local"])
+def test_storage_contract(fake_gcs, tmp_path, backend):
+    async def scenario():
+        if backend == "local":
+            sess = await _local_session(tmp_path)
+        else:
+            sess = _threaded_session(fake_gcs.endpoint, native=backend == "native")
+        await sess.backend.upload("users/u1/image/a.png", PNG, "image/png",
+                                  {"original_filename": "a.png", "category": "image"})
+        info = await repo.get_file_info(sess, "users/u1/image/a.png")
+        assert (info["size"], info["content_type"], info["original_filename"]) == (len(PNG), "image/png", "a.png")
+
+        assert await repo.get_file(sess, "users/u1/image/a.png") == PNG
+        object_info = await repo.get_object_info(sess, "users/u1/image/a.png")
+        streamed = [chunk async for chunk in repo.stream_file(sess, object_info, 10, 2000, chunk_size=512)]
+        assert b"".join(streamed) == PNG[10:2001] and len(streamed) == 4
+
+        with pytest.raises(HTTPException) as missing:
+            await repo.get_file(sess, "users/u1/image/missing.png")
+        assert missing.value.status_code == 404
+        assert (await repo.file_exists(sess, "users/u1/image/missing.png"))["exists"] is False
+
+        saved = await repo.save_image_bytes(sess, "u1", "image", PNG, "saved.png")
+
+        async def chunks():
+            for start in range(0, len(PNG), 3000):
+                yield PNG[start:start + 3000]
+
+        streamed_upload = await repo.upload_stream(sess, "u1", "image", chunks(), "streamed.png", "image/png")
+        assert await repo.get_file(sess, streamed_upload["key"]) == PNG
+        assert {item["key"] for item in await repo.list_files(sess, "u1", "image")} >= {saved["key"], streamed_upload["key"]}
+
+        assert await repo.delete_object(sess, saved["key"]) is True
+        assert await repo.delete_object(sess, saved["key"]) is False
+        await sess.backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_local_backend_signed_urls(tmp_path):
+    sess = asyncio.run(_local_session(tmp_path))
+    app = FastAPI()
+    app.include_router(files.router)
+    app.dependency_overrides[get_bucket_session] = lambda: sess
+    app.dependency_overrides[get_read_only_user_id] = lambda: "u1"
+    app.dependency_overrides[get_read_write_user_id] = lambda: "u1"
+    client = TestClient(app)
+
+    upload = client.post("/files/signed-put", params={
+        "user_id": "u1", "category": "image", "filename": "p.png", "content_type": "image/png",
+    }).json()
+    put_url = upload["signed_url"].removeprefix("http://testserver")
+    assert client.post("/files/signed-put", params={
+        "user_id": "u2", "category": "image", "filename": "p.png", "content_type": "image/png",
+    }).status_code == 403
+    assert client.put(put_url, content=PNG, headers={**upload["required_headers"], "Content-Type": "image/jpeg"}).status_code == 403
+    assert client.put(put_url, content=PNG, headers=upload["required_headers"]).status_code == 200
+    assert client.put(put_url, content=PNG, headers=upload["required_headers"]).status_code == 412
+    assert client.get(f"/files/info/{upload['key']}").json()["original_filename"] == "p.png"
+
+    too_long = client.post("/files/signed-urls", json={"keys": [upload["key"]], "minutes": 10**10})
+    assert too_long.status_code == 422
+
+    get_url = asyncio.run(SignedUrlCache(10).sign(sess, upload["key"], 5)).removeprefix("http://testserver")
+    response = client.get(get_url)
+    assert response.status_code == 200 and response.content == PNG
+    assert response.headers["content-type"] == "image/png"
+    partial = client.get(get_url, headers={"Range": "bytes=100-199"})
+    assert partial.status_code == 206 and partial.content == PNG[100:200]
+    assert client.get(get_url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get(get_url.replace("signature=", "signature=0")).status_code == 403
+    assert client.get(f"/files/local/{upload['key']}").status_code == 403
+    assert client.get(f"/files/serve/{upload['key']}").content == PNG
+
+    client.post("/files/public-url", params={"key": upload["key"]})
+    assert client.get(f"/files/local/{upload['key']}").content == PNG
+
+
+def test_local_backend_create_race_keeps_the_winners_metadata(tmp_path, monkeypatch):
+    backend = LocalBackend(str(tmp_path), "http://testserver", "local-signing-key")
+    asyncio.run(backend.start())
+    asyncio.run(backend.upload("users/u1/image/a.png", PNG, "image/png", {"original_filename": "winner.png"}))
+
+    loser = backend._tmp_path()
+    with open(loser, "wb") as f:
+        f.write(b"loser")
+    with monkeypatch.context() as m:
+        m.setattr("src.db.local_storage.os.path.exists", lambda path: False)  # lost between check and link
+        with pytest.raises(gapi_exc.PreconditionFailed):
+            backend._publish(loser, "users/u1/image/a.png", {"content_type": "text/plain",
+                                                             "metadata": {"original_filename": "loser.txt"}}, False)
+    info = asyncio.run(backend.stat("users/u1/image/a.png"))
+    assert info.content_type == "image/png" and info.metadata == {"original_filename": "winner.png"}
+
+
+def _file_index_db(tmp_path, monkeypatch):
+    """SQLite database behind the file index; returns the engine and a get_db replacement."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/files.db", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    @asynccontextmanager
+    async def db_context():
+        async with sessions() as db:
+            yield db
+            await db.commit()
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    monkeypatch.setattr("src.db.file_index.get_async_db_context", db_context)
+    monkeypatch.setattr("src.core.sweeper.get_async_db_context", db_context)
+    return engine, get_test_db
+
+
+def test_file_index_tracks_uploads_and_deletes(tmp_path, monkeypatch):
+    engine, get_test_db = _file_index_db(tmp_path, monkeypatch)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sess = await _local_session(tmp_path / "storage")
+        sess.index = FileIndex()
+        keys = [(await repo.save_image_bytes(sess, "u1", "image", PNG, f"{index}.png"))["key"] for index in range(3)]
+        await repo.delete_file(sess, keys[1])
+        await repo.delete_object(sess, keys[2])
+        return sess, keys
+
+    sess, keys = asyncio.run(scenario())
+    app = FastAPI()
+    app.include_router(files.router)
+    app.dependency_overrides[get_bucket_session] = lambda: sess
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_read_only_user_id] = lambda: "u1"
+    app.dependency_overrides[get_read_write_user_id] = lambda: "u1"
+    client = TestClient(app)
+
+    upload = client.post("/files/upload", data={"user_id": "u1", "category": "docs"},
+                         files={"file": ("d.png", PNG, "image/png")}).json()
+    first = client.get("/files/list", params={"user_id": "u1", "max_results": 1})
+    assert [item["key"] for item in first.json()["files"]] == [upload]
+    assert first.json()["files"][0]["sha256"] == hashlib.sha256(PNG).hexdigest()
+    second = client.get("/files/list", params={"user_id": "u1", "cursor": first.headers["X-Next-Cursor"]})
+    assert [item["key"] for item in second.json()["files"]] == [keys[0]]
+    assert "X-Next-Cursor" not in second.headers
+    assert client.get("/files/list", params={"user_id": "u2"}).status_code == 403
+
+    assert client.get("/files/usage").json() == {
+        "files": 2,
+        "bytes": 2 * len(PNG),
+        "by_category": {"docs": {"files": 1, "bytes": len(PNG)}, "image": {"files": 1, "bytes": len(PNG)}},
+    }
+    asyncio.run(engine.dispose())
+
+
+def test_direct_uploads_are_checked_and_indexed_when_fetched(tmp_path, monkeypatch):
+    engine, get_test_db = _file_index_db(tmp_path, monkeypatch)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sess = await _local_session(tmp_path / "storage")
+        # Written like a signed PUT: straight to the backend, nothing indexed yet
+        await sess.backend.upload("users/u1/image/a.png", PNG, "image/png", {"original_filename": "fridge.png"})
+        await sess.backend.upload("users/u1/image/b.png", b"%PDF-1.7 not an image", "image/png", {})
+        sess.index = FileIndex()
+
+        data, content_type = await repo.fetch_direct_upload(sess, "users/u1/image/a.png", len(PNG))
+        assert data == PNG and content_type == "image/png"
+        for key, max_bytes, status in (
+            ("users/u1/image/a.png", len(PNG) - 1, 413),
+            ("users/u1/image/b.png", len(PNG), 415),
+            ("users/u1/image/missing.png", len(PNG), 404),
+        ):
+            with pytest.raises(HTTPException) as error:
+                await repo.fetch_direct_upload(sess, key, max_bytes)
+            assert error.value.status_code == status
+        return sess
+
+    sess = asyncio.run(scenario())
+    app = FastAPI()
+    app.include_router(files.router)
+    app.dependency_overrides[get_bucket_session] = lambda: sess
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_read_only_user_id] = lambda: "u1"
+    listed = TestClient(app).get("/files/list", params={"user_id": "u1"}).json()["files"]
+    assert [(item["key"], item["original_filename"]) for item in listed] == [("users/u1/image/a.png", "fridge.png")]
+    asyncio.run(engine.dispose())
+
+
+def test_content_addressed_uploads_are_deduplicated_and_swept(tmp_path, monkeypatch):
+    engine, _ = _file_index_db(tmp_path, monkeypatch)
+    monkeypatch.setattr(settings, "CONTENT_ADDRESSED_STORAGE", True)
+    monkeypatch.setattr(settings, "BLOB_GC_GRACE_HOURS", 0)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"id": "u1", "username": "u1", "email": "u1@example.com",
+                                               "hashed_password": "x"}])
+        sess = await _local_session(tmp_path / "storage")
+        sess.index = FileIndex()
+
+        @asynccontextmanager
+        async def bucket_session():
+            yield sess
+
+        monkeypatch.setattr("src.core.sweeper.get_async_bucket_session", bucket_session)
+
+        first = await repo.save_image_bytes(sess, "u1", "image", PNG, "first.png")
+        second = await repo.save_image_bytes(sess, "u1", "image", PNG, "second.png")
+
+        async def chunks():
+            yield PNG
+
+        streamed = await repo.upload_stream(sess, "u1", "image", chunks(), "third.png", None)
+        assert first["key"] == second["key"] == streamed["key"]
+        assert first["key"] == f"users/u1/image/sha256/{hashlib.sha256(PNG).hexdigest()}.png"
+        assert (first["status"], second["status"], streamed["status"]) == ("uploaded", "deduplicated", "deduplicated")
+
+        other = await repo.save_image_bytes(sess, "u1", "image", PNG[:-1], "other.png")
+        async with engine.begin() as conn:
+            await conn.execute(insert(Recipe), [{"user_id": "u1", "title": "t", "description": "d", "prompt": "p",
+                                                 "image_url": first["key"]}])
+
+        # The sweep that notices an object is unreferenced starts its grace period
+        assert await sweeper.sweep_unreferenced_blobs() == 0
+        assert await sweeper.sweep_unreferenced_blobs() == 1
+        assert await sess.backend.exists(first["key"]) and not await sess.backend.exists(other["key"])
+
+        # Sweeping the image of a deleted recipe is left to the blob sweep
+        assert await sweeper.delete_images([first["key"]]) == 0
+        assert await sess.backend.exists(first["key"])
+
+        # Deleting a shared object only hands it to the blob sweep, which keeps it while referenced
+        assert (await repo.delete_file(sess, first["key"]))["status"] == "released"
+        released = await repo.save_image_bytes(sess, "u1", "image", PNG[:-2], "released.png")
+        assert (await repo.delete_file(sess, released["key"]))["status"] == "released"
+        assert await sweeper.sweep_unreferenced_blobs() == 1  # grace period started by the delete
+        assert await sess.backend.exists(first["key"]) and not await sess.backend.exists(released["key"])
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+
+
+def test_serve_uses_the_object_cache(fake_gcs):
+    fake_gcs.put("users/u1/image/hot.png", PNG, "image/png")
+    sess = _threaded_session(fake_gcs.endpoint)
+    app = FastAPI()
+    app.include_router(files.router)
+    app.dependency_overrides[get_bucket_session] = lambda: sess
+    app.dependency_overrides[get_read_write_user_id] = lambda: "u1"
+    client = TestClient(app)
+
+    assert client.get("/files/serve/users/u1/image/hot.png").content == PNG
+    reads = fake_gcs.reads
+    assert client.get("/files/serve/users/u1/image/hot.png").content == PNG
+    partial = client.get("/files/serve/users/u1/image/hot.png", headers={"Range": "bytes=0-99"})
+    assert partial.status_code == 206 and partial.content == PNG[:100]
+    assert fake_gcs.reads == reads  # metadata and bytes from the cache, no storage request
+
+    client.delete("/files/users/u1/image/hot.png")
+    assert client.get("/files/serve/users/u1/image/hot.png").status_code == 404
+
+
+def test_native_client_retries_transient_errors(fake_gcs):
+    fake_gcs.put("users/u1/image/retry.png", PNG, "image/png")
+    client = AsyncGcsClient(BUCKET, endpoint=fake_gcs.endpoint, initial_backoff=0.01)
+    failures = iter([503, 429])
+    send = client._http.request
+
+    async def flaky_request(*args, **kwargs):
+        status = next(failures, None)
+        if status is not None:
+            import httpx
+            return httpx.Response(status, json={"error": {"message": "try again"}})
+        return await send(*args, **kwargs)
+
+    client._http.request = flaky_request
+
+    async def scenario():
+        assert await client.download("users/u1/image/retry.png") == PNG
+        await client.close()
+
+    asyncio.run(scenario())
+    assert client.metrics()["retries"] == 2
+
+
+async def _download_all(sess: BucketSession, keys: List[str], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(key: str) -> None:
+        async with semaphore:
+            await repo.get_file(sess, key)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one(key) for key in keys))
+    return time.perf_counter() - started
+
+
+def run_benchmarks(fake: FakeGcs, concurrency_levels=BENCHMARK_CONCURRENCY) -> List[dict]:
+    """Concurrent downloads through the threaded, the native and the local backend.
+
+    The fake server delays every read by BENCHMARK_LATENCY_SECONDS; on loopback without a
+    delay the HTTP client overhead dominates, not the waiting that the thread pool caps.
+    """
+    data = os.urandom(BENCHMARK_OBJECT_BYTES)
+    keys = [f"users/bench/image/{index}.bin" for index in range(BENCHMARK_OBJECTS)]
+    for key in keys:
+        fake.put(key, data, "application/octet-stream")
+
+    results = []
+    fake.latency = BENCHMARK_LATENCY_SECONDS
+    with tempfile.TemporaryDirectory() as root:
+        local = asyncio.run(_local_session(root))
+        for key in keys:
+            asyncio.run(local.backend.upload(key, data, "application/octet-stream", {}))
+
+        for concurrency in concurrency_levels:
+            async def measure() -> Tuple[float, float, float]:
+                threaded = _threaded_session(fake.endpoint)
+                native = _native_session(fake.endpoint, max_concurrency=concurrency)
+                await _download_all(threaded, keys[:20], concurrency)  # warm up connection pools
+                await _download_all(native, keys[:20], concurrency)
+                threaded_seconds = await _download_all(threaded, keys, concurrency)
+                native_seconds = await _download_all(native, keys, concurrency)
+                local_seconds = await _download_all(local, keys, concurrency)
+                await native.backend.close()
+                return threaded_seconds, native_seconds, local_seconds
+
+            threaded_seconds, native_seconds, local_seconds = asyncio.run(measure())
+            results.append({
+                "concurrency": concurrency,
+                "downloads": len(keys),
+                "threaded_per_second": round(len(keys) / threaded_seconds),
+                "native_per_second": round(len(keys) / native_seconds),
+                "local_per_second": round(len(keys) / local_seconds),
+                "speedup": round(threaded_seconds / native_seconds, 2),
+            })
+    fake.latency = 0.0
+    return results
+
+
+@pytest.mark.skipif(os.getenv("RUN_BENCHMARKS") != "1", reason="set RUN_BENCHMARKS=1 to run benchmarks")
+def test_benchmark_native_client(fake_gcs):
+    for result in run_benchmarks(fake_gcs):
+        print(result)
+        assert result["native_per_second"] > 0, result
+
+
+if __name__ == "__main__":
+    fixture = fake_gcs.__wrapped__()
+    fake = next(fixture)
+    for row in run_benchmarks(fake):
+        print(f"concurrency {row['concurrency']:>3}: threaded {row['threaded_per_second']:>6}/s, "
+              f"native {row['native_per_second']:>6}/s (speedup {row['speedup']}x), "
+              f"local {row['local_per_second']:>6}/s")
+    next(fixture, None)
@@ -0,0 +1,112 @@
+"""
+Tests for the delta-sync change log (src/db/crud/sync_crud.py, /sync/changes).
+
+Run with `python -m pytest src/test/test_sync.py`.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("SECRET_KEY", "sync-tests")
+os.environ.setdefault("SESSION_SECRET_KEY", "sync-tests")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.requests import HTTPConnection
+
+from src.api.routers import sync
+from src.db.crud import sync_crud
+from src.db.database import Base, _is_read_only_route, get_db
+from src.db.models.db_recipe import SyncChange
+from src.utils.auth import get_read_only_user_id
+
+NOW = datetime(2026, 1, 31, 12, 0, 0)
+
+
+def _change(change_id: int, created_at: datetime, user_id: str = "u1") -> dict:
+    return {"id": change_id, "user_id": user_id, "entity": "collection", "entity_id": str(change_id),
+            "op": "upsert", "created_at": created_at}
+
+
+def _database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/sync.db", poolclass=NullPool)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def test_changes_stop_before_unsettled_entries(tmp_path):
+    engine, sessions = _database(tmp_path)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            # 3 is not settled yet; 4 is older but must wait, 3's transaction may hide a lower id
+            await db.execute(insert(SyncChange), [
+                _change(1, NOW - timedelta(minutes=5)), _change(2, NOW - timedelta(minutes=4)),
+                _change(3, NOW - timedelta(seconds=1)), _change(4, NOW - timedelta(minutes=3)),
+            ])
+            await db.commit()
+            settled_before = NOW - timedelta(seconds=5)
+
+            changes, cursor, has_more = await sync_crud.get_changes(db, "u1", 0, 10, settled_before)
+            assert sorted(changes) == [("collection", "1"), ("collection", "2")]
+            assert cursor == 2 and not has_more
+            assert await sync_crud.get_latest_cursor(db, "u1", settled_before) == 4
+
+            # Pruning keeps the latest entry, so the start of the retained log stays known
+            assert await sync_crud.prune_changes(db, NOW, 100) == 3
+            await db.commit()
+            assert await sync_crud.get_oldest_cursor(db) == 3
+
+    asyncio.run(scenario())
+    asyncio.run(engine.dispose())
+
+
+def test_cursor_before_pruned_entries_requires_resync(tmp_path):
+    engine, sessions = _database(tmp_path)
+
+    async def seed():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            old = datetime.utcnow() - timedelta(days=60)
+            await db.execute(insert(SyncChange), [_change(change_id, old) for change_id in range(1, 6)])
+            await sync_crud.prune_changes(db, datetime.utcnow(), 100)
+            await db.commit()
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    asyncio.run(seed())
+    app = FastAPI()
+    app.include_router(sync.router)
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_read_only_user_id] = lambda: "u1"
+    client = TestClient(app)
+
+    stale = client.get("/sync/changes", params={"cursor": 2})
+    assert stale.status_code == 410
+    assert stale.json()["detail"] == {"reason": "resync_required", "cursor": 5}
+    current = client.get("/sync/changes", params={"cursor": 4})
+    assert current.status_code == 200 and current.json()["cursor"] == 5
+
+    # A user without retained entries (e.g. a new one) continues from the start of the retained log
+    app.dependency_overrides[get_read_only_user_id] = lambda: "u2"
+    full_sync = client.get("/sync/changes", params={"cursor": 0})
+    assert full_sync.status_code == 410
+    assert full_sync.json()["detail"] == {"reason": "resync_required", "cursor": 4}
+    resumed = client.get("/sync/changes", params={"cursor": 4})
+    assert resumed.status_code == 200 and resumed.json()["cursor"] == 4 and not resumed.json()["has_more"]
+    asyncio.run(engine.dispose())
+
+
+def test_changes_are_read_from_the_primary():
+    app = FastAPI()
+    app.include_router(sync.router)
+    route = next(route for route in app.routes if getattr(route, "path", None) == "/sync/changes")
+    scope = {"type": "http", "method": "GET", "route": route, "headers": []}
+    assert not _is_read_only_route(HTTPConnection(scope))
@@ -0,0 +1,29 @@
+"""
+Registry for in-process runtime metrics exposed on /metrics.
+
+Components register a callable returning a JSON-serializable snapshot under a name;
+the endpoint collects all snapshots on request.
+"""
+import logging
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """Register (or replace) the snapshot provider of a component."""
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Return the snapshots of all registered components."""
+    snapshot = {}
+    for name, provider in _providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Collecting metrics of %s failed: %s", name, e)
+            snapshot[name] = {"error": str(e)}
+    return snapshot
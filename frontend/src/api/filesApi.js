@@ -55,6 +55,43 @@ export const uploadIngredientImage = async (userId, file, category = 'ingredient
   return response.data;
 };
 
+/**
+ * Upload a file directly to the storage bucket through a signed PUT URL.
+ * The file bytes do not pass through the API; only the key is returned.
+ * @param {string} userId - The authenticated user's identifier.
+ * @param {File} file - The file selected by the user.
+ * @param {string} [category='image'] - Storage category for the upload.
+ * @returns {Promise<string>} Resolves to the storage key of the uploaded file.
+ */
+export const uploadFileDirect = async (userId, file, category = 'image') => {
+  if (!userId) {
+    throw new Error('User ID is required to upload a file.');
+  }
+  if (!file) {
+    throw new Error('No file provided for upload.');
+  }
+
+  const { data: uploadInfo } = await apiWithCookies.post('/files/signed-put', null, {
+    params: {
+      user_id: userId,
+      category,
+      filename: file.name,
+      content_type: file.type,
+    },
+  });
+
+  const response = await fetch(uploadInfo.signed_url, {
+    method: 'PUT',
+    headers: uploadInfo.required_headers,
+    body: file,
+  });
+  if (!response.ok) {
+    throw new Error(`Direct upload failed with status ${response.status}`);
+  }
+
+  return uploadInfo.key;
+};
+
 /**
  * Retrieve a signed GET URL for a stored image key.
  * @param {string} key - The storage key returned from the upload endpoint.
@@ -37,6 +37,24 @@ export const generateRecipes = async (prompt, writtenIngredients, imageKey = '',
   }
 };
 
+/**
+ * Analyze an ingredient photo that was uploaded directly to the bucket
+ * @param {string} imageKey - Storage key returned by uploadFileDirect
+ * @returns {Promise<string>} Comma-separated ingredients seen on the photo, or 'none'
+ * @throws {Error} If the request fails
+ */
+export const analyzeImageByKey = async (imageKey) => {
+  try {
+    const response = await apiWithCookies.post('/preparing/image-analysis/by-key', {
+      image_key: imageKey,
+    });
+    return response.data;
+  } catch (error) {
+    console.error('analyzeImageByKey error:', error);
+    throw error;
+  }
+};
+
 /**
  * Get recipe options for a preparing session
  * @param {number} preparingSessionId - The preparing session ID
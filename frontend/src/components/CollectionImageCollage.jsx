@@ -1,8 +1,25 @@
+import { useState } from 'react';
 import { getImageUrl } from '../utils/imageUtils';
 import { useTranslation } from 'react-i18next';
 
-export default function CollectionImageCollage({ imageUrls = [] }) {
+export default function CollectionImageCollage({ imageUrls = [], collageUrl = null }) {
   const { t } = useTranslation('collection');
+  const [collageFailed, setCollageFailed] = useState(false);
+
+  // Server-rendered collage: one request instead of up to four
+  if (collageUrl && !collageFailed) {
+    return (
+      <div className="w-full h-full rounded-xl overflow-hidden">
+        <img
+          src={getImageUrl(collageUrl)}
+          alt={t('collage.singleAlt', 'Collection preview')}
+          className="w-full h-full object-cover"
+          onError={() => setCollageFailed(true)}
+        />
+      </div>
+    );
+  }
+
   // Ensure we have at most 4 images
   const images = imageUrls.slice(0, 4).map(url => getImageUrl(url));
   const count = images.length;
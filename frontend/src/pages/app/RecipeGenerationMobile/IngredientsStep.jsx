@@ -2,7 +2,8 @@ import { useState } from 'react';
 import { useRef } from 'react';
 import { useAuth } from '../../../contexts/AuthContext';
 import { useTranslation } from 'react-i18next';
-import axios from 'axios';
+import { uploadFileDirect } from '../../../api/filesApi';
+import { analyzeImageByKey } from '../../../api/preparingApi';
 
 export default function IngredientsStep({
 	onSubmit,
@@ -108,15 +109,9 @@ export default function IngredientsStep({
 								setValidationError('');
 								setAnalyzing(true);
 								try {
-									const formData = new FormData();
-									formData.append('file', file);
-									// You may need to adjust the API base URL
-									const response = await axios.post('/api/preparing/image-analysis', formData, {
-										headers: {
-											'Content-Type': 'multipart/form-data',
-										},
-									});
-									const result = response.data;
+									// Upload straight to the bucket, then let the backend analyze the stored photo
+									const imageKey = await uploadFileDirect(user.id, file, 'image');
+									const result = await analyzeImageByKey(imageKey);
 									if (
 										(typeof result === 'string' && (result.trim().toLowerCase() === 'none' || result.trim().toUpperCase() === 'NONE')) ||
 										(Array.isArray(result) && result.length === 0)
@@ -47,7 +47,10 @@ export default function CollectionsSection({
               >
                 {/* Image Collage */}
                 <div className="bg-[#FFF8F0] h-32 sm:h-36 flex items-center justify-center overflow-hidden relative">
-                  <CollectionImageCollage imageUrls={collection.preview_image_urls || []} />
+                  <CollectionImageCollage
+                    imageUrls={collection.preview_image_urls || []}
+                    collageUrl={collection.collage_image_url}
+                  />
 
                   {/* Menu Button - top right inside image */}
                   <div className="absolute top-2 right-2 z-10">